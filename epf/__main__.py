@@ -11,10 +11,12 @@ import argparse
 from numpy import random
 import random as stdrandom
 
-from . import Target, SocketConnection, constants
+from . import Target, SocketConnection, constants, seed_cache
 from .fuzzers import IFuzzer
 from .restarters import IRestarter
+from .scheduler import IScheduler
 from .session import Session
+from .connections.socket_connection import STRATEGIES, DEFAULT_SOURCE_PORTS
 
 logo = """
 `-:-.   ,-;"`-:-.   ,-;"`-:-.   ,-;"`-:-.   ,-;"
@@ -25,6 +27,20 @@ logo = """
         - Evolutionary Protocol Fuzzer -
 """
 
+# cli protocol names -> SocketConnection protocols
+PROTOCOLS = {'tcp': 'tcp', 'udp': 'udp', 'tcp+tls': 'ssl', 'raw-l2': 'raw-l2', 'raw-l3': 'raw-l3'}
+
+
+def port_range(value: str) -> tuple:
+    """argparse type of a port range FIRST-LAST"""
+    try:
+        first, last = (int(p) for p in value.split('-'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'invalid port range {value}, expected FIRST-LAST')
+    if not 0 < first <= last < 65536:
+        raise argparse.ArgumentTypeError(f'invalid port range {value}')
+    return first, last
+
 
 class EPF(object):
 
@@ -38,9 +54,16 @@ class EPF(object):
             connection=SocketConnection(  # ok
                 host=self.args.host,
                 port=self.args.port,
-                proto=self.args.protocol,
+                proto=PROTOCOLS[self.args.protocol],
                 send_timeout=self.args.send_timeout,
                 recv_timeout=self.args.recv_timeout,
+                speculative=self.args.speculative != 'off',
+                strategy=self.args.conn_strategy,
+                source_ports=self.args.source_ports,
+                low_latency=self.args.low_latency,
+                udp_persistent=self.args.udp_persistent,
+                raw_peer_ip=self.args.raw_peer_ip,
+                raw_peer_mac=self.args.raw_peer_mac,
             )
         )
 
@@ -57,7 +80,21 @@ class EPF(object):
             debug=self.args.debug,
             output=self.args.output,
             dump_shm=self.args.dump_shm,
-            deterministic=False  # broken
+            deterministic=False,  # broken
+            scheduler=self.args.scheduler,
+            cull_interval=self.args.cull_interval,
+            cull_evict=self.args.cull_evict,
+            tmin=self.args.tmin,
+            bucket_frames=self.args.bucket_frames,
+            bisect=self.args.bisect,
+            resume=self.args.resume,
+            checkpoint_interval=self.args.checkpoint_interval,
+            sequences=self.args.sequences,
+            speculative=self.args.speculative,
+            pipeline=self.args.pipeline,
+            concurrency=self.args.concurrency,
+            pacing=self.args.pacing,
+            response_feedback=self.args.response_feedback,
         )
 
     # --------------------------------------------------------------- #
@@ -75,30 +112,80 @@ class EPF(object):
         self.parser.add_argument("host", help="target host")
         self.parser.add_argument("port", type=int, help="target port")
         conn_grp = self.parser.add_argument_group('Connection options')
-        conn_grp.add_argument("-p", "--protocol", dest="protocol", help="transport protocol", default='tcp',
-                              choices=['tcp', 'udp', 'tcp+tls'])
+        conn_grp.add_argument("-p", "--protocol", dest="protocol", default='tcp', choices=list(PROTOCOLS.keys()),
+                              help="transport protocol (raw: host is the network interface)")
         conn_grp.add_argument("-st", "--send_timeout", dest="send_timeout", type=float, default=5.0,
                               help="send() timeout")
         conn_grp.add_argument("-rt", "--recv_timeout", dest="recv_timeout", type=float, default=5.0,
                               help="recv() timeout")
+        conn_grp.add_argument("--speculative", dest="speculative", default='off', choices=['off', 'connect', 'pre'],
+                              help="open the next connection (and send its pre-phase) in the background")
+        conn_grp.add_argument("--conn_strategy", dest="conn_strategy", default='graceful', choices=STRATEGIES,
+                              help="close connections gracefully, abortively (no TIME_WAIT) or abortively from "
+                                   "rotating source ports")
+        conn_grp.add_argument("--source_ports", dest="source_ports", type=port_range, default=DEFAULT_SOURCE_PORTS,
+                              help="source port range FIRST-LAST of the rotate strategy")
+        conn_grp.add_argument("--low_latency", dest="low_latency", action='store_true', default=False,
+                              help="TCP_NODELAY, TCP_QUICKACK and TCP Fast Open for tcp connections")
+        conn_grp.add_argument("--udp_persistent", dest="udp_persistent", action='store_true', default=False,
+                              help="keep one connected udp socket across test cases")
+        conn_grp.add_argument("--raw_peer_ip", dest="raw_peer_ip", type=str, default=None,
+                              help="raw-l2/raw-l3: accept responses from this IPv4 address only")
+        conn_grp.add_argument("--raw_peer_mac", dest="raw_peer_mac", type=str, default=None,
+                              help="raw-l2/raw-l3: accept responses from this MAC address only")
+        conn_grp.add_argument("--concurrency", dest="concurrency", type=int, default=1,
+                              help="test cases executed concurrently (tcp/tcp+tls only)")
+        conn_grp.add_argument("--pacing", dest="pacing", action='store_true', default=False,
+                              help="adapt the test case rate (or concurrency) to the load of the target (AIMD)")
 
         fuzzers = [fuzzer_class.name for fuzzer_class in IFuzzer.__subclasses__()]
 
         fuzz_grp = self.parser.add_argument_group('Fuzzer options')
         fuzz_grp.add_argument("--fuzzer", dest="fuzz_protocol", help='application layer fuzzer', required=True,
                               choices=fuzzers)
-        fuzz_grp.add_argument('--debug', action='store_true', help='enable debug.csv')
+        fuzz_grp.add_argument('--debug', action='store_true', help='enable binary execution log (execlog.bin)')
+        fuzz_grp.add_argument('--tmin', action='store_true', help='minimize bug payloads in the background')
+        fuzz_grp.add_argument('--bisect', action='store_true', help='bisect crash culprits in the background')
+        fuzz_grp.add_argument('--bucket_frames', dest='bucket_frames', type=int, default=0,
+                              help='sanitizer stack frames used for crash bucketing, 0 disables stderr capture')
         fuzz_grp.add_argument('--batch', action='store_true', help='non-interactive, very quiet mode')
         fuzz_grp.add_argument('--dtrace', action='store_true', help='extremely verbose debug tracing')
-        fuzz_grp.add_argument('--pcap', dest='pcap', type=str, required=True, help='pcap population seed')
+        fuzz_grp.add_argument('--pcap', dest='pcap', type=str, nargs='+', required=True,
+                              help='pcap population seed (pcap/pcapng files or directories)')
+        fuzz_grp.add_argument('--pcap_workers', dest='pcap_workers', type=int, default=0,
+                              help='pcap dissection processes, 0 for one per cpu')
+        fuzz_grp.add_argument('--max_seeds', dest='max_seeds', type=int, default=0,
+                              help='maximum number of seeds per population, 0 for unlimited')
+        fuzz_grp.add_argument('--learn_transitions', dest='learn_transitions', action='store_true', default=False,
+                              help='learn the shortest pre-/post-phases per population from the pcap sessions')
+        fuzz_grp.add_argument('--seed_cache', dest='seed_cache', type=str, nargs='?', default='',
+                              const=seed_cache.DEFAULT_DIR,
+                              help=f'cache the pcap seeds in this dir (default {seed_cache.DEFAULT_DIR})')
         fuzz_grp.add_argument('--seed', dest='seed', type=int, default=0, help='prng seed')
         fuzz_grp.add_argument('--alpha', dest='alpha', type=float, default=0.995, help='simulated annealing cooldown parameter')
         fuzz_grp.add_argument('--beta', dest='beta', type=float, default=0.950, help='simulated annealing reheat parameter')
         fuzz_grp.add_argument('--smut', dest='smut', type=float, default=0.8, help='spot mutation probability')
+        fuzz_grp.add_argument('--scheduler', dest='scheduler', type=str, default='ucb',
+                              choices=[sched.name for sched in IScheduler.__subclasses__()],
+                              help='population scheduler')
+        fuzz_grp.add_argument('--sequences', dest='sequences', type=int, default=0,
+                              help='maximum length of multi-message individuals, 0 disables them')
+        fuzz_grp.add_argument('--pipeline', dest='pipeline', type=int, default=0,
+                              help='children pre-generated per population in the background, 0 disables it')
         fuzz_grp.add_argument('--plimit', dest='plimit', type=int, default=10000, help='population limit')
+        fuzz_grp.add_argument('--cull', dest='cull_interval', type=int, default=0,
+                              help='corpus culling interval [iterations], 0 disables culling')
+        fuzz_grp.add_argument('--cull_evict', dest='cull_evict', action='store_true', default=False,
+                              help='evict culled individuals instead of demoting them')
+        fuzz_grp.add_argument('--response_feedback', dest='response_feedback', action='store_true', default=False,
+                              help='treat responses with an unseen structure as novel (partially instrumented targets)')
         fuzz_grp.add_argument('--budget', dest='time_budget', type=float, default=0.0, help='time budget')
         fuzz_grp.add_argument('--output', dest='output', type=str, default="", help='output dir')
         fuzz_grp.add_argument('--shm_id', dest='shm_id', type=str, default="", help='custom shared memory id overwrite')
+        fuzz_grp.add_argument('--resume', dest='resume', type=str, default="",
+                              help='resume the run in this output dir from its last checkpoint')
+        fuzz_grp.add_argument('--checkpoint_interval', dest='checkpoint_interval', type=float, default=300.0,
+                              help='checkpoint interval [sec], 0 disables checkpoints')
         fuzz_grp.add_argument('--dump_shm', dest='dump_shm', action='store_true', default=False, help='dump shm after run')
         #fuzz_grp.add_argument('--deterministic', dest='deterministic', action='store_true', default=False, help='SLOW mode, ~2x less iterations, but fairly deterministic runs (verify by comparing two --dtrace runs)')
 
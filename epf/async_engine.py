@@ -0,0 +1,188 @@
+import asyncio
+import sys
+import time
+from typing import List, Tuple, Union, TYPE_CHECKING
+
+import numpy as np
+from numpy import random
+
+from . import constants
+from . import shm
+from .connections.async_connection import AsyncSocketConnection
+from .testcase import TestCase, transmission_plan
+
+if TYPE_CHECKING:
+    from epf.chromo import Population
+    from epf.session import Session
+
+
+class AsyncRunner(object):
+    """
+    Executes test cases in batches of `concurrency` concurrent connections against one target.
+
+    Coverage can not be attributed to a single test case while several of them run at the same time, so novelty
+    is decided per batch: after all connections of a batch have finished, one coverage snapshot is taken. Batches
+    without new coverage update their populations like uninteresting children. If a batch shows novelty, its
+    children are re-executed serially through the regular session path. Since the coverage map is cumulative, a
+    child is credited if its own trace hits one of the edges that were new to the batch. Novelty that only occurs
+    under concurrency is not credited.
+
+    With pacing enabled, the session's pacer decides how many of the connections a batch uses.
+
+    Each test case has a deadline of one send and one receive timeout from its start, all operations of its
+    connection are bounded by it.
+
+    Args:
+        session (Session): session to run
+        concurrency (int): test cases in flight
+    """
+
+    def __init__(self, session: 'Session', concurrency: int):
+        self.session = session
+        self.concurrency = concurrency
+        conn = session.target.target_connection
+        self._connections = [AsyncSocketConnection(conn.host, conn.port, proto=conn.proto,
+                                                   send_timeout=conn._send_timeout, recv_timeout=conn._recv_timeout,
+                                                   strategy=getattr(conn, 'strategy', 'graceful'))
+                             for _ in range(concurrency)]
+        self._loop = None
+        self.batches = 0
+        self.novel_batches = 0
+        self.rechecks = 0
+
+    @property
+    def recv_timeout_count(self) -> int:
+        return sum(c.recv_timeout_count for c in self._connections)
+
+    @property
+    def send_timeout_count(self) -> int:
+        return sum(c.send_timeout_count for c in self._connections)
+
+    @property
+    def conn_errors(self) -> int:
+        return sum(c.conn_errors for c in self._connections)
+
+    @property
+    def local_errors(self) -> int:
+        return sum(c.local_errors for c in self._connections)
+
+    def run(self):
+        s = self.session
+        self._loop = asyncio.new_event_loop()
+        # python 3.6: gather() and the connections look the loop up with get_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            while s.cont():
+                with s.target_lock.fuzz():
+                    self.step()
+                s.save_checkpoint()
+        finally:
+            asyncio.set_event_loop(None)
+            self._loop.close()
+
+    def step(self):
+        s = self.session
+        if not s.restarter.healthy():
+            s.update_bugs(Exception("uncertain"), crashing=s.active_testcase)
+        # 1. breed the batch
+        connections = self._connections[:s.pacer.window] if s.pacer is not None else self._connections
+        batch: List[Tuple[TestCase, 'Population']] = []
+        for _ in connections:
+            s.schedule_population()
+            s.generate_individual()
+            s.test_case_cnt += 1
+            batch += [(TestCase(id=s.test_case_cnt, session=s, individual=s.active_individual), s.active_population)]
+        s.test_case_buffer = (s.test_case_buffer + [tc for tc, _ in batch])[-max(10, len(batch)):]
+        mem = shm.get()
+        mem.acquire()
+        history = np.asarray(mem.history, dtype=np.uint8)
+        mem.release()
+        # 2. execute it concurrently
+        timeouts, failures = self.recv_timeout_count + self.send_timeout_count, self.conn_errors
+        t_start = time.monotonic()
+        errors = self._loop.run_until_complete(asyncio.gather(
+            *[self._execute(tc, conn) for (tc, _), conn in zip(batch, connections)]))
+        latency = time.monotonic() - t_start
+        for (tc, _), err in zip(batch, errors):
+            if err is not None:
+                tc.add_error(err)
+        # 3. batched novelty
+        mem.acquire()
+        cov = mem.directed_branch_coverage()
+        trace = mem.trace()
+        mem.release()
+        for tc, _ in batch:
+            tc.attribute(cov, trace)
+        s.previous_testcase, s.active_testcase = s.active_testcase, batch[-1][0]
+        self.batches += 1
+        if not s.restarter.healthy():
+            # any member of the batch may have crashed the target, they share the trace of the batch
+            s.update_bugs(Exception("crashed during batch"), crashing=batch[-1][0],
+                          suspects=[tc for tc, _ in batch])
+        elif s.pacer is not None:
+            s.pacer.observe(latency=latency, timeouts=self.recv_timeout_count + self.send_timeout_count - timeouts,
+                            failures=self.conn_errors - failures)
+        novel = s.coverage_baseline is not None and cov != s.coverage_baseline
+        if constants.TRACE:
+            print(f"batch_trace, {s.test_case_cnt}, {len(batch)}, {cov}, {novel}", file=sys.stderr)
+        if novel:
+            self.novel_batches += 1
+            mem.acquire()
+            new_edges = np.flatnonzero(np.asarray(mem.history) > np.asarray(history)).astype(np.uint32)
+            mem.release()
+            s.coverage_baseline = cov
+            self.recheck(batch, new_edges)
+            return
+        s.coverage_baseline = cov
+        if s.pipeline is not None:
+            s.pipeline.settle()
+        for tc, pop in batch:
+            with pop.lock:
+                pop.update(tc.individual, heat=s.energy, add=random.random() <= s.energy)
+                pop.shrink(s.opts.population_limit)
+            s.active_testcase = tc
+            s.debug()
+
+    def recheck(self, batch: List[Tuple[TestCase, 'Population']], new_edges: np.ndarray):
+        """
+        Serial re-execution of a batch that showed novelty
+
+        @param batch: test cases and their populations
+        @param new_edges: edges that were new to the batch, each one is credited to the first child that hits it
+        """
+        s = self.session
+        for tc, pop in batch:
+            s.active_population = pop
+            s.active_individual = tc.individual
+            err, executed = s.evaluate_individual()
+            _ = s.active_testcase.coverage_snapshot  # takes the trace of this execution
+            hit = np.intersect1d(s.active_testcase.trace, new_edges, assume_unique=True)
+            new_edges = np.setdiff1d(new_edges, hit, assume_unique=True)
+            s.update_population(err, executed, change=hit.size > 0)
+            s.debug()
+            self.rechecks += 1
+
+    async def _execute(self, tc: TestCase, conn: AsyncSocketConnection) -> Union[Exception, None]:
+        s = self.session
+        pre, messages, post = transmission_plan(s.populations, tc.individual, renumber=s.fuzz_protocol.renumber)
+        deadline = self._loop.time() + s.opts.send_timeout + s.opts.recv_timeout
+        try:
+            await conn.open(deadline)
+            for data, recv in pre + messages:
+                await conn.send(data, deadline)
+                if recv:
+                    await conn.recv(deadline=deadline)
+            for data, recv in post:
+                try:
+                    await conn.send(data, deadline)
+                    if recv:
+                        await conn.recv(deadline=deadline)
+                except Exception:
+                    if not s.opts.post_relax:
+                        raise
+            tc.done = True
+            return None
+        except Exception as e:
+            return e
+        finally:
+            await conn.close()
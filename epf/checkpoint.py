@@ -0,0 +1,116 @@
+import os
+import pickle
+import random as stdrandom
+import time
+from typing import Any, Dict, TYPE_CHECKING
+
+import numpy as np
+from numpy import random
+
+from . import shm
+
+if TYPE_CHECKING:
+    from epf.session import Session
+
+VERSION = 1
+CHECKPOINT_FILE = 'checkpoint.pkl'
+
+
+def path(result_dir: str) -> str:
+    return os.path.join(result_dir, CHECKPOINT_FILE)
+
+
+def exists(result_dir: str) -> bool:
+    return os.path.isfile(path(result_dir))
+
+
+def save(session: 'Session') -> str:
+    """
+    Write a checkpoint of the campaign state into the session's result directory.
+
+    The checkpoint is written to a temporary file first and then renamed, so an interruption never leaves a
+    truncated checkpoint behind. It has to be taken between two fuzzing iterations (i.e. holding the fuzz lock).
+
+    @param session: session to checkpoint
+    @return: path of the checkpoint
+    """
+    mem = shm.get()
+    mem.acquire()
+    history = np.packbits(np.asarray(mem.history, dtype=bool)).tobytes()
+    mem.release()
+    state = {
+        "version": VERSION,
+        "saved": time.time(),
+        "fuzzer": session.fuzz_protocol.name,
+        "populations": {k: p.state() for k, p in session.populations.items()},
+        "active_population": session.active_population.species,
+        "drain_seed_individuals": session.drain_seed_individuals,
+        "history": history,
+        "energy": session.energy,
+        "energy_periods": session.energy_periods,
+        "reheat_count": session.reheat_count,
+        "allocation": session.allocation,
+        "test_case_cnt": session.test_case_cnt,
+        "bug_count": session.bug_count,
+        "minimized": session.minimized,
+        "bisected": session.bisected,
+        "response_fingerprints": session.feedback.state() if session.feedback is not None else [],
+        "execution_time": session.time_budget.execution_time,
+        "scheduler": (session.scheduler.name, dict(vars(session.scheduler))),
+        "rng": (random.get_state(), stdrandom.getstate()),
+    }
+    dst = path(session.result_dir)
+    tmp = dst + '.tmp'
+    with open(tmp, 'wb') as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, dst)
+    return dst
+
+
+def load(result_dir: str) -> Dict[str, Any]:
+    with open(path(result_dir), 'rb') as f:
+        state = pickle.load(f)
+    if state.get("version", None) != VERSION:
+        raise ValueError(f"unsupported checkpoint version {state.get('version', None)}")
+    return state
+
+
+def restore(session: 'Session', state: Dict[str, Any]):
+    """
+    Restore a checkpoint into a freshly initialized session. The populations must have been generated by the
+    session's fuzzer already, their individuals are replaced by the checkpointed ones.
+
+    @param session: session to restore into
+    @param state: checkpoint, see load()
+    """
+    if state["fuzzer"] != session.fuzz_protocol.name:
+        raise ValueError(f"checkpoint belongs to fuzzer {state['fuzzer']}, not {session.fuzz_protocol.name}")
+    missing = set(state["populations"]) - set(session.populations)
+    if len(missing) > 0:
+        raise ValueError(f"checkpoint contains unknown populations: {', '.join(sorted(missing))}")
+    for key, pop_state in state["populations"].items():
+        session.populations[key].restore(pop_state)
+    session.active_population = session.populations[state["active_population"]]
+    session.drain_seed_individuals = state["drain_seed_individuals"]
+    mem = shm.get()
+    mem.acquire()
+    history = np.unpackbits(np.frombuffer(state["history"], dtype=np.uint8))[:len(mem.history)]
+    mem.history = [int(b) for b in history]
+    mem.release()
+    session.energy = state["energy"]
+    session.energy_periods = state["energy_periods"]
+    session.reheat_count = state["reheat_count"]
+    session.allocation = state["allocation"]
+    session.test_case_cnt = state["test_case_cnt"]
+    session.bug_count = state["bug_count"]
+    session.minimized = state["minimized"]
+    session.bisected = state["bisected"]
+    if session.feedback is not None:
+        session.feedback.restore(state.get("response_fingerprints", []))
+    session.time_budget.restore(state["execution_time"])
+    name, scheduler_state = state["scheduler"]
+    if name == session.scheduler.name:
+        vars(session.scheduler).update(scheduler_state)
+    np_state, std_state = state["rng"]
+    random.set_state(np_state)
+    stdrandom.setstate(std_state)
@@ -1,11 +1,16 @@
+import contextlib
+import heapq
 import sys
-from typing import Dict, Any, Callable, Union, Tuple
+import threading
+from typing import Dict, Any, Callable, Union, Tuple, List
 
 from . import constants
+from . import ingest
+from . import seed_cache
 from scapy.fields import Field, PacketListField
-from scapy.all import rdpcap
 from scapy.packet import Packet
 import uuid
+import numpy as np
 from numpy import random
 import random as stdrandom
 from uuid import UUID
@@ -14,6 +19,51 @@ from uuid import UUID
 from .transition_payload import TransitionGraph
 
 
+class _BreedingRng(threading.local):
+    """
+    Random number generators of the genetic operators in the current thread: the global ones, unless the thread
+    breeds with generators of its own (see private_rng())
+    """
+    np = random
+    std = stdrandom
+
+
+_rng = _BreedingRng()
+# scapy's volatile values always draw from the global stdlib generator
+_volatile_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def private_rng(np_rng: random.RandomState, std_rng: stdrandom.Random):
+    """
+    Let the genetic operators of the current thread draw from the given generators instead of the global ones
+
+    @param np_rng: replaces numpy's global generator
+    @param std_rng: replaces the stdlib's global generator
+    """
+    _rng.np, _rng.std = np_rng, std_rng
+    try:
+        yield
+    finally:
+        del _rng.np, _rng.std
+
+
+def _random_value(field: Field) -> Any:
+    """A random value of a field, drawn from the current thread's generator"""
+    if _rng.std is stdrandom:
+        randval = field.randval()
+        return randval._fix() if randval is not None else None
+    with _volatile_lock:
+        saved = stdrandom.getstate()
+        stdrandom.setstate(_rng.std.getstate())
+        try:
+            randval = field.randval()
+            return randval._fix() if randval is not None else None
+        finally:
+            _rng.std.setstate(stdrandom.getstate())
+            stdrandom.setstate(saved)
+
+
 class Chromosome(object):
     def __init__(self, individual: "Individual", field: Field, packet: Packet):
         self._field = field
@@ -35,9 +85,11 @@ class Chromosome(object):
     @current_value.setter
     def current_value(self, val: Any):
         self._pkt.setfieldval(self._field.name, val)
+        self._individual.invalidate()
 
     def reset_value(self) -> Any:
         self._pkt.setfieldval(self._field.name, self.original_value)
+        self._individual.invalidate()
         return self._field.default
 
     def random_mutate(self):
@@ -46,13 +98,13 @@ class Chromosome(object):
         layer = self._pkt
         if isinstance(self._field, PacketListField):
             layer = self._pkt.getlayer(1)
-            field = layer.get_field(random.choice(layer.fields_desc).name)
+            field = layer.get_field(_rng.np.choice(layer.fields_desc).name)
             if constants.TRACE:
                 print(f"rng_trace, random_mutate, 1, {field.name}", file=sys.stderr)
-        randval = field.randval()
-        if randval is not None:
-            val = randval._fix()
+        val = _random_value(field)
+        if val is not None:
             layer.setfieldval(field.name, val)
+            self._individual.invalidate()
             if constants.TRACE:
                 print(f"rng_trace, random_mutate, 2, {val}", file=sys.stderr)
             sys.stderr.flush()
@@ -78,7 +130,7 @@ class Individual(object):
     def __init__(self, packet: Packet, parents: Union[Tuple[UUID, UUID], Tuple[None, None]] = (None, None)):
         self._pkt = packet
         self._chromosomes = self._build_chromosomes()
-        self._identifier = uuid.UUID(int=stdrandom.getrandbits(128))
+        self._identifier = uuid.UUID(int=_rng.std.getrandbits(128))
         if constants.TRACE:
             print(f"rng_trace, Individual(), 1, {self._identifier}", file=sys.stderr)
         self._parents = parents
@@ -86,6 +138,7 @@ class Individual(object):
         self.index = -1
         self._species = None
         self.seed_corpus = False
+        self._serialized = None
 
     def _mix_genes_on_birth(self, genetics: Dict[str, Chromosome]):
         for name, chromo in genetics.items():
@@ -99,7 +152,7 @@ class Individual(object):
 
     def random_mutation(self):
         keys = sorted(set(self._chromosomes))
-        mutation_field = random.choice(keys)
+        mutation_field = _rng.np.choice(keys)
         if constants.TRACE:
             print(f"rng_trace, random_mutation, 1, {mutation_field}", file=sys.stderr)
         self._chromosomes[mutation_field].random_mutate()
@@ -111,6 +164,11 @@ class Individual(object):
         child._mix_genes_on_birth(genetics)
         return child
 
+    def clone(self) -> "Individual":
+        child = Individual(self._pkt.copy(), parents=(self.identity, None))
+        child.species = self.species
+        return child
+
     @property
     def parents(self) -> Union[Tuple[UUID, UUID], Tuple[None, None]]:
         return self._parents
@@ -132,7 +190,13 @@ class Individual(object):
         return self._chromosomes
 
     def serialize(self) -> bytes:
-        return bytes(self._pkt)
+        # cached, chromosomes invalidate the cache whenever they change the packet
+        if self._serialized is None:
+            self._serialized = bytes(self._pkt)
+        return self._serialized
+
+    def invalidate(self):
+        self._serialized = None
 
     def compatible(self, other: "Individual") -> bool:
         return all([set(self.chromosomes) == set(other.chromosomes), self.species == other.species])
@@ -150,7 +214,7 @@ class Crossover:
     def single_point(a: Dict[str, Chromosome], b: Dict[str, Chromosome]) -> Dict[str, Chromosome]:
         c = {}
         keys = sorted(set(a))
-        point = random.randint(0, len(keys))
+        point = _rng.np.randint(0, len(keys))
         if constants.TRACE:
             print(f"rng_trace, single_point, 1, {point}", file=sys.stderr)
         for k in keys[:point]:
@@ -172,8 +236,13 @@ class Population(object):
         self._pop = []
         self.crossovers = 0
         self.spot_mutations = 0
+        self.culled = 0
         self.recv_after_send = False
         self._stateg = TransitionGraph(self)
+        # incremented on every change of the queue, see adopt()
+        self.version = 0
+        # guards the queue if children are bred in the background (see pipeline.py)
+        self.lock = threading.RLock()
 
     @property
     def state_graph(self) -> TransitionGraph:
@@ -183,6 +252,7 @@ class Population(object):
         identical = any(o.identical(child) for o in self._pop)
         if identical:
             return
+        self.version += 1
         parents = []
         for pid in child.parents:
             if pid in self._pop_by_id:
@@ -216,18 +286,110 @@ class Population(object):
     def shrink(self, size: int):
         if size == 0 or size >= len(self._pop):
             return
+        self.version += 1
         dying = self._pop.pop(len(self._pop) - 1)
         if dying.identity in self._pop_by_id:
             del self._pop_by_id[dying.identity]
 
+    def cull(self, evict: bool = False) -> int:
+        """
+        Corpus culling (cmin): compute a greedy minimal set of individuals covering the union of all edges that
+        were traced by the population's test cases. Seed individuals and individuals without a trace are always
+        kept. All other individuals outside the covering set are redundant: they are either demoted to the end
+        of the queue, so that shrink() evicts them first, or evicted right away.
+
+        @param evict: evict redundant individuals instead of demoting them
+        @return: number of redundant individuals
+        """
+        covered = np.zeros(constants.INSTR_AFL_MAP_SIZE, dtype=bool)
+        candidates = []
+        for pos, indiv in enumerate(self._pop):
+            if indiv.testcase is None or indiv.testcase.trace is None:
+                continue
+            if indiv.seed_corpus:
+                covered[indiv.testcase.trace] = True
+                continue
+            candidates += [(-len(indiv.testcase.trace), pos, indiv)]
+        # lazy greedy set cover: gains can only shrink, so a popped entry whose gain is still up to date is optimal
+        heapq.heapify(candidates)
+        favored = set()
+        while len(candidates) > 0:
+            gain, pos, indiv = heapq.heappop(candidates)
+            actual = np.count_nonzero(~covered[indiv.testcase.trace])
+            if actual == 0:
+                continue
+            if actual < -gain:
+                heapq.heappush(candidates, (-actual, pos, indiv))
+                continue
+            covered[indiv.testcase.trace] = True
+            favored.add(indiv.identity)
+        redundant = [i for i in self._pop if i.testcase is not None and i.testcase.trace is not None
+                     and not i.seed_corpus and i.identity not in favored]
+        if len(redundant) == 0:
+            return 0
+        self.version += 1
+        dropped = set(i.identity for i in redundant)
+        self._pop = [i for i in self._pop if i.identity not in dropped]
+        if evict:
+            for indiv in redundant:
+                del self._pop_by_id[indiv.identity]
+        else:
+            self._pop += redundant
+        for idx, indiv in enumerate(self._pop):
+            indiv.index = idx
+        self.culled += len(redundant)
+        if constants.TRACE:
+            print(f"cull_trace, {self.species}, {len(favored)}, {len(redundant)}", file=sys.stderr)
+        return len(redundant)
+
     @property
     def species(self):
         return self._pop[0].species if len(self._pop) > 0 else ""
 
+    def state(self) -> Dict[str, Any]:
+        """
+        Picklable snapshot of the population for checkpoints: individuals in queue order (identity, parents,
+        serialized packet, seed flag) and the operator counters.
+        """
+        return {
+            "individuals": [(i.identity, i.parents, i.serialize(), i.seed_corpus) for i in self._pop],
+            "crossovers": self.crossovers,
+            "spot_mutations": self.spot_mutations,
+            "culled": self.culled,
+        }
+
+    def restore(self, state: Dict[str, Any]):
+        """
+        Replace all individuals by the ones of a checkpoint (see state()). Packets are dissected with the
+        class of the population's current individuals, so the population must have been generated already.
+
+        @param state: population snapshot
+        """
+        species = self.species
+        cls = type(self._pop[0]._pkt)
+        self.version += 1
+        self._pop = []
+        self._pop_by_id = {}
+        self._seed_pop = []
+        for idx, (identity, parents, data, seed_corpus) in enumerate(state["individuals"]):
+            indiv = Individual(cls(data), parents=tuple(parents))
+            indiv._identifier = identity
+            indiv.species = species
+            indiv.index = idx
+            indiv.seed_corpus = seed_corpus
+            self._pop.append(indiv)
+            self._pop_by_id[identity] = indiv
+            if seed_corpus:
+                self._seed_pop += [indiv]
+        self.crossovers = state["crossovers"]
+        self.spot_mutations = state["spot_mutations"]
+        self.culled = state["culled"]
+
     def add(self, individual: Individual, seed_corpus=True) -> bool:
         same_species = len(self._pop) == 0 or self._pop[0].compatible(individual)
         identical = any(o.identical(individual) for o in self._pop)
         if same_species and not identical:
+            self.version += 1
             self._pop.append(individual)
             self._pop_by_id[individual.identity] = individual
             if seed_corpus:
@@ -238,7 +400,7 @@ class Population(object):
     def new_child(self):
         a_sampler = Population.truncated_uniform_choice
         b_sampler = Population.truncated_uniform_choice
-        rng = random.random()
+        rng = _rng.np.random()
         if constants.TRACE:
             print(f"rng_trace, single_point, 1, {rng}", file=sys.stderr)
         if rng <= 0.5:
@@ -256,7 +418,7 @@ class Population(object):
         self.crossovers += 1
         # give birth
         c = a.give_birth(b, child_chromos)
-        rng = random.random()
+        rng = _rng.np.random()
         if constants.TRACE:
             print(f"rng_trace, new_child, 2, {rng}", file=sys.stderr)
         if rng <= self._p_mutation:
@@ -264,12 +426,32 @@ class Population(object):
             c.random_mutation()
         return c
 
+    def adopt(self, child: Individual) -> bool:
+        """
+        Check whether a child that was bred from an older version of the population can still be evaluated:
+        all of its parents have to be alive. Their queue positions are refreshed, as update() relies on them.
+
+        @param child: child bred by new_child()
+        @return: False if a parent has been evicted in the meantime
+        """
+        parents = [self._pop_by_id.get(pid, None) for pid in child.parents if pid is not None]
+        if any(p is None for p in parents):
+            return False
+        positions = {indiv.identity: idx for idx, indiv in enumerate(self._pop)}
+        if any(p.identity not in positions for p in parents):
+            return False
+        for p in parents:
+            p.index = positions[p.identity]
+        return True
+
     def shuffle(self):
         if constants.TRACE:
             print(f"rng_trace, shuffle, 1, -", file=sys.stderr)
-        random.shuffle(self._pop)
+        _rng.np.shuffle(self._pop)
+        self.version += 1
 
     def reseed(self, shrink_size: int):
+        self.version += 1
         for seed_indiv in self._seed_pop:
             try:
                 self._pop.remove(seed_indiv)
@@ -290,35 +472,48 @@ class Population(object):
     def truncated_exp_choice(pop):
         x = len(pop) + 1
         while x >= len(pop):
-            x = random.exponential() * len(pop)
+            x = _rng.np.exponential() * len(pop)
             if constants.TRACE:
                 print(f"rng_trace, truncated_exp_choice, 1, {x}", file=sys.stderr)
         return pop[int(x)], int(x)
 
     @staticmethod
     def truncated_uniform_choice(pop):
-        x = random.randint(low=0, high=len(pop), dtype=int)
+        x = _rng.np.randint(low=0, high=len(pop), dtype=int)
         if constants.TRACE:
             print(f"rng_trace, truncated_uniform_choice, 1, {x}", file=sys.stderr)
         return pop[x], x
 
 
     @staticmethod
-    def generate(pcap_filename: str,
-                 layer_filter: Callable[[Packet], Union[Packet, None]] = lambda x: x,
-                 population_identifier: Callable[[Packet], str] = lambda x: x.name,
+    def generate(pcap_filename: Union[str, List[str]],
+                 layer_filter: Callable[[Packet], Union[Packet, None]] = ingest.default_layer_filter,
+                 population_identifier: Callable[[Packet], str] = ingest.default_identifier,
                  population_crossover_operator: Callable[[Dict[str, Chromosome], Dict[str, Chromosome]],
                                                          Dict[str, Chromosome]] = Crossover.single_point,
                  population_mutation_probability: float = 0.8,
+                 cache_dir: str = '',
+                 cache_key: str = '',
+                 workers: int = 0,
+                 max_seeds: int = 0,
                  ) -> Dict[str, "Population"]:
-        pkts = rdpcap(pcap_filename)
+        """
+        Generate the populations from the packets of one or more capture files or directories (see ingest.seeds()).
+
+        If a cache directory is given, the deduplicated seeds are cached under `cache_key` (see seed_cache.key())
+        and later calls load them from there instead of dissecting the captures again.
+        """
+        seeds = seed_cache.load(cache_dir, cache_key) if cache_dir != '' else None
+        if seeds is None:
+            seeds = ingest.seeds(pcap_filename, layer_filter, population_identifier, workers=workers,
+                                 max_per_species=max_seeds)
+            if cache_dir != '':
+                seed_cache.save(cache_dir, cache_key, seeds)
+        elif constants.TRACE:
+            print(f"seed_cache_trace, {cache_key}, {len(seeds)}", file=sys.stderr)
         populations = {}
-        for pkt in pkts:
-            stripped = layer_filter(pkt)
-            if stripped is None:
-                continue
-            indiv = Individual(stripped)
-            species = population_identifier(stripped)
+        for species, pkt in seeds:
+            indiv = Individual(pkt)
             indiv.species = species
             if indiv.species not in populations:
                 populations[indiv.species] = Population(
@@ -333,7 +528,7 @@ class Population(object):
             if len(pop) < 2:
                 clone = Individual(pop._pop[0]._pkt.copy())
                 clone.species = pop.species
-                n = stdrandom.randint(1, len(clone.chromosomes))
+                n = _rng.std.randint(1, len(clone.chromosomes))
                 if constants.TRACE:
                     print(f"rng_trace, generate, 1, {n}", file=sys.stderr)
                 for i in range(1, n):
@@ -341,3 +536,215 @@ class Population(object):
                 pop.add(clone)
         return populations
 
+
+
+class Sequence(object):
+    """
+    Multi-message genome: an ordered list of individuals of one or more populations that are sent within a single
+    connection. Provides the interface of Individual that the session and the population operate on.
+    """
+
+    SPECIES = 'Sequence'
+
+    def __init__(self, members: List[Individual], parents: Union[Tuple[UUID, UUID], Tuple[None, None]] = (None, None)):
+        self.members = members
+        self._identifier = uuid.UUID(int=_rng.std.getrandbits(128))
+        if constants.TRACE:
+            print(f"rng_trace, Sequence(), 1, {self._identifier}", file=sys.stderr)
+        self._parents = parents
+        self.testcase = None
+        self.index = -1
+        self.seed_corpus = False
+
+    @property
+    def parents(self) -> Union[Tuple[UUID, UUID], Tuple[None, None]]:
+        return self._parents
+
+    @property
+    def identity(self):
+        return self._identifier
+
+    @property
+    def species(self) -> str:
+        return Sequence.SPECIES
+
+    @property
+    def chromosomes(self) -> Dict[str, Chromosome]:
+        """Chromosomes of all members, keyed by <position>.<field name>"""
+        return {f'{i}.{name}': chromo for i, m in enumerate(self.members) for name, chromo in m.chromosomes.items()}
+
+    def random_mutation(self):
+        pos = _rng.np.randint(0, len(self.members))
+        if constants.TRACE:
+            print(f"rng_trace, sequence_mutation, 1, {pos}", file=sys.stderr)
+        self.members[pos].random_mutation()
+
+    def clone(self) -> "Sequence":
+        return Sequence([m.clone() for m in self.members], parents=(self.identity, None))
+
+    def serialize(self, strict: bool = True) -> bytes:
+        """
+        @param strict: raise if a member can not be serialized, otherwise leave it out
+        @return: concatenated payloads of the members
+        """
+        if strict:
+            return b''.join(m.serialize() for m in self.members)
+        payloads = []
+        for m in self.members:
+            try:
+                payloads.append(m.serialize())
+            except Exception:
+                pass
+        return b''.join(payloads)
+
+    def compatible(self, other: "Sequence") -> bool:
+        return isinstance(other, Sequence)
+
+    def identical(self, other: "Sequence") -> bool:
+        if not self.compatible(other) or len(self.members) != len(other.members):
+            return False
+        return all(a.identical(b) for a, b in zip(self.members, other.members))
+
+
+class SequencePopulation(Population):
+    """
+    Population of Sequences. Children are bred with one of four sequence-level operators, chosen uniformly:
+
+    - splice: head of the first parent followed by the tail of the second one
+    - insert: a member of the second parent is inserted into the first parent at a random position
+    - delete: a random member of the first parent is removed
+    - swap: two members of the first parent change places
+
+    Afterwards, a random member is spot mutated with the population's mutation probability. Children consist of
+    copies of their parents' members, the parents are never modified. A child with a member that can not be
+    serialized (e.g. a mutated length field out of range) is drawn again, after ATTEMPTS failed draws the child is
+    an unmutated copy of the fittest sequence.
+
+    Args:
+        populations (Dict[str, Population]): populations the members stem from
+        max_length (int): maximum number of members per sequence
+        p_mutation (float): spot mutation probability
+    """
+
+    OPERATORS = ('splice', 'insert', 'delete', 'swap')
+    ATTEMPTS = 16
+
+    def __init__(self, populations: Dict[str, Population], max_length: int = 4, p_mutation: float = 0.8):
+        super().__init__(p_mutation=p_mutation)
+        self.member_populations = populations
+        self.max_length = max_length
+        self.operations = {op: 0 for op in SequencePopulation.OPERATORS}
+        self.redrawn = 0
+        # sequences take the transitions of their members' populations
+        self.state_graph.finalize_pre()
+        self.state_graph.finalize_post()
+
+    def new_child(self):
+        for _ in range(SequencePopulation.ATTEMPTS):
+            c = self._draw_child()
+            try:
+                # every member is serialized and cached, so the sequence can be sent and stored
+                c.serialize()
+                return c
+            except Exception as e:
+                self.redrawn += 1
+                if constants.TRACE:
+                    print(f"sequence_trace, redrawn, {e}", file=sys.stderr)
+        return self._pop[0].clone()
+
+    def _draw_child(self) -> Sequence:
+        a_sampler = Population.truncated_uniform_choice
+        b_sampler = Population.truncated_uniform_choice
+        rng = _rng.np.random()
+        if constants.TRACE:
+            print(f"rng_trace, sequence_child, 1, {rng}", file=sys.stderr)
+        if rng <= 0.5:
+            a_sampler = Population.truncated_exp_choice
+        else:
+            b_sampler = Population.truncated_exp_choice
+        a, a_idx = a_sampler(self._pop)
+        b, b_idx = (a, a_idx)
+        while b == a:
+            b, b_idx = b_sampler(self._pop)
+        a.index = a_idx
+        b.index = b_idx
+        op = SequencePopulation.OPERATORS[_rng.np.randint(0, len(SequencePopulation.OPERATORS))]
+        members = list(a.members)
+        if op == 'splice':
+            i = _rng.np.randint(1, len(a.members) + 1)
+            j = _rng.np.randint(0, len(b.members))
+            members = a.members[:i] + b.members[j:]
+        elif op == 'insert' and len(members) < self.max_length:
+            donor = b.members[_rng.np.randint(0, len(b.members))]
+            members.insert(_rng.np.randint(0, len(members) + 1), donor)
+        elif op == 'delete' and len(members) > 1:
+            members.pop(_rng.np.randint(0, len(members)))
+        elif op == 'swap' and len(members) > 1:
+            i, j = _rng.np.choice(len(members), size=2, replace=False)
+            members[i], members[j] = members[j], members[i]
+        if constants.TRACE:
+            print(f"rng_trace, sequence_child, 2, {op}", file=sys.stderr)
+        self.operations[op] += 1
+        self.crossovers += 1
+        c = Sequence([m.clone() for m in members[:self.max_length]], parents=(a.identity, b.identity))
+        rng = _rng.np.random()
+        if constants.TRACE:
+            print(f"rng_trace, sequence_child, 3, {rng}", file=sys.stderr)
+        if rng <= self._p_mutation:
+            self.spot_mutations += 1
+            c.random_mutation()
+        return c
+
+    def state(self) -> Dict[str, Any]:
+        state = super().state()
+        state["individuals"] = [(s.identity, s.parents, [(m.species, m.serialize()) for m in s.members],
+                                 s.seed_corpus) for s in self._pop]
+        state["operations"] = dict(self.operations)
+        return state
+
+    def restore(self, state: Dict[str, Any]):
+        self.version += 1
+        self._pop = []
+        self._pop_by_id = {}
+        self._seed_pop = []
+        for idx, (identity, parents, members, seed_corpus) in enumerate(state["individuals"]):
+            seq = Sequence([self._member(species, data) for species, data in members], parents=tuple(parents))
+            seq._identifier = identity
+            seq.index = idx
+            seq.seed_corpus = seed_corpus
+            self._pop.append(seq)
+            self._pop_by_id[identity] = seq
+            if seed_corpus:
+                self._seed_pop += [seq]
+        self.crossovers = state["crossovers"]
+        self.spot_mutations = state["spot_mutations"]
+        self.culled = state["culled"]
+        self.operations.update(state.get("operations", {}))
+
+    def _member(self, species: str, data: bytes) -> Individual:
+        template = next(iter(self.member_populations[species]))
+        indiv = Individual(type(template._pkt)(data))
+        indiv.species = species
+        return indiv
+
+    @staticmethod
+    def generate(populations: Dict[str, Population], max_length: int, count: int = 0,
+                 p_mutation: float = 0.8) -> "SequencePopulation":
+        """
+        Generate seed sequences from random seed individuals of the given populations.
+
+        @param populations: member populations
+        @param max_length: maximum number of members per sequence
+        @param count: number of seed sequences, defaults to four per population
+        @param p_mutation: spot mutation probability
+        """
+        pop = SequencePopulation(populations, max_length=max_length, p_mutation=p_mutation)
+        seeds = [indiv for key in sorted(populations.keys()) for indiv in populations[key]]
+        count = count if count > 0 else 4 * len(populations)
+        attempts = 0
+        while (len(pop) < count or len(pop) < 2) and attempts < 16 * count:
+            attempts += 1
+            n = _rng.np.randint(1, max_length + 1)
+            members = [seeds[_rng.np.randint(0, len(seeds))].clone() for _ in range(n)]
+            pop.add(Sequence(members), seed_corpus=True)
+        return pop
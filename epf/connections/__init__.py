@@ -4,3 +4,6 @@ Forked from BooFuzz [https://github.com/jtpereyda/boofuzz]
 from .socket_connection import SocketConnection
 from .itarget_connection import ITargetConnection
 from .target import Target
+from .async_connection import AsyncSocketConnection
+
+__all__ = ['SocketConnection', 'ITargetConnection', 'Target', 'AsyncSocketConnection']
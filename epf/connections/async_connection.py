@@ -0,0 +1,120 @@
+import asyncio
+import errno
+import socket
+import ssl
+import struct
+
+from .. import exception
+from ..ip_constants import DEFAULT_MAX_RECV
+from .socket_connection import LOCAL_ERRNOS
+
+
+class AsyncSocketConnection(object):
+    """
+    Non-blocking tcp/ssl connection for the asyncio engine (see async_engine.py).
+
+    Every operation is bounded by its own timeout and by the deadline of the test case it belongs to, whichever
+    expires first. Deadlines are absolute times of the event loop's clock, the loop has to be the thread's current
+    event loop (python 3.6 has no asyncio.get_running_loop()).
+
+    Args:
+        host (str): Hostname or IP address of target system.
+        port (int): Port of target service.
+        proto (str): "tcp" or "ssl". Default "tcp".
+        send_timeout (float): Seconds to wait for connect/send before timing out. Default 5.0.
+        recv_timeout (float): Seconds to wait for recv before timing out. Default 5.0.
+        strategy (str): "graceful", or "abortive"/"rotate" to close with SO_LINGER 0. Source ports are not rotated,
+            see SocketConnection. Default "graceful".
+    """
+    _PROTOCOLS = ["tcp", "ssl"]
+
+    def __init__(self, host, port, proto="tcp", send_timeout=5.0, recv_timeout=5.0, strategy="graceful"):
+        self.host = host
+        self.port = port
+        self.proto = proto.lower()
+        self._send_timeout = send_timeout
+        self._recv_timeout = recv_timeout
+        self.strategy = strategy
+        self._ssl_context = None
+        self._reader = None
+        self._writer = None
+        self.recv_timeout_count = 0
+        self.send_timeout_count = 0
+        self.conn_errors = 0
+        self.local_errors = 0
+        if self.proto not in self._PROTOCOLS:
+            raise exception.EPFRuntimeError("INVALID PROTOCOL SPECIFIED FOR ASYNC CONNECTION: %s" % self.proto)
+
+    @staticmethod
+    def _remaining(timeout: float, deadline: float = None) -> float:
+        if deadline is None:
+            return timeout
+        return max(0.0, min(timeout, deadline - asyncio.get_event_loop().time()))
+
+    async def open(self, deadline: float = None):
+        ctx = None
+        if self.proto == "ssl":
+            if self._ssl_context is None:
+                self._ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+                self._ssl_context.check_hostname = False
+                self._ssl_context.verify_mode = ssl.CERT_NONE
+            ctx = self._ssl_context
+        try:
+            self._reader, self._writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port, ssl=ctx),
+                timeout=self._remaining(self._send_timeout, deadline))
+        except asyncio.TimeoutError:
+            self.send_timeout_count += 1
+            raise exception.EPFTargetConnectionFailedError('ETIMEDOUT')
+        except OSError as e:
+            if e.errno in LOCAL_ERRNOS:
+                self.local_errors += 1
+                raise exception.EPFLocalConnectionError(errno.errorcode.get(e.errno))
+            self.conn_errors += 1
+            raise exception.EPFTargetConnectionFailedError(errno.errorcode.get(e.errno, str(e)))
+        if self.strategy != "graceful":
+            sock = self._writer.get_extra_info('socket')
+            if sock is not None:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+
+    async def send(self, data: bytes, deadline: float = None) -> int:
+        try:
+            self._writer.write(data)
+            await asyncio.wait_for(self._writer.drain(), timeout=self._remaining(self._send_timeout, deadline))
+        except asyncio.TimeoutError:
+            self.send_timeout_count += 1
+            raise exception.EPFTargetRecvTimeout()
+        except OSError as e:
+            self.conn_errors += 1
+            if e.errno in (errno.ECONNRESET, errno.ENETRESET, errno.ETIMEDOUT, errno.EPIPE):
+                raise exception.EPFTargetConnectionReset()
+            raise exception.EPFTargetConnectionAborted(socket_errno=e.errno, socket_errmsg=e.strerror)
+        return len(data)
+
+    async def recv(self, max_bytes: int = DEFAULT_MAX_RECV, deadline: float = None) -> bytes:
+        try:
+            return await asyncio.wait_for(self._reader.read(max_bytes),
+                                          timeout=self._remaining(self._recv_timeout, deadline))
+        except asyncio.TimeoutError:
+            self.recv_timeout_count += 1
+            return b''
+        except OSError as e:
+            self.conn_errors += 1
+            if e.errno == errno.ECONNABORTED:
+                raise exception.EPFTargetConnectionAborted(socket_errno=e.errno, socket_errmsg=e.strerror)
+            raise exception.EPFTargetConnectionReset()
+
+    async def close(self):
+        if self._writer is None:
+            return
+        writer, self._writer, self._reader = self._writer, None, None
+        try:
+            writer.close()
+            if hasattr(writer, 'wait_closed'):  # python >= 3.7
+                await asyncio.wait_for(writer.wait_closed(), timeout=self._send_timeout)
+        except Exception:
+            pass
+
+    @property
+    def info(self):
+        return '{0}:{1}'.format(self.host, self.port)
@@ -40,6 +40,31 @@ class ITargetConnection(object):
         """
         raise NotImplementedError
 
+    def recv_view(self, max_bytes: int = DEFAULT_MAX_RECV) -> memoryview:
+        """
+        Receive up to max_bytes data for inspection only. Connections with a reusable receive buffer override this
+        to avoid copies, the result is then only valid until the next receive.
+
+        :param max_bytes: Maximum number of bytes to receive.
+        :type max_bytes: int
+
+        :return: Received data. Empty if no data is received.
+        """
+        return memoryview(self.recv(max_bytes))
+
+    def poll(self, timeout: float, max_bytes: int = DEFAULT_MAX_RECV) -> memoryview:
+        """
+        Receive whatever arrives within a short timeout, e.g. an unsolicited answer to a message that is sent
+        without receiving afterwards. Not counted as a receive timeout. Connections that do not support it return
+        no data.
+
+        :param timeout: Seconds to wait for data.
+        :param max_bytes: Maximum number of bytes to receive.
+
+        :return: Received data (see recv_view()). Empty if no data arrived in time.
+        """
+        return memoryview(b'')
+
     @abc.abstractmethod
     def recv_all(self, max_bytes: int = DEFAULT_MAX_RECV):
         """
@@ -64,6 +89,24 @@ class ITargetConnection(object):
         """
         raise NotImplementedError
 
+    def prefetch(self, preamble=None):
+        """
+        Speculatively open the next connection in the background, optionally transmitting a preamble
+        (see open()). Connections that do not support it ignore the call.
+
+        :param preamble: sequence of (bytes, recv_after_send) to transmit on the new connection
+        :return: None
+        """
+        pass
+
+    def discard(self):
+        """
+        Drop a speculatively opened connection, e.g. because the target has been restarted.
+
+        :return: None
+        """
+        pass
+
     @property
     @abc.abstractmethod
     def info(self):
@@ -0,0 +1,221 @@
+import ctypes
+import mmap
+import select
+import socket
+import struct
+import time
+from typing import List, Tuple, Union
+
+# see include/uapi/linux/if_ether.h, if_packet.h and filter.h
+ETH_P_ALL = 0x0003
+PACKET_OUTGOING = 4
+SOL_PACKET = 263
+PACKET_RX_RING = 5
+PACKET_VERSION = 10
+TPACKET_V2 = 1
+TP_STATUS_KERNEL = 0
+TP_STATUS_USER = 1
+SO_ATTACH_FILTER = 26
+
+BPF_LD_W_ABS = 0x20
+BPF_LD_H_ABS = 0x28
+BPF_JEQ_K = 0x15
+BPF_RET_K = 0x06
+SKF_AD_OFF = -0x1000
+SKF_AD_PROTOCOL = 0
+SKF_AD_PKTTYPE = 4
+SKF_LL_OFF = -0x200000
+
+# tpacket2_hdr: tp_status, tp_len, tp_snaplen, tp_mac, tp_net, tp_sec, tp_nsec
+TPACKET2_HDR = struct.Struct('IIIHHII')
+
+# (code, jt, jf, k), jt/jf may be REJECT until the program is assembled
+Instruction = Tuple[int, Union[int, str], Union[int, str], int]
+REJECT = 'reject'
+
+
+def _k(value: int) -> int:
+    return value & 0xffffffff
+
+
+def bpf_filter(layer: int, ethertype: int = None, peer_ip: str = None, peer_mac: bytes = None,
+               snaplen: int = 0xffff) -> List[Tuple[int, int, int, int]]:
+    """
+    Classic BPF program accepting the frames received from the target, checks are and-ed:
+
+    - never frames sent by this host (packet type PACKET_OUTGOING)
+    - ethertype (skb protocol) if given, IPv4 if a peer ip is given
+    - source MAC address if given
+    - IPv4 source address if given
+
+    @param layer: 2 if the socket receives link layer frames (SOCK_RAW), 3 for network layer packets (SOCK_DGRAM)
+    @param ethertype: ethertype to accept
+    @param peer_ip: IPv4 address of the target
+    @param peer_mac: MAC address of the target (6 bytes)
+    @param snaplen: bytes of an accepted frame copied to userspace
+    @return: assembled program, (code, jt, jf, k) per instruction
+    """
+    link = 0 if layer == 2 else SKF_LL_OFF
+    net = 14 if layer == 2 else 0
+    if peer_ip is not None and ethertype is None:
+        ethertype = 0x0800
+    prog: List[Instruction] = [
+        (BPF_LD_W_ABS, 0, 0, _k(SKF_AD_OFF + SKF_AD_PKTTYPE)),
+        (BPF_JEQ_K, REJECT, 0, PACKET_OUTGOING),
+    ]
+    if ethertype is not None:
+        prog += [(BPF_LD_W_ABS, 0, 0, _k(SKF_AD_OFF + SKF_AD_PROTOCOL)),
+                 (BPF_JEQ_K, 0, REJECT, ethertype)]
+    if peer_mac is not None:
+        prog += [(BPF_LD_W_ABS, 0, 0, _k(link + 6)),
+                 (BPF_JEQ_K, 0, REJECT, struct.unpack('!I', peer_mac[:4])[0]),
+                 (BPF_LD_H_ABS, 0, 0, _k(link + 10)),
+                 (BPF_JEQ_K, 0, REJECT, struct.unpack('!H', peer_mac[4:6])[0])]
+    if peer_ip is not None:
+        prog += [(BPF_LD_W_ABS, 0, 0, net + 12),
+                 (BPF_JEQ_K, 0, REJECT, struct.unpack('!I', socket.inet_aton(peer_ip))[0])]
+    prog += [(BPF_RET_K, 0, 0, snaplen)]
+    reject = len(prog)
+    prog += [(BPF_RET_K, 0, 0, 0)]
+    return [(code, reject - i - 1 if jt == REJECT else jt, reject - i - 1 if jf == REJECT else jf, k)
+            for i, (code, jt, jf, k) in enumerate(prog)]
+
+
+def parse_mac(mac: str) -> bytes:
+    """aa:bb:cc:dd:ee:ff -> 6 bytes"""
+    raw = bytes.fromhex(mac.replace(':', '').replace('-', ''))
+    if len(raw) != 6:
+        raise ValueError(f'invalid MAC address {mac}')
+    return raw
+
+
+class PacketCapture(object):
+    """
+    Receives the target's responses on an AF_PACKET socket. A classic BPF filter (SO_ATTACH_FILTER) drops all
+    other frames in the kernel, accepted frames are read from a memory-mapped PACKET_RX_RING (TPACKET_V2). If the
+    ring can not be set up, frames are received with recv_into instead.
+
+    Args:
+        interface (str): network interface to capture on
+        layer (int): 2 to receive frames including the link layer header, 3 to receive network layer packets
+        program (list): BPF program, see bpf_filter()
+        ring (bool): use a PACKET_RX_RING. Default True
+        frame_size (int): ring frame size, a multiple of 16. Default 2048
+        frame_nr (int): ring frames. Default 1024
+    """
+
+    def __init__(self, interface: str, layer: int, program: List[Tuple[int, int, int, int]], ring: bool = True,
+                 frame_size: int = 2048, frame_nr: int = 1024):
+        self.interface = interface
+        self.layer = layer
+        self.program = program
+        self.use_ring = ring
+        self.frame_size = frame_size
+        self.frame_nr = frame_nr
+        self._sock = None
+        self._ring = None
+        self._frame = 0
+        self.received = 0
+
+    def open(self):
+        kind = socket.SOCK_RAW if self.layer == 2 else socket.SOCK_DGRAM
+        # protocol 0 receives nothing until bind(), so no frame passes before the filter is attached
+        self._sock = socket.socket(socket.AF_PACKET, kind, 0)
+        try:
+            self._attach_filter()
+            if self.use_ring:
+                self._setup_ring()
+            self._sock.bind((self.interface, ETH_P_ALL))
+        except Exception:
+            self.close()
+            raise
+
+    def _attach_filter(self):
+        insns = b''.join(struct.pack('HBBI', *insn) for insn in self.program)
+        buf = ctypes.create_string_buffer(insns)
+        fprog = struct.pack('HL', len(self.program), ctypes.addressof(buf))
+        self._sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, fprog)
+
+    def _setup_ring(self):
+        block_size = max(mmap.PAGESIZE, self.frame_size)
+        frames_per_block = block_size // self.frame_size
+        block_nr = max(1, self.frame_nr // frames_per_block)
+        self.frame_nr = frames_per_block * block_nr
+        try:
+            self._sock.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V2)
+            self._sock.setsockopt(SOL_PACKET, PACKET_RX_RING,
+                                  struct.pack('IIII', block_size, block_nr, self.frame_size, self.frame_nr))
+            self._ring = mmap.mmap(self._sock.fileno(), block_size * block_nr,
+                                   mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        except OSError:
+            # no ring support, fall back to recv_into
+            self._ring = None
+
+    def recv_into(self, view: memoryview, timeout: float) -> int:
+        """
+        Receive the next accepted frame
+
+        @param view: buffer to copy the frame into, truncated to its length
+        @param timeout: seconds to wait for a frame
+        @return: frame length
+        @raise socket.timeout: if no frame arrived in time
+        """
+        if self._ring is None:
+            self._sock.settimeout(timeout)
+            n = self._sock.recv_into(view)
+            self.received += 1
+            return n
+        deadline = time.monotonic() + timeout
+        while True:
+            n = self._take(view)
+            if n is not None:
+                return n
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([self._sock], [], [], remaining)[0]:
+                raise socket.timeout()
+
+    def _take(self, view: memoryview) -> Union[int, None]:
+        offset = self._frame * self.frame_size
+        status, _, snaplen, mac, net, _, _ = TPACKET2_HDR.unpack_from(self._ring, offset)
+        if not status & TP_STATUS_USER:
+            return None
+        start = offset + (mac if self.layer == 2 else net)
+        n = min(snaplen, len(view))
+        view[:n] = self._ring[start:start + n]
+        # hand the frame back to the kernel
+        struct.pack_into('I', self._ring, offset, TP_STATUS_KERNEL)
+        self._frame = (self._frame + 1) % self.frame_nr
+        self.received += 1
+        return n
+
+    def flush(self) -> int:
+        """
+        Discard all frames captured so far, i.e. responses to previous test cases
+
+        @return: discarded frames
+        """
+        dropped = 0
+        if self._ring is not None:
+            while True:
+                offset = self._frame * self.frame_size
+                if not TPACKET2_HDR.unpack_from(self._ring, offset)[0] & TP_STATUS_USER:
+                    break
+                struct.pack_into('I', self._ring, offset, TP_STATUS_KERNEL)
+                self._frame = (self._frame + 1) % self.frame_nr
+                dropped += 1
+            return dropped
+        while select.select([self._sock], [], [], 0)[0]:
+            try:
+                self._sock.recv(1, socket.MSG_TRUNC)
+            except OSError:
+                break
+            dropped += 1
+        return dropped
+
+    def close(self):
+        if self._ring is not None:
+            self._ring.close()
+            self._ring = None
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
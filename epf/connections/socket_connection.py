@@ -2,20 +2,40 @@
 Forked from BooFuzz [https://github.com/jtpereyda/boofuzz]
 """
 import math
+import select
 import ssl
 import struct
 import sys
 import socket
+import time
 import errno
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
 
 from .. import helpers
 from .itarget_connection import ITargetConnection
+from .packet_capture import PacketCapture, bpf_filter, parse_mac
 from ..ip_constants import DEFAULT_MAX_RECV
 from .. import ip_constants
 from .. import exception
 
 ETH_P_IP = 0x0800  # Ethernet protocol: Internet Protocol packet, see Linux if_ether.h docs for more details.
 
+# connect()/bind() failures caused by the fuzzer's host, not by the target
+LOCAL_ERRNOS = (errno.EADDRNOTAVAIL, errno.EADDRINUSE, errno.EMFILE, errno.ENFILE, errno.ENOBUFS, errno.ENOMEM)
+
+# graceful: close() with FIN, abortive: SO_LINGER 0 (RST, no TIME_WAIT), rotate: abortive + explicit source ports
+STRATEGIES = ['graceful', 'abortive', 'rotate']
+DEFAULT_SOURCE_PORTS = (20000, 29999)
+
+# tcp_info.tcpi_options flag: the SYN data was acked, see include/uapi/linux/tcp.h
+TCPI_OPT_SYN_DATA = 32
+
+# see include/net/tcp_states.h
+TCP_STATES = {1: 'ESTABLISHED', 2: 'SYN_SENT', 3: 'SYN_RECV', 4: 'FIN_WAIT1', 5: 'FIN_WAIT2', 6: 'TIME_WAIT',
+              7: 'CLOSE', 8: 'CLOSE_WAIT', 9: 'LAST_ACK', 10: 'LISTEN', 11: 'CLOSING'}
+
 
 def _seconds_to_second_microsecond_struct(seconds):
     """Convert floating point seconds value to second/useconds struct used by socket library."""
@@ -25,6 +45,54 @@ def _seconds_to_second_microsecond_struct(seconds):
     return struct.pack('ll', whole_seconds, whole_microseconds)
 
 
+def local_tcp_states(port: int = None) -> Dict[str, int]:
+    """
+    Count the local tcp sockets per state (Linux only, read from /proc/net/tcp and /proc/net/tcp6)
+
+    @param port: count only sockets whose remote port is this one
+    @return: socket count per state name, empty if the tables are not available
+    """
+    states = {}
+    for table in ('/proc/net/tcp', '/proc/net/tcp6'):
+        try:
+            with open(table) as f:
+                next(f, None)
+                for line in f:
+                    fields = line.split()
+                    if port is not None and int(fields[2].rsplit(':', 1)[1], 16) != port:
+                        continue
+                    state = TCP_STATES.get(int(fields[3], 16), fields[3])
+                    states[state] = states.get(state, 0) + 1
+        except (OSError, IndexError, ValueError):
+            continue
+    return states
+
+
+class RttStats(object):
+    """Minimum, mean and maximum of handshake durations [sec]"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, rtt: float):
+        self.count += 1
+        self.total += rtt
+        self.min = rtt if self.min is None else min(self.min, rtt)
+        self.max = rtt if self.max is None else max(self.max, rtt)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count > 0 else 0.0
+
+    def __str__(self):
+        if self.count == 0:
+            return '-'
+        return f'{self.min * 1000:.2f}/{self.mean * 1000:.2f}/{self.max * 1000:.2f} [ms min/avg/max]'
+
+
 class SocketConnection(ITargetConnection):
     """ITargetConnection implementation using sockets.
 
@@ -58,6 +126,21 @@ class SocketConnection(ITargetConnection):
             Default '\xFF\xFF\xFF\xFF\xFF\xFF' (broadcast).
         udp_broadcast (bool): Set to True to enable UDP broadcast. Must supply appropriate broadcast address for send() to
             work, and '' for bind host for recv() to work.
+        speculative (bool): Open the next tcp/ssl connection in the background when prefetch() is called. Default False.
+        strategy (str): Life cycle of tcp/ssl connections ("graceful", "abortive", "rotate"). Default "graceful".
+            abortive: Close with SO_LINGER 0, i.e. a RST instead of a FIN, no socket is left in TIME_WAIT.
+            rotate: Abortive close and bind each connection to the next port of source_ports (SO_REUSEADDR),
+            instead of relying on the ephemeral port range.
+        source_ports (tuple (first, last)): Source port range used by the "rotate" strategy.
+            Default DEFAULT_SOURCE_PORTS.
+        low_latency (bool): Set TCP_NODELAY and TCP_QUICKACK on tcp/ssl connections, and let the first payload of a
+            tcp connection ride on the SYN (TCP Fast Open, Linux, if enabled by the target). Default False.
+        udp_persistent (bool): Keep one connect()ed udp socket across test cases, instead of a new socket per test
+            case. Stale datagrams are drained whenever the connection is opened. Default False.
+        capture (bool): Receive responses of 'raw-l2'/'raw-l3' targets on a packet socket with a kernel BPF filter
+            (frames sent by this host are never accepted). Default True.
+        raw_peer_ip (str): Accept only IPv4 packets from this address ('raw-l2'/'raw-l3'). Default None.
+        raw_peer_mac (str): Accept only frames from this MAC address ('raw-l2'/'raw-l3'). Default None.
     """
     _PROTOCOLS = ["tcp", "ssl", "udp", "raw-l2", "raw-l3"]
     _PROTOCOLS_PORT_REQUIRED = ["tcp", "ssl", "udp"]
@@ -76,7 +159,15 @@ class SocketConnection(ITargetConnection):
                  recv_timeout=5.0,
                  ethernet_proto=ETH_P_IP,
                  l2_dst='\xFF' * 6,
-                 udp_broadcast=False):
+                 udp_broadcast=False,
+                 speculative=False,
+                 strategy='graceful',
+                 source_ports=DEFAULT_SOURCE_PORTS,
+                 low_latency=False,
+                 udp_persistent=False,
+                 capture=True,
+                 raw_peer_ip=None,
+                 raw_peer_mac=None):
         self.MAX_PAYLOADS["udp"] = helpers.get_max_udp_size()
 
         self.host = host
@@ -91,8 +182,46 @@ class SocketConnection(ITargetConnection):
         self.recv_timeout_count = 0
         self.send_timeout_count = 0
         self.conn_errors = 0
+        self.local_errors = 0
+
+        self.low_latency = low_latency
+        self.handshake_rtt = RttStats()
+        self._tfo_supported = hasattr(socket, 'MSG_FASTOPEN')
+        self._tfo_pending = False
+        self._tfo_open = False
+        # a deferred connect failed, connect synchronously until a handshake succeeds (see TestCase.transmit())
+        self._tfo_failed = False
+        self.tfo_sent = 0
+        self.tfo_accepted = 0
+
+        self.udp_persistent = udp_persistent
+        self._udp_sock = None
+        self.udp_stale = 0
+
+        self.capture = capture
+        self.raw_peer_ip = raw_peer_ip
+        self.raw_peer_mac = raw_peer_mac
+        self._capture = None
+        self.capture_stale = 0
+
+        self._ssl_context = None
+        self._tls_session = None
+        self.tls_handshake = RttStats()
+        self.tls_resumed = 0
+
+        self.strategy = strategy
+        self.source_ports = source_ports
+        self._source_port = itertools.cycle(range(source_ports[0], source_ports[1] + 1))
 
         self._sock = None
+        # receive buffers, reused by every receive (see recv_view())
+        self._rx = bytearray(DEFAULT_MAX_RECV)
+        self._prefetch_rx = bytearray(DEFAULT_MAX_RECV)
+        self.speculative = speculative
+        self._executor = None
+        self._pending = None
+        self.prefetch_hits = 0
+        self.prefetch_misses = 0
 
         if self.proto not in self._PROTOCOLS:
             raise exception.EPFRuntimeError("INVALID PROTOCOL SPECIFIED: %s" % self.proto)
@@ -100,6 +229,9 @@ class SocketConnection(ITargetConnection):
         if self.proto in self._PROTOCOLS_PORT_REQUIRED and self.port is None:
             raise ValueError("__init__() argument port required for protocol {0}".format(self.proto))
 
+        if self.strategy not in STRATEGIES:
+            raise exception.EPFRuntimeError("INVALID CONNECTION STRATEGY SPECIFIED: %s" % self.strategy)
+
     def close(self):
         """
         Close connection to the target.
@@ -107,60 +239,356 @@ class SocketConnection(ITargetConnection):
         Returns:
             None
         """
+        if self._sock is self._udp_sock and self._sock is not None:
+            # kept open across test cases
+            return
+        self._tfo_pending = False
+        if self._tfo_open:
+            self._fastopen_info()
+        if self.proto == "ssl":
+            # with TLS 1.3, the session ticket arrives after the handshake
+            try:
+                self._tls_session = self._sock.session or self._tls_session
+            except (AttributeError, ValueError):
+                pass
         self._sock.close()
 
-    def open(self):
+    def open(self, preamble=None) -> bool:
         """
         Opens connection to the target. Make sure to call close!
 
+        If a connection has been opened speculatively (see prefetch()), it is taken over instead of connecting.
+
+        Args:
+            preamble: sequence of (bytes, recv_after_send) the caller is about to transmit first
+
+        Returns:
+            bool: True if the speculatively opened connection has transmitted exactly this preamble already
+        """
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            try:
+                sock, primed = pending.result()
+            except Exception:
+                # the background attempt failed, connect synchronously to report the actual error
+                sock, primed = None, None
+            if sock is not None:
+                if primed is None or (preamble is not None and primed == tuple(preamble)):
+                    self._sock = sock
+                    self.prefetch_hits += 1
+                    return primed is not None
+                # transmitted a different preamble, the connection is not usable for this test case
+                self._close_quietly(sock)
+        if pending is not None:
+            self.prefetch_misses += 1
+        if self.proto in ("raw-l2", "raw-l3") and self.capture:
+            self._open_capture()
+        if self.udp_persistent and self.proto == "udp":
+            if self._udp_sock is None:
+                self._udp_sock = self._connect()
+                self._udp_sock.connect((self.host, self.port))
+            self._sock = self._udp_sock
+            self._drain_stale()
+            return False
+        # the prefetch path transmits with plain send(), so Fast Open is used for synchronous connects only
+        deferred = self.low_latency and self._tfo_supported and self.proto == "tcp" and not self.speculative \
+            and not self._tfo_failed
+        self._sock = self._connect(deferred=deferred)
+        self._tfo_pending = deferred
+        return False
+
+    def _open_capture(self):
+        """Open the response capture of raw connections once, discard frames of previous test cases"""
+        if self._capture is None:
+            layer = 2 if self.proto == "raw-l2" else 3
+            program = bpf_filter(layer,
+                                 ethertype=self.ethernet_proto if self.proto == "raw-l3" else None,
+                                 peer_ip=self.raw_peer_ip,
+                                 peer_mac=parse_mac(self.raw_peer_mac) if self.raw_peer_mac else None,
+                                 snaplen=self.MAX_PAYLOADS[self.proto])
+            capture = PacketCapture(self.host, layer, program)
+            try:
+                capture.open()
+            except OSError as e:
+                self.local_errors += 1
+                raise exception.EPFLocalConnectionError(f'packet capture on {self.host}: {e}')
+            self._capture = capture
+        self.capture_stale += self._capture.flush()
+
+    def _drain_stale(self):
+        """Discard datagrams (and pending ICMP errors) left over from previous test cases"""
+        # poll instead of MSG_DONTWAIT, a socket with a timeout waits for readability before receiving
+        while select.select([self._udp_sock], [], [], 0)[0]:
+            try:
+                self._udp_sock.recv_into(self._rx)
+                self.udp_stale += 1
+            except ConnectionRefusedError:
+                # icmp port unreachable of an earlier datagram, consumed by this call
+                continue
+            except OSError:
+                return
+
+    def prefetch(self, preamble=None):
+        """
+        Open the next connection in the background, while the caller is busy with other work. Only tcp and ssl
+        connections are opened speculatively, and only if the connection was created with speculative=True.
+
+        Args:
+            preamble: sequence of (bytes, recv_after_send) to transmit on the new connection
+
+        Returns:
+            None
+        """
+        if not self.speculative or self.proto not in ("tcp", "ssl") or self._pending is not None:
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='epf-prefetch')
+        preamble = tuple(preamble) if preamble is not None else None
+        self._pending = self._executor.submit(self._prefetch, preamble)
+
+    def _prefetch(self, preamble):
+        sock = self._connect()
+        if preamble is None:
+            return sock, None
+        try:
+            for data, recv in preamble:
+                sock.send(data[:self.MAX_PAYLOADS.get(self.proto, len(data))])
+                if recv:
+                    # runs next to the session thread, keep off the main receive buffer
+                    sock.recv_into(self._prefetch_rx)
+        except Exception:
+            self._close_quietly(sock)
+            raise
+        return sock, preamble
+
+    def discard(self):
+        """
+        Drop the speculatively opened connection, if there is one.
+
         Returns:
             None
         """
+        pending, self._pending = self._pending, None
+        if pending is None:
+            return
+        try:
+            sock, _ = pending.result()
+            self._close_quietly(sock)
+        except Exception:
+            pass
+
+    @staticmethod
+    def _close_quietly(sock):
+        try:
+            sock.close()
+        except Exception:
+            pass
+
+    def _connect(self, deferred=False):
+        """
+        Create a socket and connect it (tcp, ssl)
+
+        Args:
+            deferred: leave connecting to the first send() (TCP Fast Open)
+
+        Returns:
+            socket: the new socket
+        """
         # Create socket
         if self.proto == "tcp" or self.proto == "ssl":
-            self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock = self._stream_socket()
+            if self.low_latency:
+                self._low_latency(sock)
         elif self.proto == "udp":
-            self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
             if self.bind:
-                self._sock.bind(('0.0.0.0', self.bind))
+                sock.bind(('0.0.0.0', self.bind))
             if self._udp_broadcast:
-                self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, True)
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, True)
         elif self.proto == "raw-l2":
-            self._sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW)
+            sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW)
         elif self.proto == "raw-l3":
-            self._sock = socket.socket(socket.AF_PACKET, socket.SOCK_DGRAM)
+            sock = socket.socket(socket.AF_PACKET, socket.SOCK_DGRAM)
         else:
             raise exception.EPFRuntimeError("INVALID PROTOCOL SPECIFIED: %s" % self.proto)
 
-        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDTIMEO, _seconds_to_second_microsecond_struct(self._send_timeout))
-        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVTIMEO, _seconds_to_second_microsecond_struct(self._recv_timeout))
-        # self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, _seconds_to_second_microsecond_struct(self._recv_timeout))
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDTIMEO, _seconds_to_second_microsecond_struct(self._send_timeout))
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVTIMEO, _seconds_to_second_microsecond_struct(self._recv_timeout))
+        # sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, _seconds_to_second_microsecond_struct(self._recv_timeout))
 
-        # Connect is needed only for TCP protocols
-        if self.proto == "tcp" or self.proto == "ssl":
-            try:
-                self._sock.settimeout(self._recv_timeout)
-                self._sock.connect((self.host, self.port))
-            except (socket.timeout, TimeoutError) as e:
-                self.send_timeout_count += 1
-                raise exception.EPFTargetConnectionFailedError('ETIMEDOUT')
-            except OSError as e:  # socket.error
-                self.conn_errors += 1
-                if e.errno == errno.ECONNREFUSED:
-                    # raise exception.EPFTargetConnectionFailedError(e.message)
-                    raise exception.EPFTargetConnectionFailedError('ECONNREFUSED')
-                elif e.errno == errno.EALREADY:
-                    raise exception.EPFTargetConnectionFailedError('EALREADY')
-                elif e.errno == errno.EINPROGRESS:
-                    raise exception.EPFTargetConnectionFailedError('EINPROGRESS')
-                else:  # ??
-                    raise exception.EPFTargetConnectionFailedError(errno.errorcode.get(e.errno))
+        # Connect is needed only for TCP protocols, unless the first send() does so (TCP Fast Open)
+        if (self.proto == "tcp" or self.proto == "ssl") and not deferred:
+            self._handshake(sock)
 
         # if SSL is requested, then enable it.
         if self.proto == "ssl":
-            ssl_sock = ssl.wrap_socket(self._sock)
-            # TODO: Python3 change, maybe should use a context instead of deprecated ssl.wrap_socket?
-            self._sock = ssl_sock
+            sock = self._tls_handshake(sock)
+        return sock
+
+    def _tls_context(self) -> ssl.SSLContext:
+        """The connection's TLS client context, created once. Certificates are not verified."""
+        if self._ssl_context is None:
+            ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+            ctx.check_hostname = False
+            ctx.verify_mode = ssl.CERT_NONE
+            self._ssl_context = ctx
+        return self._ssl_context
+
+    def _tls_handshake(self, sock):
+        """
+        Wrap a connected socket, resuming the TLS session of the previous connection if possible
+
+        Args:
+            sock: connected tcp socket
+
+        Returns:
+            ssl.SSLSocket: the wrapped socket
+        """
+        try:
+            t_start = time.monotonic()
+            ssl_sock = self._tls_context().wrap_socket(sock, session=self._tls_session)
+            self.tls_handshake.add(time.monotonic() - t_start)
+        except (ssl.SSLError, OSError) as e:
+            self._close_quietly(sock)
+            self.conn_errors += 1
+            # a session the target does not accept anymore must not fail all following handshakes
+            self._tls_session = None
+            raise exception.EPFTargetConnectionFailedError(f'TLS handshake failed: {e}')
+        if ssl_sock.session_reused:
+            self.tls_resumed += 1
+        self._tls_session = ssl_sock.session
+        return ssl_sock
+
+    def _handshake(self, sock):
+        """
+        Connect a tcp socket, recording the handshake round trip time
+
+        Args:
+            sock: unconnected socket
+        """
+        try:
+            sock.settimeout(self._recv_timeout)
+            t_start = time.monotonic()
+            sock.connect((self.host, self.port))
+            self.handshake_rtt.add(time.monotonic() - t_start)
+            self._tfo_failed = False
+        except (socket.timeout, TimeoutError) as e:
+            self._close_quietly(sock)
+            self.send_timeout_count += 1
+            raise exception.EPFTargetConnectionFailedError('ETIMEDOUT')
+        except OSError as e:  # socket.error
+            self._connect_failed(sock, e)
+
+    def _connect_failed(self, sock, e: OSError):
+        """Close the socket of a failed connect and raise the matching error"""
+        self._close_quietly(sock)
+        if e.errno in LOCAL_ERRNOS:
+            self.local_errors += 1
+            raise exception.EPFLocalConnectionError(errno.errorcode.get(e.errno))
+        self.conn_errors += 1
+        if e.errno == errno.ECONNREFUSED:
+            # raise exception.EPFTargetConnectionFailedError(e.message)
+            raise exception.EPFTargetConnectionFailedError('ECONNREFUSED')
+        elif e.errno == errno.EALREADY:
+            raise exception.EPFTargetConnectionFailedError('EALREADY')
+        elif e.errno == errno.EINPROGRESS:
+            raise exception.EPFTargetConnectionFailedError('EINPROGRESS')
+        else:  # ??
+            raise exception.EPFTargetConnectionFailedError(errno.errorcode.get(e.errno))
+
+    def _send_fastopen(self, data) -> int:
+        """
+        First send() of a deferred connection: the payload rides on the SYN (TCP Fast Open). Falls back to a
+        regular handshake for the rest of the session if the kernel does not support it.
+
+        Returns:
+            int: Number of bytes actually sent.
+
+        Raises:
+            EPFTargetConnectionFailedError, EPFLocalConnectionError: if connecting failed, the next open() then
+            connects synchronously, so that retrying it is meaningful
+        """
+        self._tfo_pending = False
+        try:
+            num_sent = self._fastopen(data)
+        except (exception.EPFTargetConnectionFailedError, exception.EPFLocalConnectionError):
+            self._tfo_failed = True
+            raise
+        # like after _handshake(), receive timeouts raise socket.timeout and are counted. Not set before sendto(),
+        # so that connecting is bounded by SO_SNDTIMEO
+        self._sock.settimeout(self._recv_timeout)
+        return num_sent
+
+    def _fastopen(self, data) -> int:
+        try:
+            num_sent = self._sock.sendto(data, socket.MSG_FASTOPEN, (self.host, self.port))
+        except (socket.timeout, TimeoutError):
+            self._close_quietly(self._sock)
+            self.send_timeout_count += 1
+            raise exception.EPFTargetConnectionFailedError('ETIMEDOUT')
+        except OSError as e:
+            if e.errno == errno.EINPROGRESS:
+                # the socket is blocking: the handshake did not complete within SO_SNDTIMEO
+                self._close_quietly(self._sock)
+                self.send_timeout_count += 1
+                raise exception.EPFTargetConnectionFailedError('ETIMEDOUT')
+            if e.errno not in (errno.EOPNOTSUPP, errno.EPROTONOSUPPORT):
+                self._connect_failed(self._sock, e)
+            self._tfo_supported = False
+            self._handshake(self._sock)
+            return self._sock.send(data)
+        self._tfo_open = True
+        self.tfo_sent += 1
+        return num_sent
+
+    def _fastopen_info(self):
+        """Record rtt and SYN data acceptance of a TCP Fast Open connection from TCP_INFO"""
+        self._tfo_open = False
+        try:
+            info = self._sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_INFO, 104)
+            if info[5] & TCPI_OPT_SYN_DATA:
+                self.tfo_accepted += 1
+            self.handshake_rtt.add(struct.unpack_from('I', info, 68)[0] / 1e6)
+        except (OSError, AttributeError, struct.error):
+            pass
+
+    def _low_latency(self, sock):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if hasattr(socket, 'TCP_QUICKACK'):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+
+    def _stream_socket(self):
+        """
+        Create an unconnected tcp socket according to the connection strategy
+
+        Returns:
+            socket: the new socket
+        """
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        except OSError as e:
+            self.local_errors += 1
+            raise exception.EPFLocalConnectionError(errno.errorcode.get(e.errno))
+        if self.strategy == "graceful":
+            return sock
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+        if self.strategy == "rotate":
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            first, last = self.source_ports
+            for _ in range(min(16, last - first + 1)):
+                try:
+                    sock.bind(('', next(self._source_port)))
+                    break
+                except OSError as e:
+                    if e.errno != errno.EADDRINUSE:
+                        self._close_quietly(sock)
+                        self.local_errors += 1
+                        raise exception.EPFLocalConnectionError(errno.errorcode.get(e.errno))
+            else:
+                self._close_quietly(sock)
+                self.local_errors += 1
+                raise exception.EPFLocalConnectionError('EADDRINUSE')
+        return sock
 
     def recv(self, max_bytes: int = DEFAULT_MAX_RECV):
         """
@@ -172,26 +600,98 @@ class SocketConnection(ITargetConnection):
         Returns:
             Received data.
         """
+        return bytes(self.recv_view(max_bytes))
+
+    def recv_view(self, max_bytes: int = DEFAULT_MAX_RECV) -> memoryview:
+        """
+        Receive up to max_bytes data from the target into the connection's receive buffer, without copying.
+
+        Args:
+            max_bytes (int): Maximum number of bytes to receive.
+
+        Returns:
+            memoryview: Received data, only valid until the next receive. Copy it (bytes()) to retain it.
+        """
+        view = self._rx_view(max_bytes)
+        return view[:self._recv_into(view)]
+
+    def poll(self, timeout: float, max_bytes: int = DEFAULT_MAX_RECV) -> memoryview:
+        """
+        Receive whatever the target sends within timeout seconds, without waiting for the full receive timeout.
+
+        Args:
+            timeout (float): Seconds to wait for data.
+            max_bytes (int): Maximum number of bytes to receive.
+
+        Returns:
+            memoryview: Received data (see recv_view()), empty if nothing arrived in time.
+        """
+        view = self._rx_view(max_bytes)
+        if self.proto in ['raw-l2', 'raw-l3']:
+            try:
+                received = self._capture.recv_into(view, timeout) if self._capture is not None else 0
+            except socket.timeout:
+                received = 0
+            return view[:received]
+        if self._sock is None or self._tfo_pending:
+            return view[:0]
+        # decrypted bytes may be buffered already, the socket is not readable then
+        buffered = self.proto == 'ssl' and self._sock.pending() > 0
+        if not buffered and not select.select([self._sock], [], [], timeout)[0]:
+            return view[:0]
+        return view[:self._recv_into(view)]
+
+    def recv_all(self, max_bytes: int = DEFAULT_MAX_RECV):
+        view = self._rx_view(max_bytes)
+        received = self._recv_into(view)
+        chunk = received
+        while chunk and received < max_bytes:
+            chunk = self._recv_into(view[received:])
+            received += chunk
+        return bytes(view[:received])
+
+    def _rx_view(self, max_bytes: int) -> memoryview:
+        if max_bytes > len(self._rx):
+            # replace instead of resizing, views of the old buffer may still be alive
+            self._rx = bytearray(max_bytes)
+        return memoryview(self._rx)[:max_bytes]
+
+    def _recv_into(self, view: memoryview) -> int:
+        """
+        Receive into a buffer
+
+        Args:
+            view: writable buffer
+
+        Returns:
+            int: Number of bytes received, 0 on timeout
+        """
+        if self._tfo_pending:
+            # nothing has been sent yet, connect the regular way
+            self._tfo_pending = False
+            self._handshake(self._sock)
         try:
             if self.proto in ['tcp', 'ssl']:
-                data = self._sock.recv(max_bytes)
+                received = self._sock.recv_into(view)
+                if self.low_latency and hasattr(socket, 'TCP_QUICKACK'):
+                    # quick ack mode is not permanent, re-arm it
+                    self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
             elif self.proto == 'udp':
                 # Not necessary to bind to a port to use this, right?
                 # if self.bind:
-                data, _ = self._sock.recvfrom(max_bytes)
+                received, _ = self._sock.recvfrom_into(view)
                 # else:
                 #     raise exception.EPFRuntimeError(
                 #         "SocketConnection.recv() for UDP requires a bind address/port."
                 #         " Current value: {}".format(self.bind))
             elif self.proto in ['raw-l2', 'raw-l3']:
-                # receive on raw is not supported. Since there is no specific protocol for raw, we would just have to
-                # dump everything off the interface anyway, which is probably not what the user wants.
-                data = b''
+                # only frames accepted by the capture filter (see packet_capture.bpf_filter()) reach userspace
+                received = self._capture.recv_into(view, self._recv_timeout) if self._capture is not None else 0
             else:
                 raise exception.EPFRuntimeError("INVALID PROTOCOL SPECIFIED: %s" % self.proto)
         except socket.timeout:
             self.recv_timeout_count += 1
-            data = b''
+            received = 0
             # raise exception.EPFTargetRecvTimeout()
         except socket.error as e:
             self.conn_errors += 1
@@ -199,25 +699,18 @@ class SocketConnection(ITargetConnection):
                 raise exception.EPFTargetConnectionAborted(socket_errno=e.errno, socket_errmsg=e.strerror)
             elif (e.errno == errno.ECONNRESET) or \
                     (e.errno == errno.ENETRESET) or \
-                    (e.errno == errno.ETIMEDOUT):
+                    (e.errno == errno.ETIMEDOUT) or \
+                    (e.errno == errno.ECONNREFUSED):  # connected udp: icmp port unreachable
                 # raise(exception.EPFTargetConnectionReset, None, sys.exc_info()[2])
                 raise exception.EPFTargetConnectionReset  # .with_traceback(sys.exc_info()[2])
             # timeout condition if using SO_RCVTIMEO or SO_SNDTIMEO
             elif e.errno == errno.EWOULDBLOCK or e.errno == errno.EAGAIN:
                 # raise exception.EPFTargetRecvTimeout()
-                data = b''
+                received = 0
             else:
                 raise
 
-        return data
-
-    def recv_all(self, max_bytes: int = DEFAULT_MAX_RECV):
-        chunk = self.recv(max_bytes)
-        data = chunk
-        while chunk and len(data) < max_bytes:
-            chunk = self.recv(max_bytes - len(data))
-            data += chunk
-        return data
+        return received
 
     def send(self, data):
         """
@@ -235,9 +728,14 @@ class SocketConnection(ITargetConnection):
         except KeyError:
             pass  # data = data
 
+        if self._tfo_pending:
+            return self._send_fastopen(data)
+
         try:
             if self.proto in ["tcp", "ssl"]:
                 num_sent = self._sock.send(data)
+            elif self.proto == "udp" and self._sock is self._udp_sock:
+                num_sent = self._sock.send(data)
             elif self.proto == "udp":
                 num_sent = self._sock.sendto(data, (self.host, self.port))
             elif self.proto == "raw-l2":
@@ -288,7 +786,15 @@ class SocketConnection(ITargetConnection):
                                       recv_timeout=self._recv_timeout,
                                       ethernet_proto=self.ethernet_proto,
                                       l2_dst=self.l2_dst,
-                                      udp_broadcast=self._udp_broadcast)
+                                      udp_broadcast=self._udp_broadcast,
+                                      speculative=self.speculative,
+                                      strategy=self.strategy,
+                                      source_ports=self.source_ports,
+                                      low_latency=self.low_latency,
+                                      udp_persistent=self.udp_persistent,
+                                      capture=self.capture,
+                                      raw_peer_ip=self.raw_peer_ip,
+                                      raw_peer_mac=self.raw_peer_mac)
         return new_socket
 
 
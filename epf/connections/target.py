@@ -27,13 +27,32 @@ class Target(object):
         """
         self.target_connection.close()
 
-    def open(self):
+    def open(self, preamble=None) -> bool:
         """
         Opens connection to the target. Make sure to call close!
 
+        :param preamble: sequence of (bytes, recv_after_send) the caller is about to transmit first
+        :return: True if a speculatively opened connection has transmitted the preamble already
+        """
+        return bool(self.target_connection.open(preamble=preamble)) if preamble is not None \
+            else bool(self.target_connection.open())
+
+    def prefetch(self, preamble=None):
+        """
+        Speculatively open the next connection in the background (see ITargetConnection.prefetch()).
+
+        :param preamble: sequence of (bytes, recv_after_send) to transmit on the new connection
         :return: None
         """
-        self.target_connection.open()
+        self.target_connection.prefetch(preamble=preamble)
+
+    def discard(self):
+        """
+        Drop a speculatively opened connection, call whenever the target is restarted.
+
+        :return: None
+        """
+        self.target_connection.discard()
 
     def recv(self, max_bytes: int = DEFAULT_MAX_RECV):
         """
@@ -50,6 +69,31 @@ class Target(object):
 
         return data
 
+    def recv_view(self, max_bytes: int = DEFAULT_MAX_RECV) -> memoryview:
+        """
+        Receive up to max_bytes data from the target without copying (see ITargetConnection.recv_view()).
+
+        Args:
+            max_bytes (int): Maximum number of bytes to receive.
+
+        Returns:
+            memoryview: Received data, only valid until the next receive.
+        """
+        return self.target_connection.recv_view(max_bytes=max_bytes)
+
+    def poll(self, timeout: float, max_bytes: int = DEFAULT_MAX_RECV) -> memoryview:
+        """
+        Receive whatever the target sends within timeout seconds (see ITargetConnection.poll()).
+
+        Args:
+            timeout (float): Seconds to wait for data.
+            max_bytes (int): Maximum number of bytes to receive.
+
+        Returns:
+            memoryview: Received data, empty if nothing arrived in time.
+        """
+        return self.target_connection.poll(timeout, max_bytes=max_bytes)
+
     def recv_all(self, max_bytes: int = DEFAULT_MAX_RECV):
         """
         Receive up to max_bytes data from the target. Trying to receive everything
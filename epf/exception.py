@@ -13,6 +13,14 @@ class EPFTargetConnectionFailedError(EPFError):
     pass
 
 
+class EPFLocalConnectionError(EPFError):
+    """
+    Raised if the fuzzer's host fails to set up a connection (e.g. exhausted source ports or file descriptors).
+    The target is not to blame.
+    """
+    pass
+
+
 class EPFPaused(EPFError):
     pass
 
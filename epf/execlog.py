@@ -0,0 +1,209 @@
+#!/usr/bin/python3
+"""
+Compact, append-only binary execution log (execlog.bin).
+
+Each execution is stored as a fixed-size record of the numpy structured dtype RECORD. Identities are stored as
+their 16 raw UUID bytes, species and causes of restart as indices into an append-only string table
+(execlog.strings, one entry per line).
+execlog.json describes the layout. The log can be memory-mapped for zero-copy analysis (see load()) and converted
+into the legacy debug.csv format:
+
+    python3 -m epf.execlog <result_dir> [<out.csv>]
+"""
+import csv
+import json
+import os
+import sys
+import uuid
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from .writer import ResultWriter
+
+VERSION = 2
+LOG_FILE = 'execlog.bin'
+STRINGS_FILE = 'execlog.strings'
+META_FILE = 'execlog.json'
+
+RECORD = np.dtype([
+    ('timestamp', '<f8'),
+    ('iteration', '<u8'),
+    ('test_id', '<u8'),
+    ('individual', 'V16'),          # uuid bytes
+    ('increased_coverage', '?'),
+    ('caused_restart', '?'),
+    ('cause_of_restart', '<u4'),    # string table
+    ('exit_code', '<i4'),
+    ('reported_coverage', '<u4'),
+    ('population', '<u4'),          # string table
+    ('population_size', '<u4'),
+    ('energy', '<f8'),
+    ('energy_period', '<u4'),
+])
+
+CSV_HEADER = [
+    "timestamp",
+    "iteration",
+    "test_id",
+    "individual",
+    "increased_coverage",
+    "caused_restart",
+    "cause_of_restart",
+    "exit_code",
+    "reported_coverage",
+    "population",
+    "population_size",
+    "energy",
+    "energy_period"
+]
+
+
+def _escape(s: str) -> str:
+    return s.replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def _unescape(s: str) -> str:
+    return s.replace('\\n', '\n').replace('\\\\', '\\')
+
+
+class ExecLog(object):
+    """
+    Writer of the binary execution log. Records are collected in a preallocated chunk and handed over to the
+    ResultWriter once the chunk is full (and on flush()/close()), together with all new string table entries.
+
+    Args:
+        directory (str): result directory
+        writer (ResultWriter): asynchronous writer
+        chunk_size (int): records per chunk
+        resume (bool): append to an existing log instead of truncating it
+    """
+
+    def __init__(self, directory: str, writer: ResultWriter, chunk_size: int = 4096, resume: bool = False):
+        self.path = os.path.join(directory, LOG_FILE)
+        self.strings_path = os.path.join(directory, STRINGS_FILE)
+        self.writer = writer
+        self._chunk = np.zeros(chunk_size, dtype=RECORD)
+        self._n = 0
+        self._strings: Dict[str, int] = {}
+        self._new_strings: List[str] = []
+        self.records = 0
+        if resume and os.path.isfile(self.path) and os.path.isfile(self.strings_path):
+            # raises on a log of another layout version
+            records, strings = load(directory)
+            self.records = len(records)
+            self._strings = {s: i for i, s in enumerate(strings)}
+            del records
+            os.truncate(self.path, self.records * RECORD.itemsize)
+            return
+        with open(os.path.join(directory, META_FILE), 'w') as f:
+            json.dump({
+                "version": VERSION,
+                "log": LOG_FILE,
+                "strings": STRINGS_FILE,
+                "dtype": RECORD.descr,
+                "record_size": RECORD.itemsize,
+            }, f, indent=2)
+        open(self.path, 'wb').close()
+        open(self.strings_path, 'w').close()
+
+    def intern(self, s: str) -> int:
+        idx = self._strings.get(s, None)
+        if idx is None:
+            idx = len(self._strings)
+            self._strings[s] = idx
+            self._new_strings += [s]
+        return idx
+
+    def append(self, timestamp: float, iteration: int, test_id: int, individual: uuid.UUID, increased_coverage: bool,
+               caused_restart: bool, cause_of_restart: str, exit_code: int, reported_coverage: int, population: str,
+               population_size: int, energy: float, energy_period: int):
+        self._chunk[self._n] = (timestamp, iteration, test_id, individual.bytes, increased_coverage,
+                                caused_restart, self.intern(cause_of_restart), exit_code, reported_coverage,
+                                self.intern(population), population_size, energy, energy_period)
+        self._n += 1
+        self.records += 1
+        if self._n == len(self._chunk):
+            self.flush()
+
+    def flush(self):
+        # string table entries go first, so that every record that has been written can be resolved
+        if len(self._new_strings) > 0:
+            data = ''.join(_escape(s) + '\n' for s in self._new_strings).encode('utf-8')
+            self.writer.write_file(self.strings_path, data, critical=True, append=True)
+            self._new_strings = []
+        if self._n > 0:
+            self.writer.write_file(self.path, self._chunk[:self._n].tobytes(), critical=True, append=True)
+            self._n = 0
+
+    def close(self):
+        self.flush()
+
+
+def load(directory: str) -> Tuple[np.ndarray, List[str]]:
+    """
+    Memory-map an execution log
+
+    @param directory: result directory
+    @return: (records, string table)
+    @raise ValueError: if the log has been written with another layout version
+    """
+    meta = os.path.join(directory, META_FILE)
+    if os.path.isfile(meta):
+        with open(meta) as f:
+            version = json.load(f).get("version", None)
+        if version != VERSION:
+            raise ValueError(f"unsupported execution log version {version}")
+    with open(os.path.join(directory, STRINGS_FILE), encoding='utf-8') as f:
+        strings = [_unescape(line.rstrip('\n')) for line in f]
+    path = os.path.join(directory, LOG_FILE)
+    # ignore a torn record at the end of an interrupted run
+    count = os.path.getsize(path) // RECORD.itemsize
+    if count == 0:
+        return np.zeros(0, dtype=RECORD), strings
+    return np.memmap(path, dtype=RECORD, mode='r', shape=(count,)), strings
+
+
+def to_csv(directory: str, out: str = None) -> str:
+    """
+    Convert an execution log into the legacy debug.csv format
+
+    @param directory: result directory
+    @param out: output file, defaults to <directory>/debug.csv
+    @return: path of the csv file
+    """
+    records, strings = load(directory)
+    out = os.path.join(directory, 'debug.csv') if out is None else out
+    with open(out, 'w') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_HEADER)
+        writer.writeheader()
+        for r in records:
+            identity = str(uuid.UUID(bytes=r['individual'].tobytes()))
+            population = strings[r['population']]
+            writer.writerow({
+                "timestamp": round(float(r['timestamp']), 2),
+                "iteration": int(r['iteration']),
+                "test_id": f"{int(r['test_id'])}.{population.replace(' ', '_')}.{identity[-12:]}",
+                "individual": identity,
+                "increased_coverage": bool(r['increased_coverage']),
+                "caused_restart": bool(r['caused_restart']),
+                "cause_of_restart": strings[r['cause_of_restart']],
+                "exit_code": int(r['exit_code']),
+                "reported_coverage": int(r['reported_coverage']),
+                "population": population,
+                "population_size": int(r['population_size']),
+                "energy": float(r['energy']),
+                "energy_period": int(r['energy_period']),
+            })
+    return out
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("usage: python3 -m epf.execlog <result_dir> [<out.csv>]")
+        sys.exit(1)
+    print(to_csv(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+from typing import Callable, Hashable, Iterable, List
+
+
+class ResponseFeedback(object):
+    """
+    Secondary novelty signal for targets whose instrumentation is partial: the structural fingerprint of every
+    response to a fuzzed message (see IFuzzer.fingerprint()) is looked up in a bounded set, a fingerprint that has
+    not been seen before counts as a novelty event like new coverage. Once the set is full, the oldest fingerprints
+    are forgotten first.
+
+    Args:
+        fingerprint (callable): maps a response (bytes-like) to a hashable fingerprint
+        capacity (int): maximum number of fingerprints kept. Default 65536
+        poll_timeout (float): time to wait for a response to a fuzzed message that is not received otherwise [sec].
+                              Default 0.05
+    """
+
+    def __init__(self, fingerprint: Callable[[bytes], Hashable], capacity: int = 65536, poll_timeout: float = 0.05):
+        self.fingerprint = fingerprint
+        self.capacity = capacity
+        self.poll_timeout = poll_timeout
+        # insertion ordered, i.e. a set with FIFO eviction
+        self._seen = {}
+        self.novel = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self._seen)
+
+    def observe(self, fingerprints: Iterable[Hashable]) -> bool:
+        """
+        Add the response fingerprints of a test case
+
+        @param fingerprints: fingerprints of the responses
+        @return: True if at least one of them has not been seen before
+        """
+        new = False
+        for fp in fingerprints:
+            if fp in self._seen:
+                continue
+            self._seen[fp] = None
+            if len(self._seen) > self.capacity:
+                del self._seen[next(iter(self._seen))]
+                self.evicted += 1
+            new = True
+        if new:
+            self.novel += 1
+        return new
+
+    def state(self) -> List[Hashable]:
+        """Known fingerprints, oldest first (see checkpoint.save())"""
+        return list(self._seen)
+
+    def restore(self, fingerprints: List[Hashable]):
+        self._seen = dict.fromkeys(fingerprints[-self.capacity:])
+
+    @property
+    def info(self) -> str:
+        return f'{len(self._seen)} [# known], {self.novel} [# novel test cases]'
@@ -1,8 +1,9 @@
-from typing import Union, Dict
+import struct
+from typing import Union, Dict, Hashable, List
 
 from epf.fuzzers.ifuzzer import IFuzzer
-from epf import Session, constants
-from epf.transition_payload import TransitionPayload
+from epf import Session, constants, seed_cache
+from epf.transition_payload import TransitionPayload, learn_transitions
 from epf.chromo import Population, Crossover
 from scapy.contrib.scada.iec104 import IEC104_APDU_CLASSES
 from scapy.packet import Packet
@@ -10,6 +11,7 @@ from scapy.packet import Packet
 
 class IEC104(IFuzzer):
     name = 'iec104'
+    filter_version = 1
     pcap_file = ''
     populations = {}
 
@@ -24,6 +26,52 @@ class IEC104(IFuzzer):
             return None
         return pkt.getlayer(3)
 
+    @staticmethod
+    def fingerprint(data: bytes) -> Hashable:
+        """
+        Structure of a response: the distinct APDUs it contains, each one by its format and, for I-frames, type
+        identification, cause of transmission and P/N bit, for U-frames the function. Parsed by hand, as this runs
+        for every response.
+        @param data: response
+        @return: (APDUs in order of appearance, length class of trailing bytes that are no APDU)
+        """
+        apdus = []
+        i = 0
+        while i + 6 <= len(data) and data[i] == 0x68:
+            length, control = data[i + 1], data[i + 2]
+            if control & 0x01 == 0:
+                # I-format: type id, variable structure qualifier, cause of transmission
+                asdu = data[i + 6:i + 2 + length]
+                apdus.append(('I', asdu[0], asdu[2] & 0x3f, asdu[2] >> 6 & 1) if len(asdu) >= 3 else ('I',))
+            elif control & 0x03 == 0x01:
+                apdus.append(('S',))
+            else:
+                apdus.append(('U', control & 0xfc))
+            i += 2 + length
+        return tuple(dict.fromkeys(apdus)), max(0, len(data) - i).bit_length()
+
+    @staticmethod
+    def renumber(payloads: List[bytes]) -> List[bytes]:
+        """
+        Number the I-frames of a connection consecutively: N(S) counts the I-frames sent before, N(R) is 0 (no
+        I-frame of the server acknowledged, valid as long as it has not sent more than k of them). The server drops
+        the connection on an unexpected N(S), so the captured numbers would cut a sequence after its first I-frame.
+        @param payloads: payloads in the order they are sent
+        @return: renumbered payloads
+        """
+        sent = 0
+        renumbered = []
+        for data in payloads:
+            data = bytearray(data)
+            i = 0
+            while i + 6 <= len(data) and data[i] == 0x68:
+                if data[i + 2] & 0x01 == 0:
+                    struct.pack_into('<HH', data, i + 2, (sent << 1) & 0xfffe, 0)
+                    sent += 1
+                i += 2 + data[i + 1]
+            renumbered.append(bytes(data))
+        return renumbered
+
     @staticmethod
     def get_populations(session: Session) -> Dict[str, Population]:
         return IEC104.populations
@@ -33,11 +81,18 @@ class IEC104(IFuzzer):
     @staticmethod
     def initialize(*args, **kwargs) -> None:
         IEC104.pcap_file = kwargs['pcap']
+        cache_dir = kwargs.get('seed_cache', '')
+        max_seeds = kwargs.get('max_seeds', 0)
         IEC104.populations = Population.generate(
             pcap_filename=IEC104.pcap_file,
             layer_filter=IEC104.layer_filter,
             population_crossover_operator=Crossover.single_point,
             population_mutation_probability=constants.SPOT_MUT,
+            cache_dir=cache_dir,
+            cache_key=seed_cache.key(IEC104.pcap_file, IEC104.name, IEC104.filter_version, max_seeds)
+            if cache_dir else '',
+            workers=kwargs.get('pcap_workers', 0),
+            max_seeds=max_seeds,
         )
         testfr = TransitionPayload(name="testfr", payload=b'\x68\x04\x43\x00\x00\x00', recv_after_send=True)#True)
         startdt = TransitionPayload(name="startdt", payload=b'\x68\x04\x07\x00\x00\x00', recv_after_send=True)#True)
@@ -55,4 +110,18 @@ class IEC104(IFuzzer):
             else:
                 pop.state_graph.finalize_pre()
                 pop.state_graph.finalize_post()
+        if kwargs.get('learn_transitions', False):
+            # replace the static transitions by the shortest ones observed in the capture
+            learned = learn_transitions(IEC104.pcap_file, kwargs['port'], layer_filter=IEC104.layer_filter)
+            for species, (pre, post) in learned.items():
+                if species not in IEC104.populations:
+                    continue
+                graph = IEC104.populations[species].state_graph
+                graph.reset()
+                for payload in pre:
+                    graph.pre(payload)
+                graph.finalize_pre()
+                for payload in post:
+                    graph.post(payload)
+                graph.finalize_post()
 
@@ -1,5 +1,5 @@
 import abc
-from typing import Dict
+from typing import Dict, Hashable, List
 
 from epf import Session
 from epf.chromo import Population
@@ -10,6 +10,8 @@ class IFuzzer(object):
     """
 
     name = 'Implement'
+    # bump whenever the layer filter or the population identifier changes, invalidates cached seeds
+    filter_version = 0
     populations = []
 
     @staticmethod
@@ -23,3 +25,26 @@ class IFuzzer(object):
     def initialize(*args, **kwargs) -> None:
         """Get possible requests"""
         raise NotImplementedError("Subclasses should implement this!")
+
+    @staticmethod
+    def fingerprint(data: bytes) -> Hashable:
+        """
+        Structural fingerprint of a response, see --response_feedback. Fuzzers should override this with one that
+        parses the protocol, the default only distinguishes length classes and the first byte.
+
+        @param data: response (bytes-like, may be a memoryview into the receive buffer)
+        @return: hashable fingerprint
+        """
+        return len(data).bit_length(), bytes(data[:1])
+
+    @staticmethod
+    def renumber(payloads: List[bytes]) -> List[bytes]:
+        """
+        Adjust the payloads of a multi-message connection (pre-phase, sequence members, post-phase) before they are
+        sent, e.g. renumber per-message sequence numbers, as the members stem from different seeds. The default
+        sends them unchanged.
+
+        @param payloads: payloads in the order they are sent
+        @return: payloads to send instead, one per given payload
+        """
+        return payloads
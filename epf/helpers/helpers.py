@@ -1,4 +1,5 @@
 import sys
+import functools
 from functools import reduce
 from itertools import groupby
 import ctypes
@@ -124,6 +125,7 @@ def ip_str_to_bytes(ip):
         raise ValueError("Illegal IP address passed to socket.inet_aton: {0}".format(ip))
 
 
+@functools.lru_cache(maxsize=None)
 def get_max_udp_size():
     """
     Crazy CTypes magic to do a getsockopt() which determines the max UDP payload size in a platform-agnostic way.
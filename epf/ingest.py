@@ -0,0 +1,153 @@
+import collections
+import hashlib
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterator, List, Sequence, Tuple, Union
+
+from scapy.config import conf
+from scapy.packet import Packet
+from scapy.utils import RawPcapReader
+
+from . import constants
+
+CAPTURE_EXTENSIONS = ('.pcap', '.pcapng', '.cap')
+
+# (linktype, raw frame)
+Record = Tuple[int, bytes]
+
+
+def default_layer_filter(pkt: Packet) -> Union[Packet, None]:
+    return pkt
+
+
+def default_identifier(pkt: Packet) -> str:
+    return pkt.name
+
+
+def expand(paths: Union[str, Sequence[str]]) -> List[str]:
+    """
+    Resolve capture files and directories (searched recursively for *.pcap, *.pcapng and *.cap) into a
+    sorted list of capture files.
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            for root, _, names in os.walk(p):
+                files += [os.path.join(root, n) for n in names if n.lower().endswith(CAPTURE_EXTENSIONS)]
+        else:
+            files += [p]
+    return sorted(set(files))
+
+
+def records(files: Sequence[str]) -> Iterator[Record]:
+    """Stream the raw frames of pcap and pcapng files without dissecting them"""
+    for filename in files:
+        with RawPcapReader(filename) as reader:
+            for raw, meta in reader:
+                # pcapng stores the link type per interface, pcap once per file
+                yield getattr(meta, 'linktype', reader.linktype), raw
+
+
+def packets(paths: Union[str, Sequence[str]]) -> Iterator[Packet]:
+    """Stream the dissected frames of capture files and/or directories"""
+    for linktype, raw in records(expand(paths)):
+        try:
+            yield conf.l2types.num2layer.get(linktype, conf.raw_layer)(raw)
+        except Exception as e:
+            if constants.TRACE:
+                print(f"ingest_trace, dissect_failed, {e}", file=sys.stderr)
+
+
+def _chunks(it: Iterator[Record], size: int) -> Iterator[List[Record]]:
+    chunk = []
+    for r in it:
+        chunk += [r]
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if len(chunk) > 0:
+        yield chunk
+
+
+def dissect_chunk(chunk: List[Record],
+                  layer_filter: Callable[[Packet], Union[Packet, None]],
+                  population_identifier: Callable[[Packet], str]) -> List[Tuple[str, type, bytes]]:
+    """
+    Dissect raw frames and apply the fuzzer's layer filter (runs in a worker process).
+
+    @return: (species, packet class, serialized packet) of every frame that passed the filter
+    """
+    out = []
+    for linktype, raw in chunk:
+        try:
+            pkt = conf.l2types.num2layer.get(linktype, conf.raw_layer)(raw)
+            stripped = layer_filter(pkt)
+            if stripped is None:
+                continue
+            out += [(population_identifier(stripped), type(stripped), bytes(stripped))]
+        except Exception as e:
+            if constants.TRACE:
+                print(f"ingest_trace, dissect_failed, {e}", file=sys.stderr)
+    return out
+
+
+def seeds(paths: Union[str, Sequence[str]],
+          layer_filter: Callable[[Packet], Union[Packet, None]] = default_layer_filter,
+          population_identifier: Callable[[Packet], str] = default_identifier,
+          workers: int = 0,
+          max_per_species: int = 0,
+          chunk_size: int = 512) -> List[Tuple[str, Packet]]:
+    """
+    Streaming seed extraction from capture files.
+
+    Raw frames are read in chunks and dissected by a pool of worker processes. At most two chunks per worker are
+    in flight and results are consumed in submission order, so memory stays bounded by the in-flight chunks and
+    the seeds, independent of the capture size, and the seed order matches the capture order. Seeds are
+    deduplicated by the hash of their serialized bytes, each species keeps at most `max_per_species` of them.
+
+    The layer filter and population identifier are sent to the workers and must be picklable, i.e. module level
+    functions or static methods, not lambdas.
+
+    @param paths: capture files and/or directories
+    @param layer_filter: fuzzer's layer filter
+    @param population_identifier: assigns the species of a filtered packet
+    @param workers: number of worker processes, 0 for one per cpu, 1 to dissect in this process
+    @param max_per_species: maximum number of seeds per species, 0 for unlimited
+    @param chunk_size: frames per work item
+    @return: (species, packet) in capture order
+    """
+    workers = workers if workers > 0 else (os.cpu_count() or 1)
+    seen = set()
+    counts = collections.Counter()
+    result = []
+
+    def consume(dissected: List[Tuple[str, type, bytes]]):
+        for species, cls, raw in dissected:
+            if 0 < max_per_species <= counts[species]:
+                continue
+            digest = hashlib.sha1(species.encode('utf-8') + b'\x00' + raw).digest()
+            if digest in seen:
+                continue
+            seen.add(digest)
+            counts[species] += 1
+            result.append((species, cls(raw)))
+
+    chunks = _chunks(records(expand(paths)), chunk_size)
+    if workers == 1:
+        for chunk in chunks:
+            consume(dissect_chunk(chunk, layer_filter, population_identifier))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            in_flight = collections.deque()
+            for chunk in chunks:
+                in_flight.append(pool.submit(dissect_chunk, chunk, layer_filter, population_identifier))
+                if len(in_flight) >= 2 * workers:
+                    consume(in_flight.popleft().result())
+            while len(in_flight) > 0:
+                consume(in_flight.popleft().result())
+    if constants.TRACE:
+        print(f"ingest_trace, {len(result)}, {dict(counts)}", file=sys.stderr)
+    return result
@@ -0,0 +1,83 @@
+import time
+
+
+class Pacer(object):
+    """
+    AIMD (additive increase, multiplicative decrease) controller of the rate at which test cases hit the target.
+
+    Connect failures, timeouts and latency spikes (latency above `latency_factor` times its moving average) are
+    congestion signals: the inter-test delay is multiplied by 1/decrease and the concurrency window is multiplied
+    by decrease. Every test case, or batch, without congestion lowers the delay by `step` and widens the window
+    by one connection. The fuzzer thereby converges to the highest rate the target sustains.
+
+    Args:
+        max_window (int): upper bound of concurrent connections, 1 for the serial engine. Default 1
+        max_delay (float): upper bound of the inter-test delay [sec]. Default 1.0
+        step (float): additive decrease of the delay per uncongested test case [sec]. Default 0.005
+        min_backoff (float): delay after the first congestion signal [sec]. Default 0.05
+        decrease (float): multiplicative decrease factor. Default 0.5
+        latency_factor (float): latency above this multiple of the average is a congestion signal. Default 4.0
+        smoothing (float): weight of a new latency sample in the moving average. Default 0.125
+    """
+
+    def __init__(self, max_window: int = 1, max_delay: float = 1.0, step: float = 0.005, min_backoff: float = 0.05,
+                 decrease: float = 0.5, latency_factor: float = 4.0, smoothing: float = 0.125):
+        self.max_window = max(1, max_window)
+        self.max_delay = max_delay
+        self.step = step
+        self.min_backoff = min_backoff
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.smoothing = smoothing
+        self.delay = 0.0
+        self.window = 1
+        self.latency = None
+        self.congestions = 0
+
+    def observe(self, latency: float = None, timeouts: int = 0, failures: int = 0) -> bool:
+        """
+        Feed the outcome of a test case (or a batch of concurrent ones)
+
+        @param latency: duration of the test case [sec], None if it did not complete
+        @param timeouts: send/recv timeouts that occurred
+        @param failures: connect failures that occurred
+        @return: True if the outcome was a congestion signal
+        """
+        congested = timeouts > 0 or failures > 0
+        if latency is not None:
+            if self.latency is not None and latency > self.latency_factor * self.latency:
+                congested = True
+            self.latency = latency if self.latency is None else \
+                (1 - self.smoothing) * self.latency + self.smoothing * latency
+        if congested:
+            self.congestion()
+        elif latency is not None:
+            self.success()
+        return congested
+
+    def congestion(self):
+        """Multiplicative decrease of the rate"""
+        self.congestions += 1
+        self.delay = min(self.max_delay, max(self.min_backoff, self.delay / self.decrease))
+        self.window = max(1, int(self.window * self.decrease))
+
+    def success(self):
+        """Additive increase of the rate"""
+        self.delay = max(0.0, self.delay - self.step)
+        self.window = min(self.max_window, self.window + 1)
+
+    def pace(self):
+        """Inter-test delay"""
+        if self.delay > 0:
+            time.sleep(self.delay)
+
+    def backoff(self):
+        """Back off after a failed connect, before retrying"""
+        self.congestion()
+        self.pace()
+
+    @property
+    def info(self) -> str:
+        latency = f'{round(self.latency * 1000, 1)}' if self.latency is not None else '-'
+        return f'{round(self.delay * 1000, 1)} [ms delay], {self.window} [# conns], {latency} [ms avg], ' \
+               f'{self.congestions} [# congestions]'
@@ -0,0 +1,188 @@
+import queue
+import random as stdrandom
+import sys
+import threading
+import zlib
+from typing import Dict, Tuple, Union, TYPE_CHECKING
+
+from numpy import random
+
+from . import constants
+from .chromo import private_rng
+
+if TYPE_CHECKING:
+    from epf.chromo import Individual, Population
+    from epf.session import Session
+
+
+class Candidate(object):
+    """
+    A pre-generated, pre-serialized child, the population version it was bred from and the breeding attempt that
+    produced it. The individual is None if all attempts failed, then attempt is the next one to try.
+    """
+
+    def __init__(self, individual: Union['Individual', None], version: int, attempt: int):
+        self.individual = individual
+        self.version = version
+        self.attempt = attempt
+
+
+class CandidatePipeline(threading.Thread):
+    """
+    Breeds and serializes the next children of the active population in the background, while the session
+    executes the current test case.
+
+    The children of a population are numbered by slot, in the order the session takes them. Every slot is bred
+    with generators of its own, seeded by the session seed, the species and the slot number, so a child only
+    depends on the state of the population it is bred from. Whenever the session takes slot k, the producer is
+    asked to breed slot k + depth from the current state of the population, and the session waits for it to
+    finish (see settle()) before it changes any population. So each slot is bred from the same state in every
+    run, regardless of thread timing.
+
+    A candidate bred from the current version of its population is used as is. If the population has changed
+    since (see Population.version), the candidate is used only if all of its parents are still alive, otherwise
+    it is discarded and the slot is bred again from the current state. Pipelined runs are thereby reproducible by
+    their random seed, although they differ from unpipelined ones.
+
+    A child that can not be serialized (e.g. a mutated length field out of range) is drawn again with the
+    generators of the slot's next attempt, so a failing breed is never repeated with the same seeds.
+
+    Args:
+        session (Session): session whose active population is served
+        depth (int): children bred ahead per population
+        attempts (int): breeding attempts per slot before the error is raised
+    """
+
+    def __init__(self, session: 'Session', depth: int = 4, attempts: int = 8):
+        super().__init__(name='epf-pipeline', daemon=True)
+        self.session = session
+        self.depth = depth
+        self.attempts = attempts
+        self.seed = session.opts.seed
+        # per population: next slot to take, slots requested so far and the bred candidates by slot
+        self._next: Dict[int, int] = {}
+        self._requested: Dict[int, int] = {}
+        self._candidates: Dict[int, Dict[int, Candidate]] = {id(p): {} for p in session.populations.values()}
+        self._requests: 'queue.Queue[Tuple[Population, int]]' = queue.Queue()
+        self._idle = threading.Condition()
+        self._outstanding = 0
+        self.running = True
+        self.hits = 0
+        self.adopted = 0
+        self.discarded = 0
+        self.misses = 0
+        self.redrawn = 0
+
+    def breed(self, population: 'Population', slot: int, attempt: int = 0) -> 'Individual':
+        """
+        Breed the child of a slot from the current state of a population, with the generators of one attempt
+
+        @param population: population to breed from, its lock must be held
+        @param slot: slot number
+        @param attempt: attempt number, every attempt of a slot has generators of its own
+        @return: serialized child
+        """
+        species = zlib.crc32(population.species.encode())
+        np_rng = random.RandomState([self.seed & 0xffffffff, species, slot & 0xffffffff, attempt])
+        std_rng = stdrandom.Random(f'{self.seed}/{species}/{slot}/{attempt}')
+        with private_rng(np_rng, std_rng):
+            child = population.new_child()
+        # serialization is cached by the individual
+        child.serialize()
+        return child
+
+    def _breed(self, population: 'Population', slot: int, first: int = 0) -> Tuple['Individual', int]:
+        """
+        Breed the child of a slot, starting with attempt `first` and drawing it again with the next attempt as long
+        as breeding fails
+
+        @return: child and the attempt that produced it
+        """
+        error = None
+        for attempt in range(first, first + self.attempts):
+            try:
+                return self.breed(population, slot, attempt), attempt
+            except Exception as e:
+                error = e
+                self.redrawn += 1
+                if constants.TRACE:
+                    print(f"pipeline_trace, breeding_failed, {slot}, {attempt}, {e}", file=sys.stderr)
+        raise error
+
+    def run(self):
+        while self.running:
+            try:
+                pop, slot = self._requests.get(timeout=0.05)
+            except queue.Empty:
+                continue
+            try:
+                with pop.lock:
+                    try:
+                        child, attempt = self._breed(pop, slot)
+                        self._candidates[id(pop)][slot] = Candidate(child, pop.version, attempt)
+                    except Exception:
+                        # take() continues with the attempts that have not been tried yet
+                        self._candidates[id(pop)][slot] = Candidate(None, pop.version, self.attempts)
+            finally:
+                with self._idle:
+                    self._outstanding -= 1
+                    self._idle.notify_all()
+
+    def _request(self, population: 'Population', slot: int):
+        with self._idle:
+            self._outstanding += 1
+        self._requests.put((population, slot))
+
+    def settle(self):
+        """Wait until all requested slots have been bred, call before changing a population"""
+        with self._idle:
+            while self._outstanding > 0 and self.running and self.is_alive():
+                self._idle.wait(timeout=0.05)
+
+    def take(self, population: 'Population') -> 'Individual':
+        """
+        Child of the population's next slot: its candidate, or a freshly bred one if the candidate is not usable
+
+        @param population: active population
+        @return: child
+        """
+        key = id(population)
+        slot = self._next.get(key, 0)
+        self._next[key] = slot + 1
+        self.settle()
+        candidate = self._candidates[key].pop(slot, None)
+        with population.lock:
+            if candidate is None:
+                # first slot taken from this population, nothing has been requested yet
+                self.misses += 1
+                child, _ = self._breed(population, slot)
+            elif candidate.individual is None:
+                # every background attempt failed, never repeat them with the same generators
+                self.misses += 1
+                child, _ = self._breed(population, slot, candidate.attempt)
+            elif candidate.version == population.version:
+                self.hits += 1
+                child = candidate.individual
+            elif population.adopt(candidate.individual):
+                self.adopted += 1
+                child = candidate.individual
+            else:
+                self.discarded += 1
+                if constants.TRACE:
+                    print(f"pipeline_trace, discarded, {candidate.individual.identity}", file=sys.stderr)
+                child, _ = self._breed(population, slot, candidate.attempt + 1)
+        for s in range(max(self._requested.get(key, slot), slot) + 1, slot + self.depth + 1):
+            self._request(population, s)
+            self._requested[key] = s
+        return child
+
+    @property
+    def queued(self) -> int:
+        return sum(len(c) for c in self._candidates.values())
+
+    def stop(self):
+        self.running = False
+        with self._idle:
+            self._idle.notify_all()
+        if self.is_alive():
+            self.join(timeout=1.0)
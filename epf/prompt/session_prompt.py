@@ -52,6 +52,10 @@ class SessionPrompt(CommandPrompt):
                 'desc': 'print information about the tests suspected of crashing something',
                 'exec': self._cmd_suspects
             },
+            'tmin': {
+                'desc': 'Minimize the payload of a suspect on a fresh target instance -> tmin <bug_id>',
+                'exec': self._cmd_tmin
+            },
             # 'suspects-del': {
             #     'desc': 'delete suspect',
             #     'exec': self.cmd_delsuspect
@@ -161,6 +165,23 @@ class SessionPrompt(CommandPrompt):
         for suspect in self.session.suspects:
             print(suspect)
 
+    def _cmd_tmin(self, tokens):
+        try:
+            bug_id = int(tokens[0])
+        except (IndexError, ValueError):
+            self._print_error('tmin usage: tmin <bug_id> (see bugs.csv)')
+            return
+        suspect = next((s for s in self.session.suspects if s.bug_id == bug_id), None)
+        if suspect is None:
+            self._print_error(f'Bug {bug_id} has not been found in this session')
+            return
+        self._print_color('testn', f'Minimizing {suspect.individual.identity}...')
+        digest = self.session.minimize_bug(suspect.individual, suspect.exit_code)
+        if digest is not None:
+            self._print_color('pass', f'Minimized payload stored as {self.session.store.blob_path(digest)}')
+        else:
+            self._print_error('Crash did not reproduce')
+
     def _cmd_print_test_case(self, tokens):
         try:
             test_case_index = int(tokens[0])
@@ -248,16 +269,20 @@ class SessionPrompt(CommandPrompt):
     # --------------------------------------------------------------- #
 
     def exit_message(self):
+        if self.session.pipeline is not None:
+            self.session.pipeline.stop()
+        self.session.replay_worker.stop()
         self.session.restarter.kill()
-        self.session.bugs_csv.flush()
-        self.session.bugs_csv.close()
+        self.session.write_run_json()
+        self.session.save_checkpoint(force=True)
+        self.session.crash_buckets.save()
+        if self.session.execlog is not None:
+            self.session.execlog.close()
+        self.session.writer.close()
         mem = shm.get()
         mem.acquire()
         mem.close()
         mem.release()
-        if self.session.opts.debug:
-            self.session.debug_csv.flush()
-            self.session.debug_csv.close()
         print_formatted_text(HTML('<b>Exiting prompt...</b>'))
 
     # --------------------------------------------------------------- #
@@ -2,6 +2,7 @@ import time
 
 import npyscreen
 from epf import shm, constants
+from epf.connections.socket_connection import local_tcp_states
 
 
 class Stats(npyscreen.NPSAppManaged):
@@ -9,7 +10,7 @@ class Stats(npyscreen.NPSAppManaged):
 
     def onStart(self):
         self.keypress_timeout_default = 10
-        self.addForm("MAIN", MainForm, name="Evolutionary Protocol Fuzzer", lines=33, columns=106)
+        self.addForm("MAIN", MainForm, name="Evolutionary Protocol Fuzzer", lines=43, columns=106)
 
     def set_session(self, sess):
         self.session = sess
@@ -29,13 +30,14 @@ class MainForm(npyscreen.FormBaseNew):
     def create(self):
         y, x = self.useable_space()
         self.add_handlers({"^Q": self.pause_handler})
-        self.general = self.add(BoxedStats, name="General", max_height=8, max_width=x//2 - 2, editable=False)
-        self.target = self.add(BoxedStats, name="Target Info", relx=x//2+1, rely=2, max_height=13, max_width=x // 2 - 2, editable=False)
-        self.instrumentation = self.add(BoxedStats, name="Instrumentation", rely=10, max_height=7, max_width=x // 2 - 2, editable=False)
-        self.genetics = self.add(BoxedStats, name="Evolutionary Engine", relx=x//2+1, rely=15, max_height=16, max_width=x // 2 - 2, editable=False)
-        self.insight = self.add(BoxedStats, name="Active Population Queue", rely=17, max_height=11, max_width=x // 2 - 2, editable=False)
+        self.general = self.add(BoxedStats, name="General", max_height=9, max_width=x//2 - 2, editable=False)
+        self.target = self.add(BoxedStats, name="Target Info", relx=x//2+1, rely=2, max_height=19, max_width=x // 2 - 2, editable=False)
+        self.instrumentation = self.add(BoxedStats, name="Instrumentation", rely=11, max_height=8, max_width=x // 2 - 2, editable=False)
+        self.genetics = self.add(BoxedStats, name="Evolutionary Engine", relx=x//2+1, rely=21, max_height=18, max_width=x // 2 - 2, editable=False)
+        self.insight = self.add(BoxedStats, name="Active Population Queue", rely=19, max_height=11, max_width=x // 2 - 2, editable=False)
+        self.scheduler = self.add(BoxedStats, name="Population Scheduler", rely=30, max_height=8, max_width=x // 2 - 2, editable=False)
         self.add(npyscreen.Textfield, name="keepalive", relx=1, rely=1, max_height=2, max_width=2)
-        self.info = self.add(Info, name="", rely=28, max_height=3, max_width=x//2-2)
+        self.info = self.add(Info, name="", rely=38, max_height=3, max_width=x//2-2)
         self.info.value = "ctrl+q -> pause and spawn cli"
         self.display()
 
@@ -54,7 +56,19 @@ class MainForm(npyscreen.FormBaseNew):
                              f'Iterations per sec: {its_per_sec} [#/sec]\n' + \
                              f'Iterations total:   {s.test_case_cnt} [#]\n' + \
                              f'Random seed:        {s.opts.seed}\n' + \
-                             f'Suspects found:     {len(s.suspects)} [#]'
+                             f'Suspects found:     {s.bug_count} [#] ({len(s.crash_buckets)} buckets, {s.crash_buckets.hits} hits)\n' + \
+                             f'Writer queue:       {s.writer.depth} [#] ({s.writer.dropped} dropped)'
+        r = s.async_runner
+        conn = s.target.target_connection
+        handshake = f'{conn.handshake_rtt}' if hasattr(conn, 'handshake_rtt') else '-'
+        tls = f'{conn.tls_handshake}, {conn.tls_resumed}/{conn.tls_handshake.count} [# resumed]' \
+            if getattr(conn, 'proto', '') == 'ssl' else '-'
+        if getattr(conn, 'low_latency', False):
+            handshake += f', TFO {conn.tfo_accepted}/{conn.tfo_sent} [# accepted/sent]'
+        time_wait = local_tcp_states(port=s.target.target_connection.port).get('TIME_WAIT', 0)
+        local_errors = getattr(s.target.target_connection, 'local_errors', 0) + (r.local_errors if r is not None else 0)
+        concurrency = f'{r.concurrency} [#] ({r.novel_batches}/{r.batches} novel batches, {r.rechecks} rechecks, ' \
+                      f'{r.recv_timeout_count + r.send_timeout_count} timeouts)' if r is not None else 'off'
         self.target.value = f'Command:        {s.restarter.cmd}\n' + \
                             f'PID:            {s.restarter.process.pid if s.restarter.process is not None else "-"}\n' + \
                             f'Protocol:       {s.target.target_connection.proto}\n' + \
@@ -64,15 +78,26 @@ class MainForm(npyscreen.FormBaseNew):
                             f'Restarts:       {s.restarter.restarts} [#]\n' + \
                             f'Timeouts:       {s.target.target_connection.recv_timeout_count + s.target.target_connection.send_timeout_count} [#]\n' + \
                             f'Conn Errors:    {s.target.target_connection.conn_errors} [#]\n' + \
-                            f'Crashes:        {s.restarter.crashes} [#]\n'
+                            f'Crashes:        {s.restarter.crashes} [#]\n' + \
+                            f'Concurrency:    {concurrency}\n' + \
+                            f'Handshake RTT:  {handshake}\n' + \
+                            f'TLS handshake:  {tls}\n' + \
+                            f'Local sockets:  {time_wait} [# TIME_WAIT], {local_errors} [# local errors]\n' + \
+                            f'Pacing:         {s.pacer.info if s.pacer is not None else "off"}\n' + \
+                            f'Replays:        {s.replayer.replays} [#] ({s.replay_worker.pending} queued)\n' + \
+                            f'Bisected/Min.:  {s.bisected}/{s.minimized} [#]'
         mem = shm.get()
         uniq = s.previous_testcase.coverage_snapshot if s.previous_testcase is not None else 0
         self.instrumentation.value = f'Shared MMAP ID: {mem.name}\n' + \
                                      f'Injection ENV:  {constants.INSTR_AFL_ENV}\n' + \
                                      f'Memory size:    {mem.size / 1024} [KiB]\n' + \
                                      f'Reported cov.:  {uniq} [# trace bytes]\n' + \
-                                     f'Last cov. inc.: {round(time.time() - s.t_last_increase, 2)} [sec]'
-        self.genetics.value = f'Population seed:  {s.opts.pcap}\n' + \
+                                     f'Last cov. inc.: {round(time.time() - s.t_last_increase, 2)} [sec]\n' + \
+                                     f'Responses:      {s.feedback.info if s.feedback is not None else "off"}'
+        pipeline = f'{s.pipeline.hits}/{s.pipeline.adopted}/{s.pipeline.discarded} [# fresh/adopted/discarded]' \
+            if s.pipeline is not None else 'off'
+        pcap = s.opts.pcap if isinstance(s.opts.pcap, str) else ', '.join(s.opts.pcap)
+        self.genetics.value = f'Population seed:  {pcap}\n' + \
                               f'Populations:      {len(s.populations)} [#]\n' + \
                               f'Alpha (Cooldown): {s.opts.alpha}\n' + \
                               f'Beta (Reheat):    {s.opts.beta}\n' + \
@@ -84,6 +109,8 @@ class MainForm(npyscreen.FormBaseNew):
                               f'Current Energy:   {s.energy}\n' + \
                               f'Crossovers:       {sum(p.crossovers for p in s.populations.values())} [#]\n' + \
                               f'Spot Mutations:   {sum(p.spot_mutations for p in s.populations.values())} [#]\n' + \
+                              f'Culled:           {sum(p.culled for p in s.populations.values())} [#]\n' + \
+                              f'Pipeline:         {pipeline}\n' + \
                               f'Reheats:          {s.reheat_count} [#]\n' + \
                               f'Energy Periods:   {s.energy_periods} [#]'
         head = s.active_population._pop[:3]
@@ -97,6 +124,11 @@ class MainForm(npyscreen.FormBaseNew):
                              f'     [n-3] {tail[0].identity if len(head) > 0 else "-"}\n' + \
                              f'     [n-2] {tail[1].identity if len(head) > 1 else "-"}\n' + \
                              f'     [n-1] {tail[2].identity if len(head) > 2 else "-"}'
+        allocations = s.scheduler.summary()
+        self.scheduler.value = f'Scheduler: {s.scheduler.name} (last choice: {s.scheduler.last_choice})\n' + \
+                               f'{"Population":<22} {"Alloc.":>7} {"Cov.":>7} {"Score":>8}\n' + \
+                               '\n'.join(f'{species[:22]:<22} {a["allocations"]:>7} {a["coverage"]:>7} {a["score"]:>8}'
+                                         for species, a in allocations.items())
         self.display()
 
 
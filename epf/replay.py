@@ -0,0 +1,229 @@
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, List, Tuple, Union, TYPE_CHECKING
+
+from . import constants
+from .testcase import Plan
+
+if TYPE_CHECKING:
+    from epf.session import Session
+
+
+class TargetLock(object):
+    """
+    Shares the target between the fuzzing loop and background replays.
+
+    The fuzzing loop holds the lock for one iteration at a time, a replay for one replay step (see Replayer.run()).
+    While both sides are waiting, the lock alternates between them: a waiting replay goes first after a fuzzing
+    iteration and a waiting fuzzing iteration goes first after a replay step. So neither side can be starved by the
+    other reacquiring the lock immediately, fuzzing keeps going at least at every other step during minimization
+    and bisection.
+    """
+
+    FUZZ = 'fuzz'
+    REPLAY = 'replay'
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._busy = False
+        self._waiting = {self.FUZZ: 0, self.REPLAY: 0}
+        self._last = None
+
+    def _acquire(self, side: str, other: str):
+        with self._cond:
+            self._waiting[side] += 1
+            while self._busy or (self._waiting[other] > 0 and self._last == side):
+                self._cond.wait()
+            self._waiting[side] -= 1
+            self._busy = True
+            self._last = side
+
+    @contextmanager
+    def fuzz(self):
+        self._acquire(self.FUZZ, self.REPLAY)
+        try:
+            yield
+        finally:
+            self._release()
+
+    @contextmanager
+    def replay(self):
+        self._acquire(self.REPLAY, self.FUZZ)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self):
+        with self._cond:
+            self._busy = False
+            self._cond.notify_all()
+
+
+class Replayer(object):
+    """
+    Replays transmission plans against a fresh target instance and reports whether the target died.
+
+    Each call to run() restarts the target, transmits every plan in its own connection (just like the test cases
+    that originally sent them) and restarts the target again afterwards, so the fuzzing loop always continues
+    with a healthy instance. Coverage produced by replays is absorbed without being credited to the fuzzer.
+
+    Args:
+        session (Session): session that owns target, restarter and instrumentation
+        settle (float): seconds to wait after each connection before the target's health is checked
+    """
+
+    def __init__(self, session: 'Session', settle: float = 0.05):
+        self.session = session
+        self.settle = settle
+        self.replays = 0
+
+    def run(self, plans: List[Plan]) -> Union[int, None]:
+        """
+        Replay plans on a freshly restarted target.
+
+        @param plans: transmission plans, one connection each
+        @return: exit code of the target if it died, else None
+        """
+        with self.session.target_lock.replay():
+            restarter = self.session.restarter
+            # a speculatively opened connection belongs to the instance that is killed now
+            self.session.target.discard()
+            restarter.kill(ignore=True)
+            restarter.restart(planned=True)
+            for plan in plans:
+                self._transmit(plan)
+                time.sleep(self.settle)
+                if not restarter.healthy():
+                    break
+            crashed = not restarter.healthy()
+            restarter.kill(ignore=True)
+            retval = restarter.retval
+            restarter.restart(planned=True)
+            self.session.resync_coverage()
+            self.replays += 1
+        if constants.TRACE:
+            print(f"replay_trace, {len(plans)}, {crashed}, {retval}", file=sys.stderr)
+        return retval if crashed else None
+
+    def _transmit(self, plan: Plan):
+        target = self.session.target
+        try:
+            target.open()
+        except Exception:
+            return
+        try:
+            for phase in plan:
+                for data, recv in phase:
+                    target.send(data)
+                    if recv:
+                        target.recv_view()
+        except Exception:
+            pass
+        finally:
+            try:
+                target.close()
+            except Exception:
+                pass
+
+
+class Bisector(object):
+    """
+    Crash culprit bisection over a sequence of test cases.
+
+    The sequence is assumed to be ordered like the original execution, and target state to accumulate: if a window
+    of consecutive test cases crashes the target, every larger window containing it does as well. Two binary
+    searches then narrow the crash down to the smallest window [first, last] in O(log n) restarts: first for the
+    latest start that still crashes when replaying until the end, then for the earliest end.
+
+    Args:
+        replayer (Replayer): executes plans on a fresh target
+        running (Callable): polled before each replay, bisection is aborted when it returns False
+    """
+
+    def __init__(self, replayer: Replayer, running: Callable[[], bool] = lambda: True):
+        self.replayer = replayer
+        self.running = running
+        self.execs = 0
+
+    def _crashes(self, plans: List[Plan], signature: int) -> Union[bool, None]:
+        if not self.running():
+            return None
+        self.execs += 1
+        return self.replayer.run(plans) == signature
+
+    def bisect(self, plans: List[Plan], signature: int) -> Union[Tuple[int, int], None]:
+        """
+        Find the smallest window of plans that reproduces the crash
+
+        @param plans: transmission plans of the test cases, in execution order
+        @param signature: exit code of the original crash
+        @return: (first, last) index of the window (first == last for a single culprit), or None if the crash
+                 did not reproduce or bisection was aborted
+        """
+        if len(plans) == 0 or not self._crashes(plans, signature):
+            return None
+        lo, hi = 0, len(plans) - 1
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            crashed = self._crashes(plans[mid:], signature)
+            if crashed is None:
+                return None
+            if crashed:
+                lo = mid
+            else:
+                hi = mid - 1
+        first = lo
+        lo, hi = first, len(plans) - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            crashed = self._crashes(plans[first:mid + 1], signature)
+            if crashed is None:
+                return None
+            if crashed:
+                hi = mid
+            else:
+                lo = mid + 1
+        if constants.TRACE:
+            print(f"bisect_trace, {len(plans)}, {first}, {lo}, {self.execs}", file=sys.stderr)
+        return first, lo
+
+
+class ReplayWorker(threading.Thread):
+    """
+    Background thread that processes replay jobs (e.g. test case minimization) while fuzzing continues.
+    Jobs are callables, they should poll `running` between replays to allow a timely shutdown.
+    """
+
+    def __init__(self):
+        super().__init__(name='epf-replay', daemon=True)
+        self._jobs = queue.Queue()
+        self.running = True
+
+    @property
+    def pending(self) -> int:
+        return self._jobs.qsize()
+
+    def submit(self, job: Callable[[], None]):
+        if self.running:
+            self._jobs.put(job)
+
+    def run(self):
+        while self.running:
+            job = self._jobs.get()
+            if job is None:
+                break
+            try:
+                job()
+            except Exception as e:
+                if constants.TRACE:
+                    print(f"replay_trace, job_failed, {e}", file=sys.stderr)
+
+    def stop(self, timeout: float = 10.0):
+        self.running = False
+        self._jobs.put(None)
+        if self.is_alive():
+            self.join(timeout=timeout)
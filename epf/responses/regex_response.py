@@ -20,6 +20,9 @@ class RegexResponse(Response):
         if len(set(regex_keys).difference(self.required_vars + self.optional_vars)) != 0:
             raise EPFRuntimeError("There are differences between the variables of the regex list and the declared"
                                         "optional and required vars. It must coincide!")
+        # (search, variable names, group numbers) per pattern, resolved once instead of on every response
+        self._plan = [(regex.search, tuple(regex.groupindex.keys()), tuple(regex.groupindex.values()))
+                      for regex in self.regex_list]
 
     def _extract_variables(self, data: bytes) -> Mapping[str, bytes]:
         """
@@ -32,11 +35,13 @@ class RegexResponse(Response):
         Returns: A dictionary with all required variables (and optionally others)
         """
         var_dict = {}
-        for regex in self.regex_list:
-            m = regex.search(data)
-            for key in regex.groupindex.keys():
-                if m is not None and key in m.groupdict():
-                    var_dict[key] = m.groupdict()[key]
-                else:
-                    var_dict[key] = None
+        for search, keys, groups in self._plan:
+            m = search(data)
+            # later patterns overwrite the variables of earlier ones, unmatched patterns set theirs to None
+            if m is None:
+                var_dict.update(dict.fromkeys(keys))
+            elif len(groups) == 1:
+                var_dict[keys[0]] = m.group(groups[0])
+            else:
+                var_dict.update(zip(keys, m.group(*groups)))
         return var_dict
@@ -48,6 +48,11 @@ class AFLForkRestarter(IRestarter):
         self.process = None
         self.restarts = 0
         self.crashes = 0
+        # exit code of the last killed process, also recorded for planned (ignored) kills
+        self.retval = None
+        # if set, the target's stderr is written to this file (truncated on every restart)
+        self.stderr_log = None
+        self._stderr = None
 
     @staticmethod
     def name() -> str:
@@ -147,6 +152,7 @@ class AFLForkRestarter(IRestarter):
     #     return ret
 
     def kill(self, ignore=False):
+        self.retval = None
         if self.process is None:
             return -1
         try:
@@ -165,11 +171,13 @@ class AFLForkRestarter(IRestarter):
             if len(alive) > 0:
                 self.process.kill()
                 psutil.wait_procs([self.process], timeout=1.0)
+            self.retval = self.process.returncode
             if not ignore:
-                retval = self.process.returncode
+                retval = self.retval
                 self.crashes += 1
         except Exception:
             retval = 0
+            self.retval = retval
         self.process = None
         return retval
 
@@ -181,6 +189,23 @@ class AFLForkRestarter(IRestarter):
         except Exception:
             return False
 
+    def stderr_tail(self, max_bytes: int = 65536) -> str:
+        """
+        Read the end of the current target instance's stderr log
+
+        :param max_bytes: maximum number of bytes to read
+        :return: str
+        """
+        if self.stderr_log is None:
+            return ''
+        try:
+            with open(self.stderr_log, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                f.seek(max(0, f.tell() - max_bytes))
+                return f.read().decode('utf-8', errors='replace')
+        except OSError:
+            return ''
+
     def _fork(self, environ: {}) -> int:
         """
         Fork the target via execve
@@ -188,11 +213,17 @@ class AFLForkRestarter(IRestarter):
         :param environ: Dictionary representing the environment variables of the child process
         :return: child pid (int)
         """
+        stderr = subprocess.DEVNULL
+        if self.stderr_log is not None:
+            if self._stderr is not None:
+                self._stderr.close()
+            self._stderr = open(self.stderr_log, 'wb')
+            stderr = self._stderr
         cid = subprocess.Popen(args=self._argv,
                                shell=False,
                                env=environ,
                                stdout=subprocess.DEVNULL,
-                               stderr=subprocess.DEVNULL,
+                               stderr=stderr,
                                start_new_session=True,
                                close_fds=True).pid
         return cid
@@ -33,3 +33,7 @@ class IRestarter(object, metaclass=abc.ABCMeta):
     @abc.abstractmethod
     def healthy(self) -> bool:
         pass
+
+    def stderr_tail(self) -> str:
+        """Get the latest stderr output of the target, if captured"""
+        return ''
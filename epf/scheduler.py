@@ -0,0 +1,133 @@
+import abc
+import math
+from typing import Dict, List
+
+
+class IScheduler(object, metaclass=abc.ABCMeta):
+    """Describes a population scheduler interface.
+
+    A scheduler decides which population receives the next allocation. An allocation lasts from one
+    simulated annealing restart (energy = 1.0) until the energy has cooled down below the session's
+    threshold. After each allocation, the session reports the coverage gained and the execution time spent.
+    """
+
+    name = 'Implement'
+
+    def __init__(self, species: List[str]):
+        self.species = sorted(species)
+        self.allocations = {s: 0 for s in self.species}
+        self.coverage = {s: 0 for s in self.species}
+        self.elapsed = {s: 0.0 for s in self.species}
+        self.last_choice = None
+
+    @abc.abstractmethod
+    def select(self) -> str:
+        """Choose the species that is allocated next"""
+        raise NotImplementedError("Subclasses should implement this!")
+
+    def update(self, species: str, coverage: int, elapsed: float) -> None:
+        """
+        Report the outcome of a finished allocation.
+
+        @param species: population key the allocation was spent on
+        @param coverage: number of new coverage entries found during the allocation
+        @param elapsed: execution time of the allocation [sec]
+        """
+        self.allocations[species] += 1
+        self.coverage[species] += coverage
+        self.elapsed[species] += elapsed
+
+    @property
+    def rounds(self) -> int:
+        """Number of completed allocation rounds, i.e. energy periods"""
+        return sum(self.allocations.values()) // max(1, len(self.species))
+
+    def score(self, species: str) -> float:
+        """Current preference of this scheduler for a species (for display only)"""
+        return 0.0
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {
+            s: {
+                "allocations": self.allocations[s],
+                "coverage": self.coverage[s],
+                "elapsed": round(self.elapsed[s], 2),
+                "score": round(self.score(s), 4),
+            } for s in self.species
+        }
+
+
+class RoundRobinScheduler(IScheduler):
+    """Rotates through all populations in sorted-key order, each one receiving the same allocation."""
+
+    name = 'round-robin'
+
+    def __init__(self, species: List[str]):
+        super().__init__(species)
+        self._next = 0
+
+    def select(self) -> str:
+        self.last_choice = self.species[self._next]
+        self._next = (self._next + 1) % len(self.species)
+        return self.last_choice
+
+
+class UCBScheduler(IScheduler):
+    """
+    Treats each population as an arm of a non-stationary multi-armed bandit (discounted UCB1).
+
+    The reward of an allocation is its coverage yield per second, normalized by the highest yield observed so
+    far. Rewards and play counts decay with `discount` on every allocation, so populations that plateau lose
+    their share while populations that are still finding new coverage are allocated more often.
+    """
+
+    name = 'ucb'
+
+    def __init__(self, species: List[str], discount: float = 0.9, exploration: float = 0.5):
+        super().__init__(species)
+        self.discount = discount
+        self.exploration = exploration
+        self._plays = {s: 0.0 for s in self.species}
+        self._rewards = {s: 0.0 for s in self.species}
+        self._max_yield = 0.0
+
+    def select(self) -> str:
+        unplayed = [s for s in self.species if self.allocations[s] == 0]
+        if len(unplayed) > 0:
+            self.last_choice = unplayed[0]
+        else:
+            self.last_choice = max(self.species, key=self.score)
+        return self.last_choice
+
+    def update(self, species: str, coverage: int, elapsed: float) -> None:
+        super().update(species, coverage, elapsed)
+        rate = coverage / elapsed if elapsed > 0 else 0.0
+        self._max_yield = max(self._max_yield, rate)
+        reward = rate / self._max_yield if self._max_yield > 0 else 0.0
+        for s in self.species:
+            self._plays[s] *= self.discount
+            self._rewards[s] *= self.discount
+        self._plays[species] += 1.0
+        self._rewards[species] += reward
+
+    def score(self, species: str) -> float:
+        plays = self._plays[species]
+        if plays <= 0:
+            return float('inf')
+        total = sum(self._plays.values())
+        mean = self._rewards[species] / plays
+        return mean + self.exploration * math.sqrt(2 * math.log(max(total, 1.0)) / plays)
+
+
+def get(name: str, species: List[str]) -> IScheduler:
+    """
+    Instantiate a scheduler by name
+
+    @param name: IScheduler.name
+    @param species: population keys that are scheduled
+    @return: IScheduler
+    """
+    for scheduler in IScheduler.__subclasses__():
+        if scheduler.name == name:
+            return scheduler(species)
+    raise ValueError(f"Unknown scheduler {name}")
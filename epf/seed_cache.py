@@ -0,0 +1,73 @@
+import hashlib
+import importlib
+import os
+import pickle
+from typing import List, Sequence, Tuple, Union
+
+from scapy.packet import Packet
+
+from . import helpers
+from . import ingest
+
+VERSION = 1
+DEFAULT_DIR = 'epf-cache'
+
+# (species, deduplicated seed packet)
+Seed = Tuple[str, Packet]
+
+
+def key(paths: Union[str, Sequence[str]], fuzzer: str, filter_version: int, max_seeds: int = 0) -> str:
+    """
+    Cache key of a seed corpus: content hash of the captures, fuzzer name, version of its layer filter and the
+    seed limit per species. Bump the fuzzer's filter_version whenever its layer filter or population identifier
+    changes.
+    """
+    h = hashlib.sha256()
+    for filename in ingest.expand(paths):
+        with open(filename, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+    h.update(f'|{fuzzer}|{filter_version}|{max_seeds}|{VERSION}'.encode('utf-8'))
+    return h.hexdigest()
+
+
+def _path(cache_dir: str, cache_key: str) -> str:
+    return os.path.join(cache_dir, f'{cache_key}.seeds')
+
+
+def load(cache_dir: str, cache_key: str) -> Union[List[Seed], None]:
+    """
+    Load cached seeds
+
+    @return: seeds in their original order or None if there is no (valid) cache entry
+    """
+    try:
+        with open(_path(cache_dir, cache_key), 'rb') as f:
+            data = pickle.load(f)
+        if data["version"] != VERSION or data["key"] != cache_key:
+            return None
+        seeds = []
+        for species, module, qualname, raw in data["seeds"]:
+            cls = importlib.import_module(module)
+            for name in qualname.split('.'):
+                cls = getattr(cls, name)
+            seeds += [(species, cls(raw))]
+        return seeds
+    except Exception:
+        # missing, truncated or written by an incompatible scapy version, regenerate
+        return None
+
+
+def save(cache_dir: str, cache_key: str, seeds: List[Seed]):
+    """Cache seeds as (species, packet class, raw bytes)"""
+    helpers.mkdir_safe(cache_dir)
+    data = {
+        "version": VERSION,
+        "key": cache_key,
+        "seeds": [(species, type(pkt).__module__, type(pkt).__qualname__, bytes(pkt)) for species, pkt in seeds],
+    }
+    dst = _path(cache_dir, cache_key)
+    tmp = f'{dst}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, dst)
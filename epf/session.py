@@ -1,4 +1,4 @@
-import csv
+import functools
 import json
 import os
 import sys
@@ -11,10 +11,23 @@ from epf.restarters import IRestarter
 from . import helpers
 from . import shm
 from . import constants
+from . import scheduler as schedulers
+from . import triage
+from . import checkpoint
 from epf.graph import Graph
-from typing import Dict, Any, Tuple
-
-from .testcase import TestCase
+from typing import Dict, Any, Tuple, List, Union
+
+from .chromo import Sequence, SequencePopulation
+from .testcase import TestCase, transmission_plan
+from .replay import TargetLock, Replayer, ReplayWorker, Bisector
+from .tmin import Minimizer
+from .pipeline import CandidatePipeline
+from .async_engine import AsyncRunner
+from .pacing import Pacer
+from .feedback import ResponseFeedback
+from .writer import ResultWriter
+from .execlog import ExecLog
+from .store import ArtifactStore
 from epf.prompt.session_prompt import SessionPrompt
 
 
@@ -60,6 +73,11 @@ class SessionClock(object):
         self._execution_time += self._stop - self._start
         self._running = False
 
+    def restore(self, execution_time: float):
+        self._execution_time = execution_time
+        if self._running:
+            self._start = time.time()
+
 
 class Session(object):
     """
@@ -69,6 +87,19 @@ class Session(object):
         restart_sleep_time (float): Time in seconds to sleep when target can't be restarted. Default 5.
         target (Target):        Target for fuzz session. Target must be fully initialized. Default None.
         restarter (IRestarter): Restarter module initialized. Will call restart() when the target is down. Default None
+        resume (str):           Result directory of an interrupted run to resume from its last checkpoint. Default ""
+        checkpoint_interval (float): Seconds of execution time between two checkpoints, 0 disables them. Default 300
+        sequences (int):        Maximum length of multi-message individuals, 0 disables the sequence population. Default 0
+        speculative (str):      Open the next connection ('connect') and transmit its pre-phase ('pre') while the
+                                current test case is processed, 'off' disables it. Default 'off'
+        pipeline (int):         Children bred ahead per population by the background breeder, 0 disables it. Default 0
+        concurrency (int):      Test cases executed concurrently by the asyncio engine (tcp/ssl only), 1 runs them
+                                one by one. Default 1
+        pacing (bool):          Adapt the inter-test delay (or the number of concurrent connections) to connect
+                                failures, timeouts and latency of the target. Default False
+        response_feedback (bool): Count responses to fuzzed messages with an unseen structural fingerprint (see
+                                IFuzzer.fingerprint()) as novel like new coverage, for partially instrumented
+                                targets. Default False
     """
 
     def __init__(self,
@@ -86,6 +117,20 @@ class Session(object):
                  output: str = "",
                  dump_shm: bool = False,
                  deterministic: bool = False,
+                 scheduler: str = 'ucb',
+                 cull_interval: int = 0,
+                 cull_evict: bool = False,
+                 tmin: bool = False,
+                 bucket_frames: int = 0,
+                 bisect: bool = False,
+                 resume: str = "",
+                 checkpoint_interval: float = 300.0,
+                 sequences: int = 0,
+                 speculative: str = 'off',
+                 pipeline: int = 0,
+                 concurrency: int = 1,
+                 pacing: bool = False,
+                 response_feedback: bool = False,
                  ):
         super().__init__()
 
@@ -107,6 +152,20 @@ class Session(object):
             output=output,
             dump_shm=dump_shm,
             deterministic=deterministic,
+            scheduler=scheduler,
+            cull_interval=cull_interval,
+            cull_evict=cull_evict,
+            tmin=tmin,
+            bucket_frames=bucket_frames,
+            bisect=bisect,
+            resume=resume,
+            checkpoint_interval=checkpoint_interval,
+            sequences=sequences,
+            speculative=speculative,
+            pipeline=pipeline,
+            concurrency=concurrency,
+            pacing=pacing,
+            response_feedback=response_feedback,
         )
 
         self.fuzz_protocol = fuzz_protocol
@@ -121,50 +180,90 @@ class Session(object):
         self.graph = Graph()
 
         self.suspects = []
+        self.bug_count = 0
 
         self.restarter = restarter
-        self.restarter.restart(planned=True)
-        # self.restarter.suspend() TODO
 
         # Some variables that will be used during fuzzing
         self.time_budget = SessionClock(time_budget)
         self.test_case_cnt = 0
         self.populations = self.fuzz_protocol.get_populations(self)
+        if self.opts.sequences > 0:
+            # multi-message individuals, bred from the seeds of all populations
+            self.populations[Sequence.SPECIES] = SequencePopulation.generate(
+                {k: p for k, p in self.populations.items() if k != Sequence.SPECIES},
+                max_length=self.opts.sequences,
+                p_mutation=next(iter(self.populations.values()))._p_mutation,
+            )
         self.population_iterator = iter(sorted(self.populations.keys()))
         self.active_population = self.populations[next(self.population_iterator)]
         self.drain_seed_iterator = iter(self.active_population)
         self.active_individual = None
         self.active_testcase = None
         self.previous_testcase = None
+        self.coverage_baseline = None
         self.drain_seed_individuals = True
 
+        # background replays (test case minimization) share the target with the fuzzing loop
+        self.target_lock = TargetLock()
+        self.replayer = Replayer(self)
+        self.replay_worker = ReplayWorker()
+        self.replay_worker.start()
+        self.minimized = 0
+        self.bisected = 0
+
         self.is_paused = False
         self.prompt = None
         self.energy = 1.0
         self.energy_threshold = 0.05
         self.energy_periods = 0
         self.reheat_count = 0
+        self.scheduler = schedulers.get(scheduler, list(self.populations.keys()))
+        self.allocation = None
+        # children are bred in the background once the seeds have been drained
+        self.pipeline = CandidatePipeline(self, depth=self.opts.pipeline) if self.opts.pipeline > 0 else None
+        self.pacer = Pacer(max_window=self.opts.concurrency) if self.opts.pacing else None
+        self.feedback = ResponseFeedback(self.fuzz_protocol.fingerprint) if self.opts.response_feedback else None
+        self.async_runner = None
+        if self.opts.concurrency > 1:
+            if target.target_connection.proto not in ('tcp', 'ssl'):
+                raise exception.EPFRuntimeError(
+                    f'concurrent execution requires a tcp or ssl target, not {target.target_connection.proto}')
+            self.async_runner = AsyncRunner(self, self.opts.concurrency)
 
         # Create Results Dir if it does not exist
         self.result_dir = os.path.join('epf-results', f'{int(time.time())}')
         if self.opts.output != "":
             self.result_dir = self.opts.output
-        self.transition_payload_dir = os.path.join(self.result_dir, 'transition_payloads')
-        self.bug_payload_dir = os.path.join(self.result_dir, 'bug_payloads')
+        if self.opts.resume != "":
+            # continue writing into the directory of the interrupted run
+            self.result_dir = self.opts.resume
+            if not checkpoint.exists(self.result_dir):
+                raise exception.EPFRuntimeError(f"No checkpoint found in {self.result_dir}")
         helpers.mkdir_safe(self.result_dir)
-        helpers.mkdir_safe(self.transition_payload_dir)
+        if self.opts.bucket_frames > 0:
+            # capture sanitizer reports for crash bucketing
+            self.restarter.stderr_log = os.path.join(self.result_dir, 'target.stderr')
+        self.restarter.restart(planned=True)
+        # self.restarter.suspend() TODO
+        self.crash_buckets = triage.CrashBuckets(os.path.join(self.result_dir, 'buckets.json'))
+        if self.opts.resume != "":
+            self.crash_buckets.load()
+            checkpoint.restore(self, checkpoint.load(self.result_dir))
+            # absorb the startup coverage of the fresh target instance
+            self.resync_coverage()
+        self.last_checkpoint = self.time_budget.execution_time
         self.write_run_json()
-        for p in iter(sorted(self.populations.keys())):
-            helpers.mkdir_safe(os.path.join(self.transition_payload_dir, p))
-            helpers.mkdir_safe(os.path.join(self.bug_payload_dir, p))
-        self.bugs_csv = None
-        self.bugs_csv_writer = None
-        self.debug_csv = None
-        self.debug_csv_writer = None
+        # bugs.csv, the execution log and payload files are written asynchronously
+        self.writer = ResultWriter()
+        self.writer.start()
+        # interesting individuals and bug payloads, stored by content
+        self.store = ArtifactStore(os.path.join(self.result_dir, 'store'), self.writer)
+        self.bugs_csv = os.path.join(self.result_dir, 'bugs.csv')
         self.prepare_bugs_csv()
         self.opts.debug = debug
-        if self.opts.debug:
-            self.prepare_debug_csv()
+        self.execlog = ExecLog(self.result_dir, self.writer, resume=self.opts.resume != "") \
+            if self.opts.debug else None
         self.update_bug_db = False
         self.t_last_increase = time.time()
         self.test_case_buffer = []
@@ -181,6 +280,11 @@ class Session(object):
                 "random_seed": self.opts.seed,
                 "output": self.result_dir,
                 "debug": self.opts.debug,
+                "tmin": self.opts.tmin,
+                "bucket_frames": self.opts.bucket_frames,
+                "bisect": self.opts.bisect,
+                "resume": self.opts.resume,
+                "checkpoint_interval": self.opts.checkpoint_interval,
                 "dump_shm": self.opts.dump_shm,
                 "deterministic": self.opts.deterministic,
                 "dtrace": constants.TRACE,
@@ -193,6 +297,13 @@ class Session(object):
                 "connection": f'{self.target.target_connection.host}:{self.target.target_connection.port}',
                 "send_timeout": self.opts.send_timeout,
                 "recv_timeout": self.opts.recv_timeout,
+                "speculative": self.opts.speculative,
+                "strategy": getattr(self.target.target_connection, 'strategy', 'graceful'),
+                "low_latency": getattr(self.target.target_connection, 'low_latency', False),
+                "udp_persistent": getattr(self.target.target_connection, 'udp_persistent', False),
+                "concurrency": self.opts.concurrency,
+                "pacing": self.opts.pacing,
+                "response_feedback": self.opts.response_feedback,
             },
             "instrumentation": {
                 "mmap_id": mem.name,
@@ -206,12 +317,22 @@ class Session(object):
                     "population_names": [p for p in iter(sorted(self.populations.keys()))],
                     "population_sizes": [len(self.populations[p]) for p in iter(sorted(self.populations.keys()))],
                     "population_limit": self.opts.population_limit,
+                    "cull_interval": self.opts.cull_interval,
+                    "cull_evict": self.opts.cull_evict,
+                    "sequences": self.opts.sequences,
+                    "pipeline": self.opts.pipeline,
                 },
                 "simulated_annealing": {
                     "cooldown_alpha": self.opts.alpha,
                     "reheat_beta": self.opts.beta,
                     "spot_mutation_probability": self.active_population._p_mutation,
                 },
+                "scheduler": {
+                    "name": self.scheduler.name,
+                    "energy_threshold": self.energy_threshold,
+                    "energy_periods": self.energy_periods,
+                    "allocations": self.scheduler.summary(),
+                },
             },
         }
         mem.release()
@@ -219,10 +340,9 @@ class Session(object):
             json.dump(data, f, indent=2)
 
     def prepare_bugs_csv(self):
-        b_file = os.path.join(self.result_dir, 'bugs.csv')
-        self.bugs_csv = open(b_file, "w")
         header = [
             "bug_id",
+            "bucket",
             "timestamp",
             "iteration",
             "test_id",
@@ -237,31 +357,7 @@ class Session(object):
             "energy",
             "energy_period"
         ]
-        self.bugs_csv_writer = csv.DictWriter(self.bugs_csv, fieldnames=header)
-        self.bugs_csv_writer.writeheader()
-        self.bugs_csv.flush()
-
-    def prepare_debug_csv(self):
-        d_file = os.path.join(self.result_dir, 'debug.csv')
-        self.debug_csv = open(d_file, "w")
-        header = [
-            "timestamp",
-            "iteration",
-            "test_id",
-            "individual",
-            "increased_coverage",
-            "caused_restart",
-            "cause_of_restart",
-            "exit_code",
-            "reported_coverage",
-            "population",
-            "population_size",
-            "energy",
-            "energy_period"
-        ]
-        self.debug_csv_writer = csv.DictWriter(self.debug_csv, fieldnames=header)
-        self.debug_csv_writer.writeheader()
-        self.debug_csv.flush()
+        self.writer.open_csv(self.bugs_csv, header, append=self.opts.resume != "")
 
     def cooldown(self) -> float:
         self.energy *= self.opts.alpha
@@ -284,12 +380,16 @@ class Session(object):
             t = threading.Thread(target=self.run_all)
             t.start()
             t.join()
+            if self.pipeline is not None:
+                self.pipeline.stop()
+            self.replay_worker.stop()
             self.restarter.kill()
-            self.bugs_csv.flush()
-            self.bugs_csv.close()
-            if self.opts.debug:
-                self.debug_csv.flush()
-                self.debug_csv.close()
+            self.write_run_json()
+            self.save_checkpoint(force=True)
+            self.crash_buckets.save()
+            if self.execlog is not None:
+                self.execlog.close()
+            self.writer.close()
             if self.opts.dump_shm:
                 sp = os.path.join(self.result_dir, 'shm.bin')
                 with open(sp, 'wb') as dst:
@@ -301,21 +401,47 @@ class Session(object):
 
     # --------------------------------------------------------------- #
 
+    def current_coverage(self) -> int:
+        return self.coverage_baseline if self.coverage_baseline is not None else 0
+
+    def resync_coverage(self):
+        """
+        Absorb coverage that has been produced outside of a test case (e.g. by replays),
+        so that it is not credited to the next individual.
+        """
+        mem = shm.get()
+        mem.acquire()
+        self.coverage_baseline = mem.directed_branch_coverage()
+        mem.trace()
+        mem.release()
+
     def schedule_population(self):
+        if self.pipeline is not None:
+            # children in the pipeline are bred from the populations as they are now
+            self.pipeline.settle()
+        if self.allocation is None:
+            self.allocation = (self.active_population.species, self.time_budget.execution_time,
+                               self.current_coverage())
         if self.energy <= self.energy_threshold:
-            key = next(self.population_iterator, None)
-            if key is None:
-                # reset
-                self.population_iterator = iter(sorted(self.populations.keys()))
-                self.energy_periods += 1
-                key = next(self.population_iterator)
+            # report the yield of the finished allocation and let the scheduler pick the next population
+            species, t_start, cov_start = self.allocation
+            self.scheduler.update(species,
+                                  coverage=self.current_coverage() - cov_start,
+                                  elapsed=self.time_budget.execution_time - t_start)
+            self.energy_periods = self.scheduler.rounds
+            key = self.scheduler.select()
             self.active_population = self.populations[key]
+            self.allocation = (key, self.time_budget.execution_time, self.current_coverage())
             self.energy = 1.0
             if self.energy_periods > 0:
-                self.active_population.reseed(self.opts.population_limit)
+                with self.active_population.lock:
+                    self.active_population.reseed(self.opts.population_limit)
         self.cooldown()
 
     def generate_individual(self):
+        if self.pipeline is not None:
+            self.active_individual = self.pipeline.take(self.active_population)
+            return
         self.active_individual = self.active_population.new_child()
 
     def evaluate_individual(self):
@@ -327,39 +453,83 @@ class Session(object):
         if len(self.test_case_buffer) > 10:
             self.test_case_buffer.pop(0)
         if not self.restarter.healthy():
-            self.update_bugs(Exception("uncertain"))
+            self.update_bugs(Exception("uncertain"), crashing=self.previous_testcase)
         err, executed = self.active_testcase.run()
         return err, executed
 
 
-    def update_population(self, err, executed) -> bool:
+    def update_population(self, err, executed, change: bool = None) -> bool:
+        """
+        @param change: overrides the coverage comparison with the baseline (see AsyncRunner.recheck)
+        """
+        if self.pipeline is not None:
+            self.pipeline.settle()
         crashed = not self.restarter.healthy()
-        if (crashed or not executed) and not isinstance(err, exception.EPFPaused):
-            self.update_bugs(err)
+        # take the snapshot before a restart, so that the trace covers the crashing execution only
         cov = self.active_testcase.coverage_snapshot
-        change = cov != self.previous_testcase.coverage_snapshot if self.previous_testcase is not None else True
+        # a failed connect on the fuzzer's side (e.g. port exhaustion) is not the target's fault
+        local = isinstance(err, exception.EPFLocalConnectionError)
+        if (crashed or (not executed and not local)) and not isinstance(err, exception.EPFPaused):
+            self.update_bugs(err, crashing=self.active_testcase)
+        if self.pacer is not None and not crashed:
+            self.pacer.observe(latency=self.active_testcase.latency, timeouts=self.active_testcase.timeouts)
+        if change is None:
+            change = cov != self.coverage_baseline if self.coverage_baseline is not None else True
+        self.coverage_baseline = cov
+        # an unseen response is a novelty event as well, but no coverage increase
+        novel = self.feedback.observe(self.active_testcase.fingerprints) if self.feedback is not None else False
         if constants.TRACE:
             print(f"cov_trace, {self.test_case_cnt}, {cov}, {change}", file=sys.stderr)
-        if change:
-            self.t_last_increase = time.time()
-            self.active_testcase.coverage_increase = True
-            self.reheat()
-            self.active_population.update(self.active_individual, heat=self.energy, add=change)
-        else:
-            self.active_population.update(self.active_individual, heat=self.energy, add=random.random() <= self.energy)
-        self.active_population.shrink(self.opts.population_limit)
+        with self.active_population.lock:
+            if change or novel:
+                if change:
+                    self.t_last_increase = time.time()
+                    self.active_testcase.coverage_increase = True
+                self.reheat()
+                self.active_population.update(self.active_individual, heat=self.energy, add=True)
+                self.store_individual(self.active_individual, 'corpus')
+            else:
+                self.active_population.update(self.active_individual, heat=self.energy,
+                                              add=random.random() <= self.energy)
+            self.active_population.shrink(self.opts.population_limit)
+        if self.opts.cull_interval > 0 and self.test_case_cnt % self.opts.cull_interval == 0:
+            for pop in self.populations.values():
+                with pop.lock:
+                    pop.cull(evict=self.opts.cull_evict)
         return True
 
-    def update_bugs(self, err: Exception):
+    def update_bugs(self, err: Exception, crashing: TestCase = None, suspects: List[TestCase] = None):
+        """
+        @param crashing: test case whose trace signs the crash
+        @param suspects: test cases that may have caused the crash, the recent ones (test case buffer) by default
+        """
+        suspects = list(self.test_case_buffer) if suspects is None else suspects
+        self.target.discard()
         retval = self.restarter.kill()
+        frames = triage.stack_frames(self.restarter.stderr_tail(), self.opts.bucket_frames)
         self.restarter.restart()
-        for tcs in self.test_case_buffer:
+        bucket, new = self.crash_buckets.classify(
+            exit_code=int(retval),
+            trace=crashing.trace if crashing is not None else None,
+            frames=frames,
+            timestamp=round(self.time_budget.execution_time, 2),
+            iteration=self.test_case_cnt,
+        )
+        self.test_case_buffer = []
+        if not new:
+            # known bucket, only count the hit
+            return
+        self.crash_buckets.save()
+        for tcs in suspects:
             tcs.add_error(err)
             tcs.needed_restart = True
             tcs.exit_code = int(retval)
+            self.bug_count += 1
+            tcs.bug_id = self.bug_count
             self.suspects += [tcs]
             row = {
-                "bug_id": len(self.suspects),
+                "bug_id": tcs.bug_id,
+                "bucket": bucket.bucket_id,
                 "timestamp": round(self.time_budget.execution_time, 2),
                 "iteration": self.test_case_cnt,
                 "test_id": tcs.name,
@@ -374,37 +544,103 @@ class Session(object):
                 "energy": self.energy,
                 "energy_period": self.energy_periods
             }
-            self.bugs_csv_writer.writerow(row)
-            self.bugs_csv.flush()
-            with open(os.path.join(self.bug_payload_dir, tcs.individual.species, str(tcs.individual.identity)), "wb") as f:
-                f.write(tcs.individual.serialize())
-                f.flush()
-        self.test_case_buffer = []
+            self.writer.write_row(self.bugs_csv, row, critical=True)
+            self.store_individual(tcs.individual, 'bug', bug_id=tcs.bug_id, bucket=bucket.bucket_id)
+        if self.opts.bisect:
+            self.replay_worker.submit(functools.partial(self.bisect_bug, suspects, bucket, int(retval)))
+        elif self.opts.tmin:
+            # most recent test cases first, they are the most likely culprits
+            for tcs in reversed(suspects):
+                self.replay_worker.submit(functools.partial(self.minimize_bug, tcs.individual, tcs.exit_code))
+
+    def bisect_bug(self, testcases: List[TestCase], bucket: triage.CrashBucket, signature: int) -> bool:
+        """
+        Narrow a crash down to the test case(s) that cause it by replaying them on a fresh target instance.
+        The culprits are tagged in the crash bucket and, if enabled, minimized afterwards.
+
+        @param testcases: buffered test cases in execution order
+        @param bucket: crash bucket of the original crash
+        @param signature: exit code of the original crash
+        @return: True if the crash reproduced
+        """
+        plans = [transmission_plan(self.populations, tcs.individual, renumber=self.fuzz_protocol.renumber)
+                 for tcs in testcases]
+        window = Bisector(self.replayer, running=lambda: self.replay_worker.running).bisect(plans, signature)
+        if window is None:
+            if self.replay_worker.running:
+                bucket.culprits = []
+                self.crash_buckets.save()
+            return False
+        first, last = window
+        culprits = testcases[first:last + 1]
+        for tcs in culprits:
+            tcs.culprit = True
+        bucket.culprits = [str(tcs.individual.identity) for tcs in culprits]
+        self.crash_buckets.save()
+        self.bisected += 1
+        if self.opts.tmin:
+            self.minimize_bug(culprits[-1].individual, signature, prefix=plans[first:last])
+        return True
+
+    def minimize_bug(self, individual, signature: int, prefix: List[Tuple] = ()) -> Union[str, None]:
+        """
+        Minimize a crashing individual on a fresh target instance and put the result into the artifact store.
+
+        @param individual: Individual that is suspected to crash the target
+        @param signature: exit code of the original crash
+        @param prefix: transmission plans that have to precede the individual to reproduce the crash
+        @return: digest of the minimized payload or None if the crash did not reproduce
+        """
+        minimizer = Minimizer(self.replayer, self.populations, running=lambda: self.replay_worker.running,
+                              prefix=prefix, renumber=self.fuzz_protocol.renumber)
+        payload = minimizer.minimize(individual, signature)
+        if payload is None:
+            return None
+        digest = self.store.put(payload, 'min', species=individual.species, identity=individual.identity,
+                                parents=(individual.identity, None),
+                                timestamp=self.time_budget.execution_time, signature=signature)
+        self.minimized += 1
+        return digest
+
+    def store_individual(self, individual, kind: str, **extra) -> str:
+        """
+        Put the payload of an individual into the artifact store
+
+        @param individual: Individual to store
+        @param kind: artifact kind ('seed', 'corpus' or 'bug')
+        @param extra: further fields of the index entry
+        @return: digest of the payload
+        """
+        tc = individual.testcase
+        if isinstance(individual, Sequence):
+            # a member that can not be serialized must not prevent storing the others
+            payload = individual.serialize(strict=False)
+        else:
+            payload = individual.serialize()
+        return self.store.put(payload, kind, species=individual.species,
+                              identity=individual.identity, parents=individual.parents,
+                              coverage=tc.coverage_snapshot if tc is not None else 0,
+                              timestamp=self.time_budget.execution_time, **extra)
 
     def debug(self):
         if not self.opts.debug:
             return
         tc: TestCase = self.active_testcase
-        row = {
-            "timestamp": round(self.time_budget.execution_time, 2),
-            "iteration": self.test_case_cnt,
-            "test_id": tc.name,
-            "individual": tc.individual.identity,
-            "increased_coverage": tc.coverage_increase,
-            "caused_restart": tc.needed_restart,
-            "cause_of_restart": str(tc.errors[-1]) if len(tc.errors) != 0 else "-",
-            "exit_code": tc.exit_code if len(tc.errors) != 0 else 0,
-            "reported_coverage": tc.coverage_snapshot,
-            "population": tc.individual.species,
-            "population_size": len(self.populations[tc.individual.species]),
-            "energy": self.energy,
-            "energy_period": self.energy_periods
-        }
-        # with open(os.path.join(self.bug_payload_dir, tc.individual.species, str(tc.individual.identity)), "wb") as f:
-        #     f.write(tc.individual.serialize())
-        #     f.flush()
-        self.debug_csv_writer.writerow(row)
-        self.debug_csv.flush()
+        self.execlog.append(
+            timestamp=self.time_budget.execution_time,
+            iteration=self.test_case_cnt,
+            test_id=tc.id,
+            individual=tc.individual.identity,
+            increased_coverage=tc.coverage_increase,
+            caused_restart=tc.needed_restart,
+            cause_of_restart=str(tc.errors[-1]) if len(tc.errors) != 0 else "-",
+            exit_code=(tc.exit_code or 0) if len(tc.errors) != 0 else 0,
+            reported_coverage=tc.coverage_snapshot,
+            population=tc.individual.species,
+            population_size=len(self.populations[tc.individual.species]),
+            energy=self.energy,
+            energy_period=self.energy_periods
+        )
 
     def cont(self) -> bool:
         """
@@ -442,32 +678,64 @@ class Session(object):
                 self.active_population = self.populations[key]
                 self.drain_seed_iterator = iter(self.active_population)
                 continue
-            self.evaluate_individual()
-            self.restarter.kill(ignore=True)
-            self.restarter.restart(planned=True)
-            self.debug()
+            with self.target_lock.fuzz():
+                self.evaluate_individual()
+                # trace the seed for corpus culling
+                self.coverage_baseline = self.active_testcase.coverage_snapshot
+                if self.feedback is not None:
+                    # responses to the seeds are known, not novel
+                    self.feedback.observe(self.active_testcase.fingerprints)
+                self.store_individual(self.active_individual, 'seed')
+                self.target.discard()
+                self.restarter.kill(ignore=True)
+                self.restarter.restart(planned=True)
+                self.debug()
+
+    def save_checkpoint(self, force: bool = False):
+        """
+        Checkpoint the campaign if the checkpoint interval has passed (see --resume)
+
+        @param force: checkpoint regardless of the interval
+        """
+        if self.opts.checkpoint_interval <= 0:
+            return
+        if not force and self.time_budget.execution_time - self.last_checkpoint < self.opts.checkpoint_interval:
+            return
+        checkpoint.save(self)
+        self.last_checkpoint = self.time_budget.execution_time
+        if constants.TRACE:
+            print(f"checkpoint_trace, {self.test_case_cnt}, {self.last_checkpoint}", file=sys.stderr)
 
     def run_all(self):
         if self.drain_seed_individuals:
             self.drain()
+            if not self.drain_seed_individuals:
+                self.save_checkpoint(force=True)
+        if self.pipeline is not None and not self.pipeline.is_alive():
+            self.pipeline.start()
+        if self.async_runner is not None:
+            self.async_runner.run()
+            return
         #########
         while self.cont():                                      # while CONTINUE(C)
-            self.schedule_population()                          #   conf <- SCHEDULE(C, t_elapsed, t_limit)
-            self.generate_individual()                          #   tcs  <- INPUTGEN(conf)
-            err, executed = self.evaluate_individual()
-            self.update_population(err, executed)
-            # retry = False
-            # while True:
-            #    # retry
-            #    failed = self.evaluate_individual(retry=retry)  #   B', execinfos <- INPUTEVAL(conf, tcs, O_bug)
-            #    retry = not self.update_population(failed)      #   C <- CONFUPDATE(C', conf, execinfos)
-            #    if not retry:
-            #        break
-            #    if constants.TRACE:
-            #        print(f"retry, {self.test_case_cnt}", file=sys.stderr)
-            # self.update_bugs()                                  #   B <- B u B'
-            ##################
-            self.debug()
+            with self.target_lock.fuzz():
+                self.schedule_population()                      #   conf <- SCHEDULE(C, t_elapsed, t_limit)
+                self.generate_individual()                      #   tcs  <- INPUTGEN(conf)
+                err, executed = self.evaluate_individual()
+                self.update_population(err, executed)
+                # retry = False
+                # while True:
+                #    # retry
+                #    failed = self.evaluate_individual(retry=retry)  #   B', execinfos <- INPUTEVAL(conf, tcs, O_bug)
+                #    retry = not self.update_population(failed)      #   C <- CONFUPDATE(C', conf, execinfos)
+                #    if not retry:
+                #        break
+                #    if constants.TRACE:
+                #        print(f"retry, {self.test_case_cnt}", file=sys.stderr)
+                # self.update_bugs()                                  #   B <- B u B'
+                ##################
+                self.debug()
+                self.save_checkpoint()
 
     # ================================================================#
     # Suspects, disabled elements                                     #
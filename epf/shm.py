@@ -47,6 +47,7 @@ class AFLShm(abc.ABC):
         self._identifier = identifier
         self._size = size
         self.history = [0] * INSTR_AFL_MAP_SIZE
+        self._last_trace = np.zeros(INSTR_AFL_MAP_SIZE, dtype=np.uint8)
         self._mut = Lock()
 
     @abc.abstractmethod
@@ -71,6 +72,18 @@ class AFLShm(abc.ABC):
             count = tmp
         return count
 
+    def trace(self) -> np.ndarray:
+        """
+        Sparse trace of all map entries that changed since the previous call, i.e. the edges that were hit
+        in between. Unlike the history, the map itself is left untouched.
+
+        :return: sorted index array (np.uint32)
+        """
+        snap = np.frombuffer(self.buf, dtype=np.uint8)
+        idx = np.flatnonzero(snap != self._last_trace).astype(np.uint32)
+        self._last_trace = snap
+        return idx
+
     def acquire(self):
         self._mut.acquire()
 
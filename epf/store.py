@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Iterator, List, Union
+
+from . import helpers
+from .writer import ResultWriter
+
+INDEX_FILE = 'index.jsonl'
+OBJECTS_DIR = 'objects'
+
+
+class Artifact(object):
+    """Index entry of a stored payload"""
+
+    def __init__(self, digest: str, kind: str, species: str, identity: str, parents: List[Union[str, None]],
+                 coverage: int, timestamp: float, size: int, **extra):
+        self.digest = digest
+        self.kind = kind
+        self.species = species
+        self.identity = identity
+        self.parents = list(parents)
+        self.coverage = coverage
+        self.timestamp = timestamp
+        self.size = size
+        self.extra = extra
+
+    def to_dict(self) -> Dict:
+        d = {
+            "digest": self.digest,
+            "kind": self.kind,
+            "species": self.species,
+            "identity": self.identity,
+            "parents": self.parents,
+            "coverage": self.coverage,
+            "timestamp": self.timestamp,
+            "size": self.size,
+        }
+        d.update(self.extra)
+        return d
+
+
+class ArtifactStore(object):
+    """
+    Content-addressed store for interesting individuals and bug payloads.
+
+    Payloads are saved once as blobs named by their sha256 digest (objects/<2 hex>/<digest>), no matter how many
+    individuals, bugs or minimizations share them. Every stored artifact is described by a line in the append-only
+    index (index.jsonl) that records its kind, species, identity, parent identities, coverage and discovery time.
+    Opening an existing store is a single scan over the index.
+
+    Blobs and index lines are written through the ResultWriter; since the writer processes records in order, a
+    blob is always on disk before the index line that refers to it.
+
+    Args:
+        directory (str): store directory, created if it does not exist
+        writer (ResultWriter): asynchronous writer
+    """
+
+    def __init__(self, directory: str, writer: ResultWriter):
+        self.directory = directory
+        self.writer = writer
+        self.index_path = os.path.join(directory, INDEX_FILE)
+        self._digests = set()
+        self._artifacts: List[Artifact] = []
+        self._mut = threading.Lock()
+        helpers.mkdir_safe(os.path.join(directory, OBJECTS_DIR))
+        if os.path.isfile(self.index_path):
+            self._scan()
+
+    def _scan(self):
+        with open(self.index_path) as f:
+            for line in f:
+                try:
+                    artifact = Artifact(**json.loads(line))
+                except (ValueError, TypeError):
+                    # torn last line of an interrupted run
+                    continue
+                self._artifacts += [artifact]
+                self._digests.add(artifact.digest)
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.directory, OBJECTS_DIR, digest[:2], digest)
+
+    def put(self, data: bytes, kind: str, species: str, identity, parents=(None, None), coverage: int = 0,
+            timestamp: float = 0.0, **extra) -> str:
+        """
+        Store a payload and append its index entry
+
+        @param data: payload
+        @param kind: artifact kind, e.g. 'seed', 'corpus', 'bug' or 'min'
+        @param species: population the payload belongs to
+        @param identity: identity of the individual
+        @param parents: identities of the individual's parents
+        @param coverage: reported coverage when the payload was found
+        @param timestamp: discovery time (session execution time)
+        @param extra: further json serializable fields, e.g. bug_id
+        @return: digest of the payload
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        artifact = Artifact(digest, kind, species, str(identity), [str(p) if p is not None else None for p in parents],
+                            int(coverage), round(timestamp, 2), len(data), **extra)
+        with self._mut:
+            if digest not in self._digests:
+                self._digests.add(digest)
+                helpers.mkdir_safe(os.path.dirname(self.blob_path(digest)))
+                self.writer.write_file(self.blob_path(digest), data, critical=True)
+            self._artifacts += [artifact]
+            self.writer.write_file(self.index_path, (json.dumps(artifact.to_dict()) + '\n').encode('utf-8'),
+                                   critical=True, append=True)
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        with open(self.blob_path(digest), 'rb') as f:
+            return f.read()
+
+    def artifacts(self, kind: str = None) -> Iterator[Artifact]:
+        with self._mut:
+            artifacts = list(self._artifacts)
+        return iter([a for a in artifacts if kind is None or a.kind == kind])
+
+    @property
+    def blobs(self) -> int:
+        return len(self._digests)
+
+    def __len__(self) -> int:
+        return len(self._artifacts)
+
+    def __contains__(self, digest: str) -> bool:
+        return digest in self._digests
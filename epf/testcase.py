@@ -1,13 +1,49 @@
 import time
-from typing import List, TYPE_CHECKING, Any, Tuple
+from typing import List, TYPE_CHECKING, Any, Tuple, Dict, Callable
 
-from epf.chromo import Individual
+from epf.chromo import Individual, Sequence
 from epf.ip_constants import DEFAULT_MAX_RECV
 from epf import exception, helpers
 from epf import shm
 
 if TYPE_CHECKING:
     from epf.session import Session
+    from epf.chromo import Population
+
+Plan = Tuple[List[Tuple[bytes, bool]], List[Tuple[bytes, bool]], List[Tuple[bytes, bool]]]
+
+
+def transmission_plan(populations: Dict[str, 'Population'], individual: Individual, payload: bytes = None,
+                      renumber: Callable[[List[bytes]], List[bytes]] = None) -> Plan:
+    """
+    Collect everything that is sent within the connection of a test case.
+
+    A Sequence sends each of its members as a message of its own, enclosed by the longest pre-phase among its
+    members' populations (a member may need a transition the first one does not) and the post-phase of the last
+    member's population. As the members stem from different seeds, the fuzzer may renumber them, e.g. to
+    restore consecutive sequence numbers (see IFuzzer.renumber()).
+
+    @param populations: session populations, provide the state graphs and receive flags
+    @param individual: the fuzzed individual or sequence
+    @param payload: replaces the serialized individual (all members of a sequence) if not None
+    @param renumber: fuzzer hook applied to all payloads of a sequence's connection
+    @return: (pre-phase, fuzzed messages, post-phase), each a list of (bytes, recv_after_send)
+    """
+    members = individual.members if isinstance(individual, Sequence) else [individual]
+    last = populations[members[-1].species]
+    pre = max(([(p.bytes, p.recv_after_send) for p in populations[m.species].state_graph.traverse_pre_phase()]
+               for m in members), key=len)
+    if payload is not None:
+        messages = [(payload, last.recv_after_send)]
+    else:
+        messages = [(m.serialize(), populations[m.species].recv_after_send) for m in members]
+    post = [(p.bytes, p.recv_after_send) for p in last.state_graph.traverse_post_phase()]
+    if renumber is not None and isinstance(individual, Sequence):
+        plan = pre + messages + post
+        payloads = renumber([data for data, _ in plan])
+        plan = [(data, recv) for data, (_, recv) in zip(payloads, plan)]
+        pre, messages, post = plan[:len(pre)], plan[len(pre):len(pre) + len(messages)], plan[len(pre) + len(messages):]
+    return pre, messages, post
 
 
 class TestCase(object):
@@ -29,10 +65,17 @@ class TestCase(object):
         self.errors = []
         self.needed_restart = False
         self.exit_code = None
+        self.culprit = False
+        self.bug_id = None
         self.individual.testcase = self
         self.done = False
         self._cov = None
+        self._trace = None
         self.coverage_increase = False
+        self.latency = None
+        self.timeouts = 0
+        # structural fingerprints of the responses to the fuzzed messages (see ResponseFeedback)
+        self.fingerprints = []
 
     def add_error(self, error):
         """ Add an error to the current case """
@@ -44,9 +87,20 @@ class TestCase(object):
             mem = shm.get()
             mem.acquire()
             self._cov = mem.directed_branch_coverage()
+            self._trace = mem.trace()
             mem.release()
         return self._cov
 
+    @property
+    def trace(self):
+        """Sparse edge trace of this test case, None until the coverage snapshot has been taken"""
+        return self._trace
+
+    def attribute(self, coverage: int, trace):
+        """Use a snapshot taken for several concurrent test cases (see AsyncRunner) as the snapshot of this one"""
+        self._cov = coverage
+        self._trace = trace
+
     def run(self) -> Tuple[Any, bool]:
 
         """
@@ -59,22 +113,47 @@ class TestCase(object):
         Returns: True if the TestCase was run and data was transmitted (even if transmission was cut)
                  False if there was a connection issue and the target was paused, so the TestCase was not run
         """
+        speculative = self.session.opts.speculative
+        pacer = self.session.pacer
+        feedback = self.session.feedback
+        conn = self.session.target.target_connection
+        timeouts = conn.recv_timeout_count + conn.send_timeout_count
+        t_start = time.monotonic()
         try:
-            self.open_fuzzing_target()
-            population = self.session.populations[self.individual.species]
-            # process pre-phase of population for state transitions
-            for pre in population.state_graph.traverse_pre_phase():
-                self.transmit(pre.bytes, receive=pre.recv_after_send)
+            pre_phase, messages, post_phase = transmission_plan(self.session.populations, self.individual,
+                                                                renumber=self.session.fuzz_protocol.renumber)
+            primed = self.open_fuzzing_target(preamble=pre_phase if speculative == 'pre' else None)
+            # process pre-phase of population for state transitions, unless a speculatively opened
+            # connection did so already
+            if not primed:
+                for data, recv in pre_phase:
+                    self.transmit(data, receive=recv)
             # fuzz individual
-            self.transmit(self.individual.serialize(), receive=population.recv_after_send)
-            for post in population.state_graph.traverse_post_phase():
-                self.transmit(post.bytes, receive=post.recv_after_send, relax=self.session.opts.post_relax)
-            time.sleep(0.01)
+            for data, recv in messages:
+                response = self.transmit(data, receive=recv)
+                if feedback is not None:
+                    if not recv:
+                        # catch an answer that nobody waits for, but not for the full receive timeout
+                        response = self.session.target.poll(feedback.poll_timeout)
+                    self.fingerprints.append(feedback.fingerprint(response))
+            for data, recv in post_phase:
+                self.transmit(data, receive=recv, relax=self.session.opts.post_relax)
+            self.latency = time.monotonic() - t_start
+            if speculative == 'off' and pacer is None:
+                time.sleep(0.01)
             try:
                 self.session.target.close()
             except Exception:
                 pass
-            time.sleep(0.01)
+            if pacer is not None:
+                # the controller's delay replaces the fixed settling time
+                pacer.pace()
+            elif speculative == 'off':
+                time.sleep(0.01)
+            if speculative != 'off':
+                # open the connection of the next test case while the session processes this one, most likely
+                # the next individual stems from the same population and needs the same pre-phase
+                self.session.target.prefetch(preamble=pre_phase if speculative == 'pre' else None)
             self.done = True
             return None, True
         except exception.EPFPaused as e:
@@ -83,31 +162,50 @@ class TestCase(object):
             return e, False
         except Exception as e:
             return e, False
+        finally:
+            self.timeouts = conn.recv_timeout_count + conn.send_timeout_count - timeouts
 
-    def open_fuzzing_target(self):
+    def open_fuzzing_target(self, preamble=None) -> bool:
         """
         Try to open the target, twice in case one fails, saving last case as suspect if something goes wrong,
         restarting the target if a restarter is defined, and waiting for the target to wake up after that.
 
+        @param preamble: pre-phase that a speculatively opened connection may have transmitted already
+        @return: True if the pre-phase has been transmitted already
         """
-        target = self.session.target
-
         try:
-            target.open()
+            return self.session.target.open(preamble=preamble)
         except (exception.EPFTargetConnectionFailedError, Exception):
-            for i in range(0, 3):
-                try:
-                    time.sleep(0.25)
-                    target.open()  # Second try, just in case we have a network error not caused by the fuzzer
-                except Exception:
-                    pass
+            self.reopen_fuzzing_target()
+            return False
+
+    def reopen_fuzzing_target(self):
+        """
+        Retry a failed connect: three attempts with backoff, then a last one whose failure is raised
+
+        @raise EPFLocalConnectionError: if the last attempt failed on the fuzzer's side
+        @raise EPFTargetConnectionFailedError: if the last attempt failed otherwise
+        """
+        target = self.session.target
+        pacer = self.session.pacer
+        for i in range(0, 3):
             try:
-                target.open()
-            except Exception as e:
-                raise exception.EPFTargetConnectionFailedError()
-                # MARKER
-                # complications, retval = self.session.restarter.assert_healthy(force_kill=True)
-                # self.session.add_last_case_as_suspect(e, complications, retval)
+                if pacer is not None:
+                    pacer.backoff()
+                else:
+                    time.sleep(0.25)
+                target.open()  # Second try, just in case we have a network error not caused by the fuzzer
+            except Exception:
+                pass
+        try:
+            target.open()
+        except exception.EPFLocalConnectionError:
+            raise
+        except Exception as e:
+            raise exception.EPFTargetConnectionFailedError()
+            # MARKER
+            # complications, retval = self.session.restarter.assert_healthy(force_kill=True)
+            # self.session.add_last_case_as_suspect(e, complications, retval)
 
     def transmit(self, data: bytes, receive=False, relax=False):
         """
@@ -117,13 +215,18 @@ class TestCase(object):
             data: bytes
             receive: if True, it will try to receive data after sending the request
 
-        Returns: None
+        Returns: The response (memoryview, only valid until the next receive) if receive is True, else None
         Raises: EPFTestCaseAborted when a transmission error occurs
         """
 
         # 1. SEND DATA
         try:
-            self.session.target.send(data)
+            try:
+                self.session.target.send(data)
+            except (exception.EPFTargetConnectionFailedError, exception.EPFLocalConnectionError):
+                # a connect deferred to the first send (TCP Fast Open) failed, retry it like a failed open
+                self.reopen_fuzzing_target()
+                self.session.target.send(data)
         except Exception as e:
             if not relax:
                 # healthy = self.session.restarter.healthy()
@@ -139,7 +242,7 @@ class TestCase(object):
         # 2. RECEIVE DATA
         if receive:
             try:
-                last_recv = self.session.target.recv(DEFAULT_MAX_RECV)
+                last_recv = self.session.target.recv_view(DEFAULT_MAX_RECV)
                 if not last_recv:
                     raise exception.EPFTargetRecvTimeout
             except Exception as e:
@@ -152,6 +255,7 @@ class TestCase(object):
                 #     self.session.add_current_case_as_suspect(e, True, retval)
                 #     return
                 raise e
+            return last_recv
 
     # --------------------------------------------------------------- #
 
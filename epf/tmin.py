@@ -0,0 +1,85 @@
+import sys
+from typing import Callable, Dict, List, Union, TYPE_CHECKING
+
+from . import constants
+from .chromo import Individual
+from .replay import Replayer
+from .testcase import Plan, transmission_plan
+
+if TYPE_CHECKING:
+    from epf.chromo import Population
+
+
+class Minimizer(object):
+    """
+    Test case minimization (tmin) of a crashing individual.
+
+    The individual is replayed against a fresh target instance and shrunk as long as the crash signature still
+    reproduces: first field by field, by resetting each chromosome to its default value (scapy then recomputes
+    lengths and checksums), then byte by byte on the serialized payload by removing blocks of decreasing size.
+
+    If the crash requires preceding test cases (see Bisector), their plans are replayed as an unchanged prefix
+    before each candidate.
+
+    Args:
+        replayer (Replayer): executes candidates on a fresh target
+        populations (Dict[str, Population]): session populations, provide pre- and post-phases
+        max_execs (int): upper bound of replays per minimization
+        running (Callable): polled between replays, minimization is aborted when it returns False
+        prefix (List[Plan]): plans replayed before each candidate
+        renumber (Callable): fuzzer hook applied to the payloads of sequences, see transmission_plan()
+    """
+
+    def __init__(self, replayer: Replayer, populations: Dict[str, 'Population'], max_execs: int = 256,
+                 running: Callable[[], bool] = lambda: True, prefix: List[Plan] = (),
+                 renumber: Callable[[List[bytes]], List[bytes]] = None):
+        self.replayer = replayer
+        self.populations = populations
+        self.max_execs = max_execs
+        self.running = running
+        self.prefix = list(prefix)
+        self.renumber = renumber
+        self.execs = 0
+
+    def reproduces(self, individual: Individual, signature: int, payload: bytes = None) -> bool:
+        if self.execs >= self.max_execs or not self.running():
+            return False
+        self.execs += 1
+        plans = self.prefix + [transmission_plan(self.populations, individual, payload, renumber=self.renumber)]
+        return self.replayer.run(plans) == signature
+
+    def minimize(self, individual: Individual, signature: int) -> Union[bytes, None]:
+        """
+        Minimize a crashing individual
+
+        @param individual: individual suspected to crash the target (after the prefix)
+        @param signature: exit code of the original crash
+        @return: minimized payload or None if the crash does not reproduce
+        """
+        if not self.reproduces(individual, signature):
+            return None
+        clone = individual.clone()
+        # 1. field by field
+        for name, chromo in sorted(clone.chromosomes.items()):
+            value = chromo.current_value
+            if value == chromo.original_value:
+                continue
+            chromo.reset_value()
+            if not self.reproduces(clone, signature):
+                chromo.current_value = value
+        payload = clone.serialize()
+        # 2. byte by byte
+        block = max(1, len(payload) // 16)
+        while block >= 1 and self.execs < self.max_execs:
+            pos = 0
+            while pos < len(payload) and len(payload) > 1:
+                candidate = payload[:pos] + payload[pos + block:]
+                if self.reproduces(clone, signature, payload=candidate):
+                    payload = candidate
+                else:
+                    pos += block
+            block //= 2
+        if constants.TRACE:
+            print(f"tmin_trace, {individual.identity}, {len(individual.serialize())}, {len(payload)}, {self.execs}",
+                  file=sys.stderr)
+        return payload
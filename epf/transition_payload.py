@@ -1,4 +1,14 @@
-from typing import Generator
+import bisect
+import collections
+import sys
+from typing import Callable, Dict, Generator, List, Sequence, Tuple, Union
+
+from scapy.layers.inet import IP, TCP
+from scapy.layers.inet6 import IPv6
+from scapy.packet import Packet
+
+from . import constants
+from . import ingest
 from .graph import Graph
 
 
@@ -30,9 +40,14 @@ class TransitionPayload(object):
 class TransitionGraph(Graph):
     def __init__(self, population: 'Population'):
         super().__init__()
+        self.pop = population
+        self.reset()
+
+    def reset(self):
+        """Remove all transitions, pre- and post-phase can be built again afterwards"""
+        Graph.__init__(self)
         self._pre_done = False
         self._post_done = False
-        self.pop = population
         self._prev_node = self.root
         self.has_pre_phase = False
         self.has_post_phase = False
@@ -83,3 +98,189 @@ class TransitionGraph(Graph):
             if self.pop == pre:
                 continue
             yield pre
+
+
+class _Message(object):
+    __slots__ = ('seq', 'payload', 'species', 'answered')
+
+    def __init__(self, seq: int, payload: bytes, species: Union[str, None]):
+        self.seq = seq
+        self.payload = payload
+        self.species = species
+        self.answered = False
+
+    def __lt__(self, other: '_Message') -> bool:
+        return self.seq < other.seq
+
+
+class _Flow(object):
+    def __init__(self, isn: int, max_prefix: int, max_suffix: int, complete: bool = True):
+        self.isn = isn
+        # the flow was recorded from its SYN on, i.e. its head is the beginning of the session
+        self.complete = complete
+        self.head: List[_Message] = []
+        self.tail: collections.deque = collections.deque(maxlen=max_suffix + 1)
+        self.last: Union[_Message, None] = None
+        self.max_prefix = max_prefix
+
+    def duplicate(self, seq: int) -> bool:
+        return any(m.seq == seq for m in self.head) or any(m.seq == seq for m in self.tail)
+
+    def add(self, msg: _Message):
+        if len(self.head) <= self.max_prefix or msg < self.head[-1]:
+            bisect.insort(self.head, msg)
+            if len(self.head) > self.max_prefix + 1:
+                self.head.pop()
+        if len(self.tail) == 0 or not msg < self.tail[-1]:
+            self.tail.append(msg)
+        else:
+            # reordered segment, keep the window sorted
+            window = sorted(list(self.tail) + [msg])
+            self.tail.clear()
+            self.tail.extend(window)
+        self.last = msg
+
+
+class FlowRecorder(object):
+    """
+    Learns pre- and post-phase transitions from recorded client sessions.
+
+    TCP client streams towards the server port are reassembled per 5-tuple: client segments are ordered by their
+    sequence number and retransmissions are dropped. Each segment is one message, tagged with the species it
+    belongs to (if it passes the fuzzer's layer filter). When a flow ends, every species it contains contributes
+    two candidates: the messages preceding its first occurrence (prefix) and the messages following its last
+    occurrence (suffix). The shortest candidates over all flows become the species' transitions. Flows whose
+    capture started mid-session only contribute suffixes, since the beginning of their session is unknown.
+
+    Only the first `max_prefix` + 1 and the last `max_suffix` + 1 messages of a flow are kept, so memory per flow
+    is bounded and longer prefixes or suffixes are never learned.
+
+    Args:
+        server_port (int): port of the fuzzing target
+        max_prefix (int): maximum number of messages of a pre-phase
+        max_suffix (int): maximum number of messages of a post-phase
+    """
+
+    def __init__(self, server_port: int, max_prefix: int = 8, max_suffix: int = 4):
+        self.server_port = server_port
+        self.max_prefix = max_prefix
+        self.max_suffix = max_suffix
+        self._flows: Dict[Tuple, _Flow] = {}
+        self._pre: Dict[str, List[_Message]] = {}
+        self._post: Dict[str, List[_Message]] = {}
+        self.flows = 0
+        self.retransmissions = 0
+
+    @staticmethod
+    def _shorter(candidate: List[_Message], best: Union[List[_Message], None]) -> bool:
+        if best is None:
+            return True
+        return (len(candidate), sum(len(m.payload) for m in candidate)) < \
+               (len(best), sum(len(m.payload) for m in best))
+
+    def _harvest(self, key: Tuple):
+        flow = self._flows.pop(key)
+        self.flows += 1
+        seen = set()
+        for i, msg in enumerate(flow.head if flow.complete else []):
+            if msg.species is None or msg.species in seen:
+                continue
+            seen.add(msg.species)
+            if i <= self.max_prefix and self._shorter(flow.head[:i], self._pre.get(msg.species, None)):
+                self._pre[msg.species] = flow.head[:i]
+        tail = list(flow.tail)
+        seen = set()
+        for i in range(len(tail) - 1, -1, -1):
+            species = tail[i].species
+            if species is None or species in seen:
+                continue
+            seen.add(species)
+            if self._shorter(tail[i + 1:], self._post.get(species, None)):
+                self._post[species] = tail[i + 1:]
+
+    def add(self, pkt: Packet, species: Union[str, None] = None):
+        """
+        Record a captured packet
+
+        @param pkt: dissected packet of the capture
+        @param species: species of the packet's application layer message, None if it is not fuzzable
+        """
+        if TCP not in pkt or (IP not in pkt and IPv6 not in pkt):
+            return
+        ip = pkt[IP] if IP in pkt else pkt[IPv6]
+        tcp = pkt[TCP]
+        if tcp.dport == self.server_port:
+            key = (ip.src, tcp.sport, ip.dst, tcp.dport)
+            client = True
+        elif tcp.sport == self.server_port:
+            key = (ip.dst, tcp.dport, ip.src, tcp.sport)
+            client = False
+        else:
+            return
+        flags = int(tcp.flags)
+        payload = bytes(tcp.payload)
+        if client and flags & 0x02:
+            # SYN, a new session on this 5-tuple
+            if key in self._flows:
+                self._harvest(key)
+            self._flows[key] = _Flow(tcp.seq + 1, self.max_prefix, self.max_suffix)
+        flow = self._flows.get(key, None)
+        if flow is None and client and len(payload) > 0:
+            # capture started mid-session
+            flow = self._flows[key] = _Flow(tcp.seq, self.max_prefix, self.max_suffix, complete=False)
+        if flow is not None and len(payload) > 0:
+            if client:
+                seq = (tcp.seq - flow.isn) % (1 << 32)
+                if flow.duplicate(seq):
+                    self.retransmissions += 1
+                else:
+                    flow.add(_Message(seq, payload, species))
+            elif flow.last is not None:
+                flow.last.answered = True
+        if flow is not None and flags & 0x05:
+            # FIN or RST, the session is over
+            self._harvest(key)
+
+    def transitions(self) -> Dict[str, Tuple[List[TransitionPayload], List[TransitionPayload]]]:
+        """
+        Finish all open flows and return the learned transitions
+
+        @return: species -> (pre-phase, post-phase)
+        """
+        for key in list(self._flows.keys()):
+            self._harvest(key)
+        learned = {}
+        for species, prefix in self._pre.items():
+            pre = [TransitionPayload(f'{species}.pre{i}', m.payload, m.answered) for i, m in enumerate(prefix)]
+            post = [TransitionPayload(f'{species}.post{i}', m.payload, m.answered)
+                    for i, m in enumerate(self._post.get(species, []))]
+            learned[species] = (pre, post)
+        if constants.TRACE:
+            for species, (pre, post) in learned.items():
+                print(f"transition_trace, {species}, {len(pre)}, {len(post)}", file=sys.stderr)
+        return learned
+
+
+def learn_transitions(paths: Union[str, Sequence[str]],
+                      server_port: int,
+                      layer_filter: Callable[[Packet], Union[Packet, None]] = ingest.default_layer_filter,
+                      population_identifier: Callable[[Packet], str] = ingest.default_identifier,
+                      max_prefix: int = 8,
+                      max_suffix: int = 4) -> Dict[str, Tuple[List[TransitionPayload], List[TransitionPayload]]]:
+    """
+    Learn the shortest pre- and post-phases per species from the client sessions of capture files (see
+    FlowRecorder).
+
+    @return: species -> (pre-phase, post-phase)
+    """
+    recorder = FlowRecorder(server_port, max_prefix=max_prefix, max_suffix=max_suffix)
+    for pkt in ingest.packets(paths):
+        species = None
+        try:
+            stripped = layer_filter(pkt)
+            if stripped is not None:
+                species = population_identifier(stripped)
+        except Exception:
+            pass
+        recorder.add(pkt, species)
+    return recorder.transitions()
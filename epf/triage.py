@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+
+# sanitizer stack frame, e.g. "    #0 0x4f1e2a in CS104_Slave_handleMessage lib60870-C/src/.../cs104_slave.c:1234:5"
+_FRAME_RE = re.compile(r'#\d+ 0x[0-9a-fA-F]+ in (\S+)')
+_REPORT_RE = re.compile(r'==\d+==ERROR: ')
+
+
+def stack_frames(log: str, depth: int) -> Tuple[str, ...]:
+    """
+    Extract the innermost function names of the last sanitizer report in a target's stderr log.
+
+    @param log: stderr output of the target
+    @param depth: maximum number of frames
+    @return: function names, innermost first
+    """
+    if depth <= 0 or not log:
+        return ()
+    reports = list(_REPORT_RE.finditer(log))
+    if len(reports) > 0:
+        log = log[reports[-1].start():]
+    return tuple(_FRAME_RE.findall(log)[:depth])
+
+
+def trace_signature(edges: Union[np.ndarray, None]) -> str:
+    """Hash over a set of edges, '-' if there are none"""
+    if edges is None or len(edges) == 0:
+        return '-'
+    return hashlib.sha1(np.sort(edges).astype(np.uint32).tobytes()).hexdigest()[:16]
+
+
+class CrashBucket(object):
+    def __init__(self, bucket_id: int, exit_code: int, trace_hash: str, frames: Sequence[str], timestamp: float,
+                 iteration: int, edges: Sequence[int] = ()):
+        self.bucket_id = bucket_id
+        self.exit_code = exit_code
+        self.trace_hash = trace_hash
+        self.frames = tuple(frames)
+        # edges that no earlier crash of the same exit code and frames had executed
+        self.edges = np.asarray(edges, dtype=np.uint32)
+        self.first_seen = timestamp
+        self.first_iteration = iteration
+        self.last_seen = timestamp
+        self.hits = 1
+        # identities of the test cases that reproduce the crash on their own (see Bisector),
+        # None if not bisected yet, empty if the crash did not reproduce
+        self.culprits = None
+
+    @property
+    def signal(self) -> int:
+        """Terminating signal, 0 if the process exited on its own"""
+        return -self.exit_code if self.exit_code < 0 else 0
+
+    @property
+    def key(self) -> Tuple[int, str, Tuple[str, ...]]:
+        return self.exit_code, self.trace_hash, self.frames
+
+    def to_dict(self) -> Dict:
+        return {
+            "bucket_id": self.bucket_id,
+            "signal": self.signal,
+            "exit_code": self.exit_code,
+            "trace_signature": self.trace_hash,
+            "frames": list(self.frames),
+            "edges": self.edges.tolist(),
+            "hits": self.hits,
+            "first_seen": self.first_seen,
+            "first_iteration": self.first_iteration,
+            "last_seen": self.last_seen,
+            "culprits": self.culprits,
+        }
+
+
+class CrashBuckets(object):
+    """
+    Crash deduplication. Crashes are grouped by terminating signal / exit code and optionally the innermost
+    sanitizer stack frames. Within a group, a crash is unique (as in AFL) if its trace contains edges that no
+    earlier crash of the group has executed, it then opens a new bucket signed by these edges. Every other crash
+    counts as a hit of the group's bucket whose edges it shares most. Only the first crash of a bucket is meant to
+    be persisted in full.
+
+    Args:
+        path (str): json file the buckets are saved to
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._buckets: Dict[Tuple, CrashBucket] = {}
+        # (exit code, frames) -> buckets and the union of their edges
+        self._groups: Dict[Tuple, List[CrashBucket]] = {}
+        self._crash_edges: Dict[Tuple, np.ndarray] = {}
+        self._mut = threading.Lock()
+
+    def load(self):
+        """Read the buckets saved by a previous run, if there are any"""
+        if not os.path.isfile(self.path):
+            return
+        with open(self.path) as f:
+            data = json.load(f)
+        with self._mut:
+            for d in data["buckets"]:
+                bucket = CrashBucket(d["bucket_id"], d["exit_code"], d["trace_signature"], d["frames"],
+                                     d["first_seen"], d["first_iteration"], d.get("edges", ()))
+                # records of older or partial files may lack the fields that are updated after the first crash
+                bucket.last_seen = d.get("last_seen", bucket.first_seen)
+                bucket.hits = d.get("hits", 1)
+                bucket.culprits = d.get("culprits", [])
+                self._add(bucket)
+
+    def _add(self, bucket: CrashBucket):
+        group = (bucket.exit_code, bucket.frames)
+        self._buckets[bucket.key] = bucket
+        self._groups.setdefault(group, []).append(bucket)
+        self._crash_edges[group] = np.union1d(self._crash_edges.get(group, np.empty(0, dtype=np.uint32)),
+                                              bucket.edges).astype(np.uint32)
+
+    def classify(self, exit_code: int, trace: Union[np.ndarray, None], frames: Sequence[str] = (),
+                 timestamp: float = 0.0, iteration: int = 0) -> Tuple[CrashBucket, bool]:
+        """
+        Sort a crash into its bucket
+
+        @return: (bucket, True if the bucket is new)
+        """
+        group = (exit_code, tuple(frames))
+        trace = np.unique(np.asarray(trace, dtype=np.uint32)) if trace is not None else np.empty(0, dtype=np.uint32)
+        with self._mut:
+            buckets = self._groups.get(group, [])
+            new_edges = np.setdiff1d(trace, self._crash_edges[group], assume_unique=True) if buckets else trace
+            if buckets and new_edges.size == 0:
+                bucket = max(buckets, key=lambda b: np.intersect1d(trace, b.edges, assume_unique=True).size)
+                bucket.hits += 1
+                bucket.last_seen = timestamp
+                return bucket, False
+            bucket = CrashBucket(len(self._buckets) + 1, exit_code, trace_signature(new_edges), group[1], timestamp,
+                                 iteration, edges=new_edges)
+            self._add(bucket)
+        return bucket, True
+
+    @property
+    def hits(self) -> int:
+        return sum(b.hits for b in self)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def __iter__(self):
+        with self._mut:
+            buckets = list(self._buckets.values())
+        return iter(sorted(buckets, key=lambda b: b.bucket_id))
+
+    def save(self):
+        with self._mut:
+            data = {"saved": time.time(), "buckets": [b.to_dict() for b in self._buckets.values()]}
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp, self.path)
@@ -0,0 +1,119 @@
+import csv
+import queue
+import sys
+import threading
+import time
+from typing import Dict, List, Any
+
+from . import constants
+
+_IDLE = object()
+
+
+class ResultWriter(threading.Thread):
+    """
+    Asynchronous, buffered writer for result files (csv rows and payload files).
+
+    Records are handed over through a bounded queue and written by a background thread, which flushes the
+    underlying files once `flush_size` records have been written or `flush_interval` seconds have passed, and on
+    close(). If the queue is full, non-critical records (e.g. debug rows) are dropped and counted, while critical
+    records (bugs) block the caller until there is space again.
+
+    Args:
+        max_queue (int): maximum number of queued records
+        flush_interval (float): maximum seconds between two flushes
+        flush_size (int): number of written records that triggers a flush
+    """
+
+    def __init__(self, max_queue: int = 65536, flush_interval: float = 1.0, flush_size: int = 1024):
+        super().__init__(name='epf-writer', daemon=True)
+        self._queue = queue.Queue(maxsize=max_queue)
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self._csv: Dict[str, Any] = {}
+        self.dropped = 0
+        self.written = 0
+        self._closed = False
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def open_csv(self, path: str, header: List[str], append: bool = False):
+        """Register a csv file and enqueue its header (in append mode only if the file is empty)"""
+        self._put(('csv_append' if append else 'csv_open', path, header), critical=True)
+
+    def write_row(self, path: str, row: Dict[str, Any], critical: bool = False):
+        self._put(('csv_row', path, row), critical=critical)
+
+    def write_file(self, path: str, data: bytes, critical: bool = False, append: bool = False):
+        self._put(('append' if append else 'file', path, data), critical=critical)
+
+    def _put(self, item, critical: bool):
+        if self._closed:
+            return
+        if critical:
+            self._queue.put(item)
+            return
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def run(self):
+        pending = 0
+        last_flush = time.time()
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = _IDLE
+            if item is None:
+                break
+            if item is not _IDLE:
+                self._process(item)
+                pending += 1
+            if pending >= self.flush_size or (pending > 0 and time.time() - last_flush >= self.flush_interval):
+                self._flush()
+                pending = 0
+                last_flush = time.time()
+        self._flush()
+        for f, _ in self._csv.values():
+            f.close()
+        self._csv = {}
+
+    def _process(self, item):
+        kind, path, data = item
+        try:
+            if kind in ('csv_open', 'csv_append'):
+                f = open(path, 'w' if kind == 'csv_open' else 'a')
+                w = csv.DictWriter(f, fieldnames=data)
+                if f.tell() == 0:
+                    w.writeheader()
+                self._csv[path] = (f, w)
+            elif kind == 'csv_row':
+                self._csv[path][1].writerow(data)
+            elif kind == 'file':
+                with open(path, 'wb') as f:
+                    f.write(data)
+            elif kind == 'append':
+                with open(path, 'ab') as f:
+                    f.write(data)
+            self.written += 1
+        except Exception as e:
+            self.dropped += 1
+            if constants.TRACE:
+                print(f"writer_trace, {kind}, {path}, {e}", file=sys.stderr)
+
+    def _flush(self):
+        for f, _ in self._csv.values():
+            f.flush()
+
+    def close(self):
+        """Write all queued records, flush and close every file"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        if self.is_alive():
+            self.join()
@@ -0,0 +1,52 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('scapy')
+
+from epf.replay import TargetLock  # noqa: E402
+
+
+def test_fuzzing_progresses_during_minimization():
+    lock = TargetLock()
+    fuzz_iterations = []
+    replay_steps = []
+    done = threading.Event()
+
+    def minimize():
+        # replay steps back to back, like Minimizer/Bisector calling Replayer.run()
+        while not done.is_set():
+            with lock.replay():
+                replay_steps.append(len(fuzz_iterations))
+                time.sleep(0.01)
+
+    worker = threading.Thread(target=minimize, daemon=True)
+    worker.start()
+    time.sleep(0.05)
+    deadline = time.monotonic() + 1.0
+    while time.monotonic() < deadline:
+        with lock.fuzz():
+            fuzz_iterations.append(len(replay_steps))
+            time.sleep(0.001)
+    done.set()
+    worker.join(timeout=1.0)
+
+    # both sides alternate, a replay step takes ~10 ms so about 90 fuzzing iterations fit into the second
+    assert len(replay_steps) > 10
+    assert len(fuzz_iterations) > 50
+    # no two fuzzing iterations in a row while a replay was waiting, and vice versa
+    assert all(b - a <= 1 for a, b in zip(fuzz_iterations, fuzz_iterations[1:]))
+    assert all(b - a <= 1 for a, b in zip(replay_steps, replay_steps[1:]))
+
+
+def test_fuzzing_alone_is_not_blocked():
+    lock = TargetLock()
+    for _ in range(100):
+        with lock.fuzz():
+            pass
+    with lock.replay():
+        pass
+    with lock.fuzz():
+        pass
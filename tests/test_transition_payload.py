@@ -0,0 +1,58 @@
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('scapy')
+
+from scapy.layers.inet import IP, TCP  # noqa: E402
+from scapy.layers.l2 import Ether  # noqa: E402
+from scapy.packet import Raw  # noqa: E402
+from scapy.utils import wrpcap  # noqa: E402
+
+from epf.transition_payload import learn_transitions  # noqa: E402
+
+SERVER, PORT = '10.0.0.1', 2404
+
+
+def _session(sport: int, payloads, syn: bool = True, isn: int = 1000):
+    frames = []
+    ether = Ether() / IP(src='10.0.0.2', dst=SERVER)
+    if syn:
+        frames.append(ether / TCP(sport=sport, dport=PORT, flags='S', seq=isn))
+    seq = isn + 1
+    for p in payloads:
+        frames.append(ether / TCP(sport=sport, dport=PORT, flags='PA', seq=seq) / Raw(p))
+        seq += len(p)
+    frames.append(ether / TCP(sport=sport, dport=PORT, flags='FA', seq=seq))
+    return frames
+
+
+def _layer_filter(pkt):
+    return pkt if TCP in pkt and len(pkt[TCP].payload) > 0 else None
+
+
+def _identifier(pkt):
+    return bytes(pkt[TCP].payload)[:1].decode()
+
+
+def test_mid_session_capture_keeps_learned_prefix(tmp_path):
+    path = str(tmp_path / 'mid_session.pcap')
+    # the capture starts mid-session on port 40000, the complete session on port 40001 follows
+    frames = _session(40000, [b'I-frame 1', b'I-frame 2'], syn=False)
+    frames += _session(40001, [b'Ttestfr', b'Sstartdt', b'I-frame 3', b'Stopdt'])
+    wrpcap(path, frames)
+
+    learned = learn_transitions(path, PORT, layer_filter=_layer_filter, population_identifier=_identifier)
+
+    pre, post = learned['I']
+    assert [t.payload for t in pre] == [b'Ttestfr', b'Sstartdt']
+    # suffixes of the mid-session flow are still learned, it ends after its last I-frame
+    assert post == []
+
+
+def test_mid_session_capture_alone_learns_no_prefix(tmp_path):
+    path = str(tmp_path / 'mid_session_only.pcap')
+    wrpcap(path, _session(40000, [b'I-frame 1', b'Stopdt'], syn=False))
+
+    learned = learn_transitions(path, PORT, layer_filter=_layer_filter, population_identifier=_identifier)
+
+    assert 'I' not in learned
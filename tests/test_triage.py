@@ -0,0 +1,36 @@
+import json
+
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('scapy')
+
+from epf.triage import CrashBuckets  # noqa: E402
+
+
+def test_load_record_without_culprits(tmp_path):
+    path = str(tmp_path / 'buckets.json')
+    record = {
+        "bucket_id": 1,
+        "signal": 11,
+        "exit_code": -11,
+        "trace_signature": "0" * 16,
+        "frames": ["CS104_Slave_handleMessage"],
+        "hits": 3,
+        "first_seen": 1.5,
+        "first_iteration": 113,
+        "last_seen": 4.0,
+    }
+    with open(path, 'w') as f:
+        json.dump({"saved": 0.0, "buckets": [record]}, f)
+
+    buckets = CrashBuckets(path)
+    buckets.load()
+
+    bucket, = list(buckets)
+    assert bucket.culprits == []
+    assert bucket.hits == 3
+    assert bucket.edges.size == 0
+    # the loaded bucket still takes the hits of its group
+    same, new = buckets.classify(-11, None, frames=["CS104_Slave_handleMessage"])
+    assert same is bucket and not new